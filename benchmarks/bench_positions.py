@@ -0,0 +1,57 @@
+"""
+Throughput of position extraction (`ChessGameConstructor._get_fens`).
+
+Generates seeded random legal games and times the construction pipeline
+with a few position strategies, for a growing number of games and growing
+game lengths. Positions/second and plies/second should stay roughly
+constant across rows: extraction is linear in games x plies.
+
+Usage:
+    python benchmarks/bench_positions.py [--games 100 400 1600] [--plies 40 80 160]
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+from corpus import random_game
+from pgn_quizzer.data import ChessGameConstructor
+from pgn_quizzer.positions import AfterCaptures, EveryNthPly, LastPlies
+
+
+def random_game_pgn(rng: Random, nb_plies: int, number: int) -> tuple[str, int]:
+    game = random_game(rng, nb_plies, nb_assets=0)
+    pgn = (f'[White "White{number}"]\n[Black "Black{number}"]\n[Date "2000.01.01"]\n\n'
+           + game.movetext + " *\n\n")
+    return pgn, game.nb_plies
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark position extraction.")
+    parser.add_argument("--games", type=int, nargs="+", default=[100, 400, 1600])
+    parser.add_argument("--plies", type=int, nargs="+", default=[40, 80, 160])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    strategies = {"every:4": EveryNthPly(4), "captures": AfterCaptures(), "last:8": LastPlies(8)}
+    print(f"{'games':>6} {'plies':>6} {'strategy':>9} {'positions':>10} {'positions/s':>12} {'plies/s':>10}")
+    for nb_plies in args.plies:
+        for nb_games in args.games:
+            rng = Random(args.seed)
+            games = [random_game_pgn(rng, nb_plies, i) for i in range(nb_games)]
+            pgn = "".join(game for game, _ in games)
+            total_plies = sum(plies for _, plies in games)
+            for name, strategy in strategies.items():
+                start = perf_counter()
+                constructor = ChessGameConstructor(pgn, strategy)
+                constructor.construct()
+                elapsed = perf_counter() - start
+
+                nb_positions = sum(len(fens) for game in constructor.chessgames
+                                   for fens in game.fen_assets.values())
+                print(f"{nb_games:>6} {nb_plies:>6} {name:>9} {nb_positions:>10} "
+                      f"{nb_positions / elapsed:>12.0f} {total_plies / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Memory held by a question bank, before and after compact storage.
+
+Builds a PGN-style bank (a few thousand titles and one prompt repeated over
+every question) from JSON, then measures with tracemalloc how much memory
+each representation keeps alive once the raw JSON data is dropped:
+
+    legacy    regular dataclass with a __dict__ and a list of wrong answers,
+              holding its own copies of every string (as before compaction)
+    slots     `parse_data`: slotted Question, tuples, interned strings
+    compact   `CompactBank`: string table, integer columns, packed FENs
+
+Usage:
+    python benchmarks/bench_question_memory.py [--questions 100000]
+"""
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from json import dumps, loads
+from random import Random
+import gc
+import tracemalloc
+
+from pgn_quizzer.compact import CompactBank
+from pgn_quizzer.data import parse_data
+
+FENS = [
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQ1RK1 b kq - 5 4",
+    "8/1b2kp1p/1p4p1/pB1pr3/3Rn3/2N1P3/PP3PPP/6K1 w - - 9 32",
+    "r1bqk2r/ppp2ppp/2np1n2/2b1p1B1/2B1P3/3P1N2/PPP2PPP/RN1Q1RK1 b kq - 1 6",
+]
+
+
+@dataclass(frozen=True)
+class LegacyQuestion:
+    text: str
+    right_answer: str
+    wrong_answers: list[str]
+    asset: str
+
+
+def question_json(nb_questions: int, nb_titles: int, seed: int = 0) -> str:
+    rng = Random(seed)
+    titles = [f"Player{i} - Opponent{i}, Somewhere {1850 + i % 170}" for i in range(nb_titles)]
+    data = []
+    for i in range(nb_questions):
+        right = titles[i % nb_titles]
+        data.append({"text": "Which game is the following position from?",
+                     "right_answer": right,
+                     "wrong_answers": rng.sample([t for t in titles[:50] if t != right], 3),
+                     "asset": FENS[i % len(FENS)].replace(" 1 6", f" 1 {6 + i % 90}")})
+    return dumps(data)
+
+
+def retained_bytes(build, text: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = loads(text)
+    bank = build(data)
+    del data
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del bank
+    return current
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark question bank memory.")
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--titles", type=int, default=2_000)
+    args = parser.parse_args()
+
+    text = question_json(args.questions, args.titles)
+    builders = {
+        "legacy": lambda data: [LegacyQuestion(q["text"], q["right_answer"],
+                                               q["wrong_answers"], q["asset"]) for q in data],
+        "slots": parse_data,
+        "compact": lambda data: CompactBank(parse_data(data)),
+    }
+
+    baseline = None
+    print(f"{'representation':>15} {'MiB':>8} {'bytes/question':>15} {'vs legacy':>10}")
+    for name, build in builders.items():
+        size = retained_bytes(build, text)
+        baseline = baseline or size
+        print(f"{name:>15} {size / 2**20:>8.1f} {size / args.questions:>15.0f} "
+              f"{baseline / size:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Load test of the HTTP quiz server (`--ui server`).
+
+Starts a server in a separate process over a synthetic JSON bank (or
+targets a running one with --port), then opens --clients keep-alive
+connections. Each connection plays --sessions-per-client quizzes at once,
+taking turns between them, so --clients x --sessions-per-client sessions
+are open concurrently. Reports requests/second and latency percentiles.
+
+Usage:
+    python benchmarks/bench_server.py [--clients 100] [--sessions-per-client 20] [--duration 10]
+    python benchmarks/bench_server.py --port 8765   # against a running server
+"""
+
+from argparse import ArgumentParser
+from json import dumps, loads
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+import asyncio
+import socket
+import subprocess
+import sys
+
+from corpus import write_json_corpus
+
+SERVER = """
+import sys
+from pathlib import Path
+from pgn_quizzer.data import create_question_bank
+from pgn_quizzer.server import run_quiz_server
+
+bank = create_question_bank(Path(sys.argv[1]), compact=True)
+run_quiz_server(bank, length=int(sys.argv[2]), port=int(sys.argv[3]))
+"""
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader, self.writer = reader, writer
+        self.latencies: list[float] = []
+
+    async def request(self, method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+        data = dumps(body).encode() if body is not None else b""
+        start = perf_counter()
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        length = next(int(line.split(":")[1]) for line in head.split("\r\n")
+                      if line.lower().startswith("content-length:"))
+        payload = loads(await self.reader.readexactly(length))
+        self.latencies.append(perf_counter() - start)
+        return int(head.split()[1]), payload
+
+
+async def run_client(port: int, nb_sessions: int, length: int, deadline: float) -> Client:
+    client = Client(*await asyncio.open_connection("127.0.0.1", port))
+    sessions = []
+    for _ in range(nb_sessions):
+        _, created = await client.request("POST", "/sessions", {"length": length})
+        sessions.append(created["session"])
+
+    while perf_counter() < deadline:
+        for i, session_id in enumerate(sessions):
+            status, question = await client.request("GET", f"/sessions/{session_id}/question")
+            if status == 409: # quiz over: start another
+                await client.request("DELETE", f"/sessions/{session_id}")
+                _, created = await client.request("POST", "/sessions", {"length": length})
+                sessions[i] = created["session"]
+                continue
+            choice = next(iter(question["choices"]))
+            await client.request("POST", f"/sessions/{session_id}/answer", {"choice": choice})
+    client.writer.close()
+    return client
+
+
+async def load_test(port: int, args) -> list[float]:
+    deadline = perf_counter() + args.duration
+    clients = await asyncio.gather(*(run_client(port, args.sessions_per_client, args.length, deadline)
+                                     for _ in range(args.clients)))
+    return [latency for client in clients for latency in client.latencies]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout: float = 60) -> None:
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            sleep(0.1)
+    raise SystemExit(f"the server did not start on port {port}")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Load test the quiz server.")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent connections")
+    parser.add_argument("--sessions-per-client", type=int, default=20)
+    parser.add_argument("--length", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--questions", type=int, default=100_000, help="size of the synthetic bank")
+    parser.add_argument("--port", type=int, help="target a server already running on this port")
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp:
+        server = None
+        port = args.port
+        if port is None:
+            bank = write_json_corpus(Path(tmp) / "bank.json", args.questions)
+            port = free_port()
+            server = subprocess.Popen([sys.executable, "-c", SERVER, str(bank),
+                                       str(args.length), str(port)], stdout=subprocess.DEVNULL)
+        try:
+            wait_for_server(port)
+            start = perf_counter()
+            latencies = sorted(asyncio.run(load_test(port, args)))
+            elapsed = perf_counter() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    def percentile(p: float) -> float:
+        return 1e3 * latencies[min(int(p * len(latencies)), len(latencies) - 1)]
+
+    print(f"{args.clients * args.sessions_per_client} concurrent sessions over "
+          f"{args.clients} connections, {elapsed:.1f}s")
+    print(f"{'requests':>10} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(f"{len(latencies):>10} {len(latencies) / elapsed:>10.0f} {percentile(0.5):>8.2f} "
+          f"{percentile(0.99):>8.2f} {1e3 * latencies[-1]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
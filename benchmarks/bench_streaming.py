@@ -0,0 +1,88 @@
+"""
+Peak memory of streaming vs eager PGN ingestion.
+
+Writes synthetic PGN files of increasing size, then ingests each one in a
+fresh subprocess (so that peak RSS is measured from a clean slate) with both
+`pgn_loader` (everything in memory) and `iter_pgn_games` (one game at a time),
+the latter both before and after the file's offset index is saved (the saved
+index is memory-mapped, so it should not grow the peak either).
+
+Usage:
+    python benchmarks/bench_streaming.py [--sizes 1000 4000 16000]
+    python benchmarks/bench_streaming.py --sizes 100000 400000 --stream-only
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import subprocess
+import sys
+
+GAME_TEMPLATE = """[Event "Synthetic game NN"]
+[Site "Benchmark"]
+[Date "2000.01.01"]
+[White "WhiteNN"]
+[Black "BlackNN"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {developing} Nc6 3. Bc4 (3. Bb5 a6) 3... Bc5 4. O-O
+{[%asset desc1] castled} Nf6 5. d3 d6 6. Bg5 {[%asset desc2]} h6 7. Bxf6 Qxf6
+8. Nc3 {[%asset desc3] pressure on d5} O-O 1-0
+
+"""
+
+CHILD = """
+import resource, sys
+from pathlib import Path
+from pgn_quizzer.data import iter_pgn_games, pgn_loader
+
+mode, path = sys.argv[1], Path(sys.argv[2])
+if mode == "index":
+    from pgn_quizzer.pgn_index import build_index, save_index
+    save_index(build_index(path))
+    nb_questions = 0
+elif mode == "stream":
+    nb_questions = sum(len(question_data) for _, question_data in iter_pgn_games(path))
+else:
+    nb_questions = len(pgn_loader(path))
+print(nb_questions, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_pgn(path: Path, nb_games: int) -> None:
+    with open(path, mode="w") as pgn_file:
+        for i in range(nb_games):
+            pgn_file.write(GAME_TEMPLATE.replace("NN", str(i)))
+
+
+def peak_rss_kib(mode: str, path: Path) -> tuple[int, int]:
+    result = subprocess.run([sys.executable, "-c", CHILD, mode, str(path)],
+                            capture_output=True, text=True, check=True)
+    nb_questions, peak = result.stdout.split()
+    return int(nb_questions), int(peak)
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark streaming PGN ingestion.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000])
+    parser.add_argument("--stream-only", action="store_true",
+                        help="skip the eager load, which is slow on large files")
+    args = parser.parse_args()
+
+    print(f"{'games':>8} {'MiB on disk':>12} {'eager RSS MiB':>14} {'stream RSS MiB':>15} "
+          f"{'indexed RSS MiB':>16}")
+    with TemporaryDirectory() as tmp:
+        for nb_games in args.sizes:
+            path = Path(tmp) / f"games_{nb_games}.pgn"
+            write_pgn(path, nb_games)
+            eager = float("nan") if args.stream_only else peak_rss_kib("eager", path)[1]
+            _, stream = peak_rss_kib("stream", path)
+            peak_rss_kib("index", path) # saves the sidecar, in a process of its own
+            _, indexed = peak_rss_kib("stream", path)
+            size = path.stat().st_size / 2**20
+            print(f"{nb_games:>8} {size:>12.1f} {eager / 1024:>14.1f} {stream / 1024:>15.1f} "
+                  f"{indexed / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Timing and memory of every stage of a quiz, over seeded synthetic corpora.
+
+For each size, writes (or reuses, with --corpus-dir) a PGN corpus of that
+many games and a JSON corpus of that many questions (see `corpus.py`), then
+measures:
+
+    pgn_loader         PGN file -> question data
+    json_loader        JSON file -> question data
+    parse_data         question data -> Question objects
+    QuizBrain          sampling a quiz of --length questions from the bank
+    options            QuizBrain.generate_multiple_choice_options, per question
+    render             run_quiz_console (board diagrams included), per question,
+                       with the render cache emptied first
+    render_warm        the same quiz again, its diagrams all in the render cache
+
+Each stage is timed (wall and CPU, best of --repeat runs) and then run once
+more under tracemalloc for its peak allocation. Results are written as JSON
+so that runs on different commits can be compared.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000] [--output bench.json]
+    python benchmarks/bench_suite.py --sizes 1000 100000 1000000 --corpus-dir corpora --no-memory
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from json import dumps
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, process_time
+import gc
+import platform
+import subprocess
+import sys
+import tracemalloc
+
+from corpus import write_json_corpus, write_pgn_corpus
+from pgn_quizzer.data import json_loader, parse_data, pgn_loader
+from pgn_quizzer.model import QuizBrain
+from pgn_quizzer.presenter import QuizPresenter
+from pgn_quizzer.render import default_render_cache
+from pgn_quizzer.view import run_quiz_console
+
+
+def measure(run, repeat: int, memory: bool) -> dict:
+    '''Best wall/CPU time of `repeat` calls of `run`, and its peak allocation.'''
+    walls, cpus = [], []
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = perf_counter(), process_time()
+        run()
+        walls.append(perf_counter() - wall)
+        cpus.append(process_time() - cpu)
+    result = {"wall_s": min(walls), "cpu_s": min(cpus), "peak_kib": None}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        run()
+        result["peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def corpus_path(directory: Path, kind: str, size: int, seed: int) -> Path:
+    path = directory / f"{kind}_{size}_seed{seed}.{kind}"
+    if not path.exists():
+        write = write_pgn_corpus if kind == "pgn" else write_json_corpus
+        write(path.with_suffix(".tmp"), size, seed).replace(path)
+    return path
+
+
+def play(bank, length: int, seed: int, cold: bool) -> None:
+    # the same quiz every time, so that a warm run renders nothing new
+    if cold:
+        default_render_cache.clear() # else the best of --repeat runs is all cache hits
+    presenter = QuizPresenter(QuizBrain(bank, length, seed=seed))
+    run_quiz_console(presenter, input_func=lambda prompt: "a", output_func=lambda *args, **kwargs: None)
+
+
+def bench_size(directory: Path, size: int, args) -> list[dict]:
+    pgn_path = corpus_path(directory, "pgn", size, args.seed)
+    json_path = corpus_path(directory, "json", size, args.seed)
+    data = json_loader(json_path)
+    bank = parse_data(data)
+    quiz = QuizBrain(bank, args.length)
+
+    def options():
+        for question in quiz.questions:
+            quiz.generate_multiple_choice_options(question)
+
+    stages = {
+        "pgn_loader": (lambda: pgn_loader(pgn_path), 1),
+        "json_loader": (lambda: json_loader(json_path), 1),
+        "parse_data": (lambda: parse_data(data), 1),
+        "QuizBrain": (lambda: QuizBrain(bank, args.length), 1),
+        "options": (options, quiz.length),
+        "render": (lambda: play(bank, args.length, args.seed, cold=True), quiz.length),
+        # runs after "render", which leaves this quiz's diagrams in the cache
+        "render_warm": (lambda: play(bank, args.length, args.seed, cold=False), quiz.length),
+    }
+    results = []
+    for stage, (run, calls) in stages.items():
+        result = measure(run, args.repeat, not args.no_memory)
+        results.append({"size": size, "stage": stage, "calls": calls, **result,
+                        "us_per_call": 1e6 * result["wall_s"] / calls})
+        print(f"{size:>8} {stage:>12} {result["wall_s"]:>10.4f} {result["cpu_s"]:>10.4f} "
+              f"{results[-1]["us_per_call"]:>12.1f} {result["peak_kib"] or "-":>10}")
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True, cwd=Path(__file__).parent)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark every stage of a quiz.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--length", type=int, default=100, help="questions per quiz")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--corpus-dir", type=Path, help="where to keep corpora between runs")
+    parser.add_argument("--output", type=Path, default=Path("bench_suite.json"))
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'stage':>12} {'wall s':>10} {'cpu s':>10} {'us/call':>12} {'peak KiB':>10}")
+    with TemporaryDirectory() as tmp:
+        directory = args.corpus_dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        results = [result for size in args.sizes for result in bench_size(directory, size, args)]
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "length": args.length,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    args.output.write_text(dumps(report, indent=2) + "\n")
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Deterministic synthetic corpora for the benchmarks.
+
+Games are random legal games (python-chess picks uniformly among the legal
+moves) with realistic headers (a pool of players, events, dates and ECO
+codes) and `[%asset desc1]` / `[%asset desc2]` markers at random plies.
+Everything is drawn from a `Random(seed)`, so the same seed and size always
+give byte-identical files. Each game has a distinct title (the site carries
+the game number), but positions repeat between copies of a pooled game.
+
+Playing out random games is by far the slowest part of generation, so a
+corpus cycles through a pool of at most `pool_size` distinct games, giving
+every copy its own headers. Pass `pool_size=nb_games` for all-distinct games.
+
+Usage:
+    python benchmarks/corpus.py pgn 100000 games.pgn [--seed 0]
+    python benchmarks/corpus.py json 100000 questions.json [--seed 0]
+"""
+
+from argparse import ArgumentParser
+from collections.abc import Iterator
+from dataclasses import dataclass
+from json import dumps
+from pathlib import Path
+from random import Random
+
+from chess import Board
+
+from pgn_quizzer.data import format_title
+
+POOL_SIZE = 1000
+MIN_PLIES, MAX_PLIES = 20, 120
+SURNAMES = ["Anderssen", "Morphy", "Steinitz", "Lasker", "Tarrasch", "Capablanca",
+            "Alekhine", "Rubinstein", "Nimzowitsch", "Euwe", "Botvinnik", "Tal",
+            "Petrosian", "Spassky", "Fischer", "Karpov", "Kasparov", "Kramnik"]
+SITES = ["London", "Paris", "Vienna", "Berlin", "St Petersburg", "New York",
+         "Hastings", "Moscow", "Amsterdam", "Zurich", "Linares", "Wijk aan Zee"]
+QUESTION_TEXT = "Which game is the following position from?"
+
+
+@dataclass(frozen=True)
+class RandomGame:
+    movetext: str # with asset markers, without a result
+    nb_plies: int
+    asset_fens: tuple[str, ...]
+
+
+def random_game(rng: Random, nb_plies: int, nb_assets: int = 2) -> RandomGame:
+    '''Plays up to `nb_plies` random legal moves, marking `nb_assets` plies.'''
+    board = Board()
+    sans, fens = [], {}
+    marked = sorted(rng.sample(range(1, nb_plies + 1), min(nb_assets, nb_plies)))
+    while len(sans) < nb_plies:
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        move = rng.choice(moves)
+        sans.append(board.san(move))
+        board.push(move)
+        if len(sans) in marked:
+            fens[len(sans)] = board.fen()
+
+    tokens = []
+    for i, san in enumerate(sans, start=1):
+        tokens.append(f"{(i + 1) // 2}. {san}" if i % 2 else san)
+        if i in fens:
+            tokens.append(f"{{[%asset desc{list(fens).index(i) + 1}]}}")
+    return RandomGame(" ".join(tokens), len(sans), tuple(fens.values()))
+
+
+def random_pool(seed: int, size: int) -> list[RandomGame]:
+    rng = Random(seed)
+    return [random_game(rng, rng.randint(MIN_PLIES, MAX_PLIES)) for _ in range(size)]
+
+
+def random_headers(rng: Random, number: int) -> dict[str, str]:
+    white, black = rng.sample(SURNAMES, 2)
+    year = rng.randint(1850, 2020)
+    return {"Event": f"{rng.choice(SITES)} {year}",
+            "Site": f"{rng.choice(SITES)} #{number}", # keeps titles distinct
+            "Date": f"{year}.{rng.randint(1, 12):02d}.??",
+            "Round": str(number),
+            "White": white,
+            "Black": black,
+            "Result": rng.choice(["1-0", "0-1", "1/2-1/2"]),
+            "ECO": f"{rng.choice("ABCDE")}{rng.randint(0, 99):02d}"}
+
+
+def iter_pgn_games(nb_games: int, seed: int = 0, pool_size: int = POOL_SIZE) -> Iterator[str]:
+    pool = random_pool(seed, min(nb_games, pool_size))
+    rng = Random(seed + 1)
+    for i in range(nb_games):
+        headers = random_headers(rng, i)
+        game = pool[i % len(pool)]
+        yield ("".join(f'[{tag} "{value}"]\n' for tag, value in headers.items())
+               + f"\n{game.movetext} {headers["Result"]}\n\n")
+
+
+def iter_json_questions(nb_questions: int, seed: int = 0, nb_options: int = 3,
+                        pool_size: int = POOL_SIZE) -> Iterator[dict]:
+    '''Question records as `pgn_loader` would make them: one per asset position.'''
+    pool = random_pool(seed, min(max(nb_questions // 2, 1), pool_size))
+    rng = Random(seed + 1)
+    recent = [format_title(random_headers(rng, -i)) for i in range(1, nb_options + 1)]
+    made, number = 0, 0
+    while made < nb_questions:
+        right = format_title(random_headers(rng, number))
+        for fen in pool[number % len(pool)].asset_fens:
+            if made == nb_questions:
+                break
+            yield {"text": QUESTION_TEXT, "right_answer": right,
+                   "wrong_answers": rng.sample(recent, nb_options), "asset": fen}
+            made += 1
+        recent[number % nb_options] = right
+        number += 1
+
+
+def write_pgn_corpus(path: Path, nb_games: int, seed: int = 0,
+                     pool_size: int = POOL_SIZE) -> Path:
+    with open(path, mode="w") as pgn_file:
+        pgn_file.writelines(iter_pgn_games(nb_games, seed, pool_size))
+    return path
+
+
+def write_json_corpus(path: Path, nb_questions: int, seed: int = 0,
+                      pool_size: int = POOL_SIZE) -> Path:
+    '''Writes a JSON array, or one record per line if `path` ends in .ndjson/.jsonl.'''
+    records = iter_json_questions(nb_questions, seed, pool_size=pool_size)
+    with open(path, mode="w") as json_file:
+        if path.suffix in (".ndjson", ".jsonl"):
+            json_file.writelines(dumps(record) + "\n" for record in records)
+        else:
+            json_file.write("[\n")
+            json_file.write(",\n".join(map(dumps, records)))
+            json_file.write("\n]\n")
+    return path
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Write a synthetic PGN or JSON corpus.")
+    parser.add_argument("kind", choices=["pgn", "json"])
+    parser.add_argument("size", type=int)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+
+    write = write_pgn_corpus if args.kind == "pgn" else write_json_corpus
+    write(args.path, args.size, args.seed, args.pool_size)
+
+
+if __name__ == "__main__":
+    main()
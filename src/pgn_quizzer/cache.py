@@ -0,0 +1,168 @@
+from collections.abc import Sequence
+from hashlib import sha256
+from json import JSONDecodeError, dumps, load
+import os
+from pathlib import Path
+from sys import stderr
+
+from pgn_quizzer.header_index import HeaderIndex
+from pgn_quizzer.model import Question
+from pgn_quizzer.pqb import MAGIC, CompiledBank, write_pqb
+
+# Parsed question banks are cached as compiled .pqb files named after a
+# digest of the source's contents and the loader options, so an unchanged
+# source is never parsed twice. A small stat index maps (path, size, mtime)
+# to the content digest so that a warm start doesn't even re-read the source.
+# A bank's header index, if it has one, is kept beside it (.hdx) and evicted
+# with it.
+#
+# The cache is only ever a shortcut: if its directory can't be read or
+# written, a lookup is a miss and a store is skipped (with one warning), and
+# the bank is loaded from its source as if there were no cache. Errors
+# reading the source itself are left to the caller.
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+STAT_INDEX = "stat_index.json"
+HASH_BLOCK_SIZE = 2**20
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pgn_quizzer"
+
+
+class BankCache:
+    """
+    On-disk, size-capped cache of parsed question banks.
+
+    Entries are evicted least-recently-used first once the cache grows past
+    `max_bytes`; reading an entry counts as using it.
+    """
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.failures = 0 # cache reads or writes which failed
+
+    def _failed(self, error: OSError) -> None:
+        if not self.failures:
+            print(f"--warning: not using the cache at {self.directory}: {error}", file=stderr)
+        self.failures += 1
+
+    def _content_digest(self, source_path: Path) -> str:
+        stat = source_path.stat()
+        stat_key = str(source_path.resolve())
+        stat_index = self._read_stat_index()
+        entry = stat_index.get(stat_key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["digest"]
+
+        digest = sha256()
+        with open(source_path, mode="rb") as source:
+            while block := source.read(HASH_BLOCK_SIZE):
+                digest.update(block)
+        stat_index[stat_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                "digest": digest.hexdigest()}
+        try:
+            self._write_stat_index(stat_index)
+        except OSError as e: # the digest is still good
+            self._failed(e)
+        return digest.hexdigest()
+
+    def _read_stat_index(self) -> dict:
+        try:
+            with open(self.directory / STAT_INDEX, mode="r") as index_file:
+                return load(index_file)
+        except (FileNotFoundError, JSONDecodeError):
+            return {}
+        except OSError as e:
+            self._failed(e)
+            return {}
+
+    def _write_stat_index(self, stat_index: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.directory / (STAT_INDEX + ".tmp")
+        temp_path.write_text(dumps(stat_index))
+        os.replace(temp_path, self.directory / STAT_INDEX)
+
+    def entry_path(self, source_path: Path, options: dict) -> Path:
+        key = dumps({"source": self._content_digest(source_path),
+                     "suffix": source_path.suffix,
+                     "format": MAGIC.decode().strip("\0"),
+                     "options": options}, sort_keys=True)
+        return self.directory / (sha256(key.encode()).hexdigest() + ".pqb")
+
+    def get(self, source_path: Path, options: dict) -> CompiledBank | None:
+        '''The cached bank of `source_path`, or None on a miss (which a
+        cache that can't be read counts as).
+
+        Raises:
+            OSError: If `source_path` can't be read.
+        '''
+        entry = self.entry_path(source_path, options)
+        try:
+            bank = CompiledBank(entry)
+            os.utime(entry) # mark as recently used
+            bank.header_index = self._load_header_index(entry)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        except OSError as e:
+            self._failed(e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bank
+
+    @staticmethod
+    def _load_header_index(entry: Path) -> HeaderIndex | None:
+        try:
+            return HeaderIndex.load(entry.with_suffix(".hdx"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, source_path: Path, options: dict, questions: Sequence[Question],
+            header_index: HeaderIndex | None = None) -> Path | None:
+        '''Stores `questions` (and their `header_index`) as the bank of
+        `source_path`, returning the entry's path, or None if the cache
+        can't be written.'''
+        entry = self.entry_path(source_path, options)
+        temp_path = entry.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if header_index is not None:
+                header_index.save(temp_path)
+                os.replace(temp_path, entry.with_suffix(".hdx"))
+            write_pqb(questions, temp_path)
+            os.replace(temp_path, entry)
+            self._evict()
+        except OSError as e:
+            self._failed(e)
+            try:
+                temp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _evict(self) -> None:
+        entries = sorted(self.directory.glob("*.pqb"), key=lambda p: p.stat().st_mtime_ns)
+        sizes = {p: p.stat().st_size + _size(p.with_suffix(".hdx")) for p in entries}
+        total = sum(sizes.values())
+        # always keep the newest entry, even if it alone exceeds the cap
+        while total > self.max_bytes and len(entries) > 1:
+            oldest = entries.pop(0)
+            total -= sizes[oldest]
+            oldest.unlink()
+            oldest.with_suffix(".hdx").unlink(missing_ok=True)
+            self.evictions += 1
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
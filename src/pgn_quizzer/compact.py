@@ -0,0 +1,97 @@
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+
+from pgn_quizzer.model import Question
+from pgn_quizzer.pqb import pack_fen, unpack_fen
+
+# In PGN-derived banks the same prompt and title strings repeat thousands of
+# times, and every question used to carry its own copies of them. A compact
+# bank stores each distinct string once, refers to it by id from flat integer
+# arrays, and packs standard FENs into 38 bytes, building `Question` objects
+# only when they are indexed.
+
+PACKED_FEN_SIZE = len(pack_fen("8/8/8/8/8/8/8/8 w - - 0 1"))
+PACKED = -1
+
+
+class CompactBank(Sequence[Question]):
+    """
+    Columnar, in-memory question bank with interned strings.
+
+    Behaves like a read-only list of `Question` objects (so `QuizBrain`
+    can sample it directly) while using a fraction of the memory.
+
+    Attributes:
+        strings (list[str]): Distinct prompts, answers and non-FEN assets.
+    """
+
+    def __init__(self, questions: Iterable[Question] = ()):
+        self.strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+        self._text_ids = array("I")
+        self._right_ids = array("I")
+        self._wrong_ids = array("I")
+        self._wrong_ends = array("I")
+        self._asset_ids = array("i") # PACKED, or the id of a non-FEN asset
+        self._fens = bytearray()
+        for question in questions:
+            self.append(question)
+
+    def _intern(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = self._string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def append(self, question: Question) -> None:
+        self._text_ids.append(self._intern(question.text))
+        self._right_ids.append(self._intern(question.right_answer))
+        self._wrong_ids.extend(self._intern(a) for a in question.wrong_answers)
+        self._wrong_ends.append(len(self._wrong_ids))
+
+        packed = pack_fen(question.asset)
+        if packed is None:
+            self._asset_ids.append(self._intern(question.asset))
+            self._fens += bytes(PACKED_FEN_SIZE)
+        else:
+            self._asset_ids.append(PACKED)
+            self._fens += packed
+
+    def __len__(self) -> int:
+        return len(self._text_ids)
+
+    def __getitem__(self, i: int) -> Question:
+        if not -len(self) <= i < len(self):
+            raise IndexError("question index out of range")
+        i %= len(self)
+
+        strings = self.strings
+        start = self._wrong_ends[i - 1] if i else 0
+        asset_id = self._asset_ids[i]
+        if asset_id == PACKED:
+            asset = unpack_fen(bytes(self._fens[i * PACKED_FEN_SIZE:(i + 1) * PACKED_FEN_SIZE]))
+        else:
+            asset = strings[asset_id]
+
+        return Question(text          = strings[self._text_ids[i]],
+                        right_answer  = strings[self._right_ids[i]],
+                        wrong_answers = tuple(strings[j] for j in self._wrong_ids[start:self._wrong_ends[i]]),
+                        asset         = asset)
+
+    def right_answers(self) -> Iterator[str]:
+        strings = self.strings
+        return (strings[i] for i in self._right_ids)
+
+    def nbytes(self) -> int:
+        '''Approximate size of the bank's own storage, in bytes.'''
+        columns = [self._text_ids, self._right_ids, self._wrong_ids,
+                   self._wrong_ends, self._asset_ids]
+        return (sum(column.itemsize * len(column) for column in columns) + len(self._fens)
+                + sum(len(string.encode()) for string in self.strings))
+
+
+def compact_bank(questions: Sequence[Question]) -> CompactBank:
+    if isinstance(questions, CompactBank):
+        return questions
+    return CompactBank(questions)
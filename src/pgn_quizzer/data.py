@@ -1,10 +1,31 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from dataclasses import dataclass, field
+from functools import partial
+from glob import glob
+from importlib import import_module
+from itertools import batched, islice
 from pathlib import Path
-from json import dumps, load
-from random import sample
-from chess import Board
-
+from json import JSONDecodeError, JSONDecoder, dumps, load, loads
+from random import randrange, sample
+import re
+from sys import intern, stderr
+from typing import TextIO
+from time import perf_counter
+
+from pgn_quizzer.cache import BankCache
+from pgn_quizzer.compact import compact_bank
+from pgn_quizzer.distractors import TitleTable
+from pgn_quizzer.header_index import HeaderIndex
 from pgn_quizzer.model import Question
+from pgn_quizzer.pgn_index import PgnIndex, in_comment_after, map_index, open_index
+from pgn_quizzer.profiling import profiled, stage
+from pgn_quizzer.positions import AssetMarkers, Ply, PositionStrategy, parse_position_strategy
+from pgn_quizzer.pqb import CompiledBank, pqb_loader
+from pgn_quizzer.similarity import SimilarityIndex
+from pgn_quizzer.sqlite_bank import SqliteBank, sqlite_loader
+from pgn_quizzer.validation import ValidationReport, validate_data
+from pgn_quizzer.zobrist import PositionIndex, position_key
 
 # pgn input -> storeable JSON -> "data" e.g. strs, lists, dicts -> questions (dataclass objs from model.py)
 
@@ -12,146 +33,751 @@ from pgn_quizzer.model import Question
 # Chess Data Processing
 #-------------------------
 
+# asset positions are marked in the movetext with a PGN command inside a
+# comment, e.g. `12. Rxd4 {[%asset desc1] the rook lift decides}`
+ASSET_COMMAND = re.compile(r"\[%asset\s+(\w+)\]")
+PGN_COMMAND = re.compile(r"\[%[^\]]*\]")
+# brace comments and rest-of-line comments, matched in one pass so that
+# neither kind is cut short by the other's delimiter inside it
+COMMENT = re.compile(r"\{([^}]*)\}|;[^\n]*")
+HEADER = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+MOVETEXT_TOKEN = re.compile(r"\{[^}]*\}|\$\d+|\d+\.+|[^\s{}$]+")
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+# number of titles kept for distractors when streaming a PGN
+TITLE_POOL_SIZE = 1024
+
+# number of games sent to a worker process at a time by parallel construction
+CHUNK_SIZE = 256
+
+# number of characters read at a time when streaming a JSON bank
+JSON_CHUNK_SIZE = 64 * 1024
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+
+# characters which make a source path a glob pattern over many PGN files
+GLOB_CHARACTERS = set("*?[")
+
+# sources compressed with these are decompressed as they are read, by the
+# standard library module named
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+# how wrong answers are picked: uniformly, or by similarity to the right one
+DISTRACTOR_STRATEGIES = ("random", "similar")
+
+
+def source_type(path: Path) -> str:
+    '''The suffix which says what a source holds, looking past a
+    compression suffix: ".pgn" for both games.pgn and games.pgn.gz.'''
+    if path.suffix in COMPRESSIONS:
+        return Path(path.stem).suffix
+    return path.suffix
+
+
+def open_source(path: Path) -> TextIO:
+    '''Opens a source for reading as text; .gz, .bz2 and .xz files are
+    decompressed as a stream, a block at a time.'''
+    module = COMPRESSIONS.get(path.suffix)
+    if module is None:
+        return open(path, mode="r")
+    return import_module(module).open(path, mode="rt") # deferred: only needed here
+
+
+def read_errors() -> tuple[type[Exception], ...]:
+    '''What reading a source may raise, a corrupt .gz or .xz included. Only
+    called once something has gone wrong, so lzma and zlib are not imported
+    before then.'''
+    from lzma import LZMAError
+    from zlib import error as ZlibError
+    # EOFError: a truncated compressed file
+    return (OSError, EOFError, ValueError, LZMAError, ZlibError)
+
+
 @dataclass(frozen=False, order=False)
 class ChessGame:
     title: str
-    fen_assets: dict[str, str] = field(default_factory=dict)
+    fen_assets: dict[str, list[str]] = field(default_factory=dict)
+    tags: dict[str, str] = field(default_factory=dict)
+
+
+def format_title(tags: dict[str, str]) -> str:
+    # e.g. "Steinitz - Lipke, Vienna 1898"
+    def known(tag: str) -> str:
+        value = tags.get(tag, "").strip()
+        return "" if value in ("", "?") else value
+
+    white = known("White").split(",")[0].strip() or "?"
+    black = known("Black").split(",")[0].strip() or "?"
+    year = known("Date")[:4]
+    place = " ".join(part for part in [known("Site"), year if year.isdigit() else ""] if part)
+    return f"{white} - {black}, {place}" if place else f"{white} - {black}"
 
 
 class ChessGameConstructor:
     """
-    TODO: write a docstring
+    Turns PGN text into `ChessGame` objects.
+
+    Each game in the PGN passes through the same pipeline: annotation text
+    and side-lines are stripped, the title is read off the headers, the
+    headers are dropped, and the mainline is replayed to collect the FENs of
+    the positions chosen by `positions` (by default, those marked with
+    `[%asset ...]` commands; see `pgn_quizzer.positions`).
+
+    `pgn` may be a string or any iterable of lines (e.g. an open file), in
+    which case games are read incrementally, or the `PgnIndex` of a file,
+    in which case each game is read straight from its offset without
+    scanning for game boundaries. `construct()` keeps every game
+    in `chessgames` (and its title in `titles` and the deduplicated
+    `title_table`); `iter_construct()` yields them one at a time instead.
+    Games with an illegal or unreadable move are skipped and counted in
+    `nb_skipped_games`, so one bad game does not stop a large file.
     """
     
-    def __init__(self, pgn: str):
+    def __init__(self, pgn: str | Iterable[str], positions: PositionStrategy | None = None):
         self.pgn = pgn
+        self.positions = positions or AssetMarkers()
         self.chessgames = []
         self.titles = []
+        self.title_table = TitleTable()
+        self.nb_skipped_games = 0
+
+    def _lines(self) -> Iterable[str]:
+        if isinstance(self.pgn, str):
+            return self.pgn.splitlines(keepends=True)
+        return self.pgn
+
+    def _iter_games_within_pgn(self) -> Iterator[str]:
+        if isinstance(self.pgn, PgnIndex):
+            yield from profiled(map(self.pgn.read, range(len(self.pgn))), "read")
+            return
+        # a new game starts at the first header line after some movetext; a
+        # line of a wrapped comment which starts with "[" (e.g. "[%clk 0:05]")
+        # is movetext, not a header
+        buffer = []
+        seen_movetext = in_comment = False
+        for line in profiled(self._lines(), "read"):
+            stripped = line.strip()
+            is_header = not in_comment and HEADER.match(stripped) is not None
+            if is_header and seen_movetext:
+                yield "".join(buffer)
+                buffer = []
+                seen_movetext = False
+            elif not is_header and (in_comment or not stripped.startswith("[")):
+                seen_movetext = seen_movetext or bool(stripped)
+                in_comment = in_comment_after(line, in_comment)
+            buffer.append(line)
+        if "".join(buffer).strip():
+            yield "".join(buffer)
 
     def _separate_games_within_pgn(self) -> list[str]:
-        ...
+        return list(self._iter_games_within_pgn())
+
+    @staticmethod
+    def _partition(subpgn: str) -> tuple[list[str], str]:
+        # splits a game into its header lines and its movetext
+        lines = subpgn.splitlines()
+        i = 0
+        while i < len(lines) and (lines[i].strip().startswith("[")
+                                  or not lines[i].strip()):
+            i += 1
+        headers = [line.strip() for line in lines[:i] if line.strip()]
+        return headers, "\n".join(lines[i:])
 
     def _strip_annotation_text(self, subpgn: str) -> str:
-        ...
+        # keep PGN commands (e.g. [%asset desc1]) but drop the prose around them
+        headers, movetext = self._partition(subpgn)
+
+        def keep_commands(comment: re.Match) -> str:
+            if comment.group(1) is None: # a ";" comment
+                return ""
+            commands = PGN_COMMAND.findall(comment.group(1))
+            return "{" + " ".join(commands) + "}" if commands else ""
+
+        movetext = COMMENT.sub(keep_commands, movetext)
+        return "\n".join(headers + ["", movetext])
 
     def _strip_irrelevant_moves(self, subpgn: str) -> str:
-        ...
+        # side-lines (recursive annotation variations) are not part of the game
+        headers, movetext = self._partition(subpgn)
+        mainline = []
+        depth = 0
+        for char in movetext:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth = max(depth - 1, 0)
+            elif depth == 0:
+                mainline.append(char)
+        return "\n".join(headers + ["", "".join(mainline)])
+
+    def _extract_tags(self, subpgn: str) -> dict[str, str]:
+        headers, _ = self._partition(subpgn)
+        tags = {}
+        for line in headers:
+            match = HEADER.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2)
+        return tags
 
     def _extract_title(self, subpgn: str) -> str:
-        ...
+        return format_title(self._extract_tags(subpgn))
 
     def _strip_metadata(self, subpgn: str) -> str:
-        ...
-
-    def _get_fens(self, subpgn: str) -> dict[str, str]:
-        ...
-    
-    def construct(self):
-        list_subpgns = self._separate_games_within_pgn()
-        for subpgn in list_subpgns:
+        _, movetext = self._partition(subpgn)
+        return movetext.strip()
+
+    def _parse_mainline(self, subpgn: str) -> list[Ply]:
+        # plies[0] stands for the starting position
+        plies = [Ply("")]
+        for token in MOVETEXT_TOKEN.findall(subpgn):
+            if token.startswith("{"):
+                plies[-1].asset_descs += ASSET_COMMAND.findall(token)
+            elif token.startswith("$"):
+                plies[-1].annotated = True
+            elif token.endswith("."):
+                continue
+            elif token in RESULTS:
+                break
+            else:
+                san = token.rstrip("!?")
+                plies.append(Ply(san, annotated=san != token))
+        return plies
+
+    def _get_fens(self, subpgn: str) -> dict[str, list[str]]:
+        # the mainline is replayed exactly once, and a FEN is only generated
+        # for the plies selected by the position strategy
+        from chess import Board # deferred: only PGN sources need python-chess
+
+        plies = self._parse_mainline(subpgn)
+        total = len(plies) - 1
+        board = Board()
+        fen_assets = {}
+        for number, ply in enumerate(plies):
+            capture = False
+            if number:
+                move = board.parse_san(ply.san)
+                capture = board.is_capture(move)
+                board.push(move)
+            for desc in self.positions(number, total, ply, capture):
+                fen_assets.setdefault(desc, []).append(board.fen())
+        return fen_assets
+
+    def _construct_game(self, subpgn: str) -> ChessGame:
+        with stage("strip"):
             subpgn = self._strip_annotation_text(subpgn)
             subpgn = self._strip_irrelevant_moves(subpgn)
 
-            subpgn_title = self._extract_title(subpgn)
-            self.titles.append(subpgn_title)
-            
+            subpgn_tags = self._extract_tags(subpgn)
+            subpgn_title = format_title(subpgn_tags)
+
             subpgn = self._strip_metadata(subpgn)
+        with stage("fens"):
             subpgn_asset_fens = self._get_fens(subpgn)
-            
-            game = ChessGame(
-                title      = subpgn_title, 
-                fen_assets = subpgn_asset_fens
-                )
+
+        return ChessGame(
+            title      = subpgn_title,
+            fen_assets = subpgn_asset_fens,
+            tags       = subpgn_tags
+            )
+
+    def _construct_playable_game(self, subpgn: str) -> ChessGame | None:
+        try:
+            return self._construct_game(subpgn)
+        except ValueError: # python-chess's illegal, ambiguous and invalid moves
+            return None
+
+    def iter_construct(self) -> Iterator[ChessGame]:
+        """
+        Lazily constructs games, one per game in the PGN.
+
+        Nothing is kept on the constructor, so when `pgn` is an open file the
+        memory used stays flat however large the file is.
+        """
+        for subpgn in profiled(self._iter_games_within_pgn(), "separate"):
+            game = self._construct_playable_game(subpgn)
+            if game is None:
+                self.nb_skipped_games += 1
+            else:
+                yield game
+
+    def sample_titles(self, k: int) -> list[str]:
+        """
+        Reservoir-samples up to `k` titles from the PGN, reading headers only.
+        """
+        titles = map(self._extract_title, self._iter_games_within_pgn())
+        return reservoir_sample(titles, k)
+    
+    def construct(self, workers: int = 1, chunk_size: int = CHUNK_SIZE):
+        """
+        Constructs every game in the PGN, filling `chessgames` and `titles`.
+
+        With `workers > 1` the games are split into chunks of `chunk_size`
+        and constructed in a pool of worker processes. Results are merged in
+        submission order, so the outcome is identical to a serial run.
+        """
+        if workers <= 1:
+            games = self.iter_construct()
+        else:
+            games = self._construct_in_parallel(workers, chunk_size)
+
+        for game in games:
+            self.titles.append(game.title)
+            self.title_table.add(game.title)
             self.chessgames.append(game)
 
+    def _construct_in_parallel(self, workers: int, chunk_size: int) -> Iterator[ChessGame]:
+        subpgns = profiled(self._iter_games_within_pgn(), "separate")
+        for game in construct_each_game(subpgns, self.positions, workers, chunk_size):
+            if game is None:
+                self.nb_skipped_games += 1
+            else:
+                yield game
+
+
+def construct_each_game(subpgns: Iterable[str], positions: PositionStrategy, workers: int = 1,
+                        chunk_size: int = CHUNK_SIZE) -> Iterator[ChessGame | None]:
+    """
+    Constructs each of `subpgns` (the text of one game each), in order,
+    yielding None in place of a game skipped for an illegal or unreadable
+    move.
+
+    With `workers > 1` the games are constructed in chunks of `chunk_size`
+    in a pool of worker processes. Chunks are submitted as earlier ones
+    finish, with at most `workers` being constructed and as many more
+    queued, so only those chunks (not every game) are held in memory.
+    """
+    if workers <= 1:
+        yield from map(ChessGameConstructor("", positions)._construct_playable_game, subpgns)
+        return
+    chunks = batched(subpgns, chunk_size)
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(_construct_games, chunk, positions)
+                        for chunk in islice(chunks, 2 * workers))
+        while pending:
+            games = pending.popleft().result()
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(_construct_games, chunk, positions))
+            yield from games
+
+
+def reservoir_sample(items: Iterable, k: int) -> list:
+    '''Uniformly samples up to `k` items in a single pass (Algorithm R).'''
+    reservoir = []
+    for i, item in enumerate(items):
+        if i < k:
+            reservoir.append(item)
+        else:
+            j = randrange(i + 1)
+            if j < k:
+                reservoir[j] = item
+    return reservoir
+
+
+def _construct_games(subpgns: tuple[str, ...],
+                     positions: PositionStrategy) -> list[ChessGame | None]:
+    # module-level so that worker processes can unpickle it; None stands
+    # for a skipped game
+    constructor = ChessGameConstructor("", positions)
+    return [constructor._construct_playable_game(subpgn) for subpgn in subpgns]
+
+
+def warn_skipped_games(nb_skipped_games: int, source: Path) -> None:
+    if nb_skipped_games:
+        print(f"--warning: skipped {nb_skipped_games} games of {source} "
+              f"with an illegal or unreadable move", file=stderr)
+
+
+def pgn_index(path: Path) -> PgnIndex | None:
+    '''The offset index of an uncompressed PGN file (see `open_index`), or
+    None for a compressed one, which can't be memory-mapped.'''
+    return open_index(path) if path.suffix == ".pgn" else None
+
+
+def indexed_titles(index: PgnIndex) -> list[str]:
+    '''Titles of every game in an indexed PGN, without reading any movetext.'''
+    return [format_title(index.tags(i)) for i in range(len(index))]
+
+
+def construct_indexed_game(index: PgnIndex, i: int) -> ChessGame:
+    '''Constructs game `i` of an indexed PGN, read straight from its offset.'''
+    return ChessGameConstructor("")._construct_game(index.read(i))
+
 
 def sample_with_avoidance(lst: list[str], k: int, bad_val: str):
-    while True:
-        sample_attempt = sample(lst, k)
-        if bad_val not in sample_attempt:
-            break
-    return sample_attempt
+    table = TitleTable(lst)
+    return [table.titles[i] for i in table.sample_excluding(k, table.ids.get(bad_val))]
+
 
+DEFAULT_QUESTION_TEXT = "Which game is the following position from?"
+# the prompts of `[%asset ...]` descriptors with one of their own; any other
+# descriptor asks DEFAULT_QUESTION_TEXT
+QUESTION_TEXT: dict[str, str] = {}
 
-# TODO: the following function is delicately implemented and needs to be tested well
-def generate_question_data(game: ChessGame, constructor: ChessGameConstructor, nb_options: int):
+
+def _iter_question_slots(game: ChessGame) -> Iterator[tuple[str, str]]:
+    # (question text, fen) for every asset position of the game
+    for desc in game.fen_assets.keys():
+        for fen in game.fen_assets[desc]:
+            yield QUESTION_TEXT.get(desc, DEFAULT_QUESTION_TEXT), fen
+
+
+def generate_question_data(game: ChessGame, constructor: ChessGameConstructor, nb_options: int,
+                           strategy: TitleTable | SimilarityIndex | None = None):
     """
-    TODO: write a docstring
+    Generates the question data for every asset position of `game`.
+
+    Wrong answers are distinct titles from `constructor.title_table` other
+    than the game's own; if the table holds fewer than `nb_options` of
+    them, every one is used. By default they are drawn uniformly at random;
+    pass a `SimilarityIndex` as `strategy` for plausible ones instead.
     """
-    
-    question_text = {
-        "desc1": "a",
-        "desc2": "b",
-        "desc3": "c",
-        }
-    
-    question_data = {
-        "text": "",
+    return generate_bank_question_data([game], constructor.title_table, nb_options, strategy)
+
+
+def generate_bank_question_data(games: Iterable[ChessGame], table: TitleTable, nb_options: int,
+                                strategy: TitleTable | SimilarityIndex | None = None,
+                                positions: PositionIndex | None = None) -> list[dict]:
+    '''Generates the question data for many games with one batched draw of
+    wrong answers from `strategy` (by default, `table` itself). Positions
+    that `positions` has seen in more than one game are skipped. Each
+    question keeps its game's headers (one dict per game), so that games
+    sharing a title can still be told apart.'''
+    if strategy is None:
+        strategy = table
+    slots = [(game, text, fen) for game in games
+             for text, fen in _iter_question_slots(game)]
+    if positions is not None:
+        slots = [slot for slot in slots if not is_ambiguous_position(positions, slot[2])]
+    exclude_ids = [table.ids.get(game.title) for game, _, _ in slots]
+    k = min([nb_options] + [table.max_distractors(i) for i in set(exclude_ids)])
+    options = strategy.sample_batch(exclude_ids, k)
+
+    return [{
+        "text": text,
         "right_answer": game.title, # N.B.
-        "wrong_answers": [],
-        "assets": []
-        }
-    
-    question_list = []
+        "wrong_answers": wrong_answers,
+        "asset": fen,
+        "headers": game.tags
+        } for (game, text, fen), wrong_answers in zip(slots, options)]
 
-    for desc in game.fen_assets.keys():
-        question_data["text"] = question_text[desc]
 
-        for fen in game.fen_assets[desc]:
-            options = sample_with_avoidance(constructor.titles, nb_options, game.title)
-            question_data["wrong_answers"] = options
-            question_data["assets"] = fen
+def index_positions(games: Iterable[ChessGame], table: TitleTable) -> PositionIndex:
+    '''Indexes every asset position of `games` by Zobrist key and title id.'''
+    positions = PositionIndex()
+    for game in games:
+        title_id = table.add(game.title)
+        for _, fen in _iter_question_slots(game):
+            key = position_key(fen)
+            if key is not None:
+                positions.add(key, title_id)
+    return positions
 
-            question_list.append(question_data)
-    
-    return question_list
+
+def is_ambiguous_position(positions: PositionIndex, fen: str) -> bool:
+    key = position_key(fen)
+    return key is not None and positions.is_ambiguous(key)
 
 
 # I guess at this stage I'm including this function just in case
 # TODO: decide what you want to do with this function
 def pgn_to_json(path: str, nb_options=3) -> str:
-    with open(path, mode="r") as pgn_text:
-        pgn = str(pgn_text)
-    
-    json_array_list = []
-    constructor = ChessGameConstructor(pgn)
-    constructor.construct()
-
-    for game in constructor.chessgames:
-        question_data_list = generate_question_data(game, constructor, nb_options)
-        json_array_list += question_data_list
-    
+    with open_source(Path(path)) as pgn_file:
+        constructor = ChessGameConstructor(pgn_file)
+        constructor.construct()
+    warn_skipped_games(constructor.nb_skipped_games, path)
+
+    json_array_list = generate_bank_question_data(constructor.chessgames,
+                                                  constructor.title_table, nb_options)
+    for q in json_array_list:
+        del q["headers"]
     return dumps(json_array_list)
 
 
+def iter_pgn_games(path: Path, nb_options=3, title_pool_size=TITLE_POOL_SIZE,
+                   index: PgnIndex | None = None) -> Iterator[tuple[ChessGame, list[dict]]]:
+    """
+    Streams a PGN file, yielding each game together with its question data.
+
+    If the file has a saved offset index (`index`, or its sidecar, which is
+    memory-mapped with its header strings left on disk; see `map_index`),
+    the title pool for the wrong answers is sampled from it, and the games
+    are constructed one at a time, each read straight from its offset.
+    Otherwise (no sidecar yet, or a compressed file) the file is read twice:
+    once (headers only) to reservoir-sample the pool, then once more to
+    construct the games. Only the current game and the title pool are ever
+    held in memory, so this works for PGN files of any size.
+    """
+    if nb_options > 6:
+        raise ValueError("More than 6 options is too many! "
+                         "Choose a number of options less than 7.")
+    if index is None and path.suffix == ".pgn":
+        index = map_index(path) # not built here: building holds every game's headers
+    if index is not None:
+        picks = sample(range(len(index)), min(title_pool_size, len(index)))
+        title_pool = [format_title(index.tags(i)) for i in picks]
+    else:
+        with open_source(path) as pgn_file:
+            title_pool = ChessGameConstructor(pgn_file).sample_titles(title_pool_size)
+
+    with open_source(path) if index is None else index as pgn:
+        constructor = ChessGameConstructor(pgn)
+        constructor.titles = title_pool
+        constructor.title_table = TitleTable(title_pool)
+        for game in constructor.iter_construct():
+            with stage("questions"):
+                question_data = generate_question_data(game, constructor, nb_options)
+            yield game, question_data
+    warn_skipped_games(constructor.nb_skipped_games, path)
+
+
+def iter_pgn_headers(path: Path) -> Iterator[dict[str, str]]:
+    '''Headers of every game in a PGN file, without replaying any moves.'''
+    with open_source(path) as pgn_file:
+        constructor = ChessGameConstructor(pgn_file)
+        yield from map(constructor._extract_tags, constructor._iter_games_within_pgn())
+
+
 #-------------------------
 # Quiz Data Processing
 #-------------------------
 
-def pgn_loader(path: Path, nb_options=3) -> list[dict]:
+def _check_pgn_options(nb_options: int, distractors: str) -> None:
     if nb_options > 6:
         raise ValueError("More than 6 options is too many! "
                          "Choose a number of options less than 7.")
-    with open(path, mode="r") as pgn_file:
-        pgn = pgn_file.read()
-    
-    constructor = ChessGameConstructor(pgn)
-    constructor.construct()
-    question_data = []
+    if distractors not in DISTRACTOR_STRATEGIES:
+        raise ValueError(f"Unknown distractor strategy {distractors!r}.")
+
+
+def _games_question_data(games: list[ChessGame], table: TitleTable, nb_options: int,
+                         distractors: str, unique_positions: bool) -> list[dict]:
+    with stage("questions"):
+        strategy = None
+        if distractors == "similar":
+            strategy = SimilarityIndex(games, table)
+        positions = None
+        if unique_positions:
+            positions = index_positions(games, table)
+        return generate_bank_question_data(games, table, nb_options, strategy, positions)
+
+
+def pgn_loader(path: Path, nb_options=3, workers=1, distractors="random",
+               unique_positions=False, positions="assets") -> list[dict]:
+    _check_pgn_options(nb_options, distractors)
+    position_strategy = parse_position_strategy(positions)
+    index = pgn_index(path)
+    with open_source(path) if index is None else index as pgn:
+        constructor = ChessGameConstructor(pgn, position_strategy)
+        constructor.construct(workers=workers)
+    warn_skipped_games(constructor.nb_skipped_games, path)
+
+    return _games_question_data(constructor.chessgames, constructor.title_table,
+                                nb_options, distractors, unique_positions)
+
+
+@dataclass
+class FileProgress:
+    path: Path
+    number: int # 1-based, in load order
+    nb_files: int
+    nb_games: int
+    nb_bytes: int
+    seconds: float # spent constructing this file's games
+    nb_skipped_games: int = 0 # with an illegal or unreadable move
+
+    def __str__(self) -> str:
+        rate = self.nb_bytes / 2**20 / self.seconds if self.seconds else float("inf")
+        skipped = f" ({self.nb_skipped_games} skipped)" if self.nb_skipped_games else ""
+        return (f"[{self.number}/{self.nb_files}] {self.path}: {self.nb_games} games{skipped} "
+                f"in {self.seconds:.2f} s ({rate:.1f} MiB/s)")
+
+
+def source_paths(source_path: Path) -> list[Path]:
+    '''The files a source stands for: every PGN (compressed or not) under a directory or
+    matching a glob pattern (`**` included), or else just itself. A file whose name merely
+    looks like a pattern (e.g. "Linares [2024].pgn") is just itself.'''
+    if source_path.is_file():
+        return [source_path]
+    if source_path.is_dir():
+        return sorted(path for path in source_path.rglob("*.pgn*")
+                      if path.is_file() and source_type(path) == ".pgn")
+    if is_glob(source_path):
+        return sorted(path for path in map(Path, glob(str(source_path), recursive=True))
+                      if path.is_file() and source_type(path) == ".pgn")
+    return [source_path]
+
+
+def is_glob(source_path: Path) -> bool:
+    # a path is only read as a pattern if there is no such file or directory
+    return bool(GLOB_CHARACTERS & set(str(source_path))) and not source_path.exists()
+
+
+def is_multi_file_source(source_path: Path) -> bool:
+    return source_path.is_dir() or is_glob(source_path)
+
+
+def _construct_file(path: Path,
+                    positions: PositionStrategy) -> tuple[list[ChessGame], int, float]:
+    # module-level so that worker processes can unpickle it
+    start = perf_counter()
+    with open_source(path) as pgn_file:
+        constructor = ChessGameConstructor(pgn_file, positions)
+        games = list(constructor.iter_construct())
+    return games, constructor.nb_skipped_games, perf_counter() - start
+
+
+def _construct_files(paths: list[Path], positions: PositionStrategy,
+                     workers: int) -> Iterator[tuple[int, list[ChessGame], int, float]]:
+    # yields (file number, games, skipped games, seconds) as files finish, with at most
+    # `workers` files being constructed and as many more queued at a time
+    # a file which can't be read is named in the error, as it is one of many
+    if workers <= 1:
+        for i, path in enumerate(paths):
+            try:
+                result = _construct_file(path, positions)
+            except read_errors() as e:
+                raise ValueError(f"{path}: {e}") from e
+            yield i, *result
+        return
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending, queue = {}, iter(enumerate(paths))
+        for i, path in islice(queue, 2 * workers):
+            pending[executor.submit(_construct_file, path, positions)] = i
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    result = future.result()
+                except read_errors() as e:
+                    raise ValueError(f"{paths[i]}: {e}") from e
+                yield i, *result
+                for i, path in islice(queue, 1):
+                    pending[executor.submit(_construct_file, path, positions)] = i
+
+
+def pgn_files_loader(paths: list[Path], nb_options=3, workers=1, distractors="random",
+                     unique_positions=False, positions="assets",
+                     progress: Callable[[FileProgress], None] | None = None) -> list[dict]:
+    """
+    Loads many PGN files as one bank.
 
-    for game in constructor.chessgames:
-        question_data += generate_question_data(game, constructor, nb_options)
-    
-    return question_data
+    Each file's games are constructed in a pool of `workers` processes (one
+    file per task), and reported to `progress` as each file finishes. The
+    games are then merged in the order of `paths`, with one title table
+    for them all, so that wrong answers are drawn across files.
+    """
+    _check_pgn_options(nb_options, distractors)
+    if not paths:
+        raise FileNotFoundError("no PGN files found")
+    position_strategy = parse_position_strategy(positions)
+    games_by_file: list[list[ChessGame]] = [[] for _ in paths]
+    for number, (i, games, nb_skipped_games, seconds) in enumerate(
+            _construct_files(paths, position_strategy, workers), start=1):
+        games_by_file[i] = games
+        warn_skipped_games(nb_skipped_games, paths[i])
+        if progress is not None:
+            progress(FileProgress(paths[i], number, len(paths), len(games),
+                                  paths[i].stat().st_size, seconds, nb_skipped_games))
+
+    games = [game for file_games in games_by_file for game in file_games]
+    table = TitleTable(game.title for game in games)
+    return _games_question_data(games, table, nb_options, distractors, unique_positions)
 
 
 def json_loader(path: Path) -> list[dict]:
     '''Validated at runtime.'''
-    with open(path, mode='r') as json:
+    if source_type(path) in NDJSON_SUFFIXES or path.suffix in COMPRESSIONS:
+        # read in chunks, so the decompressed text is never held whole
+        return list(iter_json_records(path))
+    with stage("read"), open(path, mode='r') as json:
         question_data = load(json)
     return question_data
 
 
+def iter_json_records(path: Path, chunk_size=JSON_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Incrementally reads the records of a JSON array, or of an NDJSON file
+    (`.ndjson` / `.jsonl`, one record per line), compressed or not.
+
+    Only `chunk_size` characters plus the record being decoded are held in
+    memory at a time. Records are not validated.
+    """
+    with open_source(path) as json_file:
+        if source_type(path) in NDJSON_SUFFIXES:
+            for line in json_file:
+                if line.strip():
+                    yield loads(line)
+            return
+
+        decoder = JSONDecoder()
+        buffer, pos, eof = "", 0, False
+
+        def fill(buffer: str, pos: int) -> tuple[str, int, bool]:
+            chunk = json_file.read(chunk_size)
+            return buffer[pos:] + chunk, 0, not chunk
+
+        def skip_whitespace(buffer: str, pos: int) -> int:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            return pos
+
+        expecting = "["
+        while True:
+            pos = skip_whitespace(buffer, pos)
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"unexpected end of JSON in {path}")
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+
+            char = buffer[pos]
+            if expecting == "[":
+                if char != "[":
+                    raise ValueError(f"expected a JSON array in {path}")
+                pos += 1
+                expecting = "first record"
+            elif char == "]" and expecting in ("first record", ","):
+                return
+            elif char == "," and expecting == ",":
+                pos += 1
+                expecting = "record"
+            elif expecting in ("first record", "record"):
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except JSONDecodeError:
+                    end = None
+                # a value running up to the end of the buffer may be truncated
+                if end is None or (end == len(buffer) and not eof):
+                    if eof:
+                        raise ValueError(f"malformed JSON record in {path}")
+                    buffer, pos, eof = fill(buffer, pos)
+                    continue
+                yield record
+                pos = end
+                expecting = ","
+            else:
+                raise ValueError(f"malformed JSON array in {path}")
+
+
+def stream_quiz_questions(path: Path, length: int) -> list[Question]:
+    """
+    Draws `length` valid questions from a JSON or NDJSON bank in one pass.
+
+    Records are validated as they stream past and reservoir-sampled, so the
+    full bank is never held in memory.
+    """
+    valid_data = filter(is_valid_record, iter_json_records(path))
+    return parse_data(reservoir_sample(valid_data, length))
+
+
+def is_valid_record(record) -> bool:
+    return isinstance(record, dict) and is_valid_data(record)
+
+
 def is_valid_data(q: dict) -> bool:
     # the data values must be of the correct types
     if not isinstance(q.get("text"), str):
@@ -176,14 +802,46 @@ def is_valid_data(q: dict) -> bool:
     return valid
 
 
-def parse_data(question_data: list[dict]) -> list[Question]:
+def drop_ambiguous_questions(question_data: list[dict]) -> list[dict]:
+    '''Drops the questions whose position is also the asset of a question
+    with a different right answer.'''
+    table = TitleTable()
+    positions = PositionIndex()
+    keys = []
+    for q in question_data:
+        key = position_key(q["asset"]) if isinstance(q.get("asset"), str) else None
+        keys.append(key)
+        if key is not None and isinstance(q.get("right_answer"), str):
+            positions.add(key, table.add(q["right_answer"]))
+    return [q for q, key in zip(question_data, keys)
+            if key is None or not positions.is_ambiguous(key)]
+
+
+def parse_data(question_data: list[dict], drop_ambiguous: bool = False,
+               workers: int = 1, report: ValidationReport | None = None,
+               headers: list | None = None) -> list[Question]:
     '''Generates list of Question objects from question data; invalid data
-    is ignored (skipped over).'''
-
-    valid_data = filter(is_valid_data, question_data)
-    return [Question(text          = q["text"],
-                     right_answer  = q["right_answer"],
-                     wrong_answers = q["wrong_answers"],
+    is ignored (skipped over) and, if a `report` is given, recorded in it.
+    With `drop_ambiguous`, so are questions whose position occurs in more
+    than one game. If a `headers` list is given, the game headers of each
+    question (None if its data has none) are appended to it.'''
+
+    if drop_ambiguous:
+        question_data = drop_ambiguous_questions(question_data)
+
+    with stage("validate"):
+        valid_data, validation = validate_data(question_data, workers=workers)
+    if report is not None:
+        report.nb_records = validation.nb_records
+        report.rejected_rows = validation.rejected_rows
+        report.reason_codes = validation.reason_codes
+    if headers is not None:
+        headers.extend(q.get("headers") for q in valid_data)
+
+    # repeated prompts and titles share one string object
+    return [Question(text          = intern(q["text"]),
+                     right_answer  = intern(q["right_answer"]),
+                     wrong_answers = tuple(map(intern, q["wrong_answers"])),
                      asset         = q["asset"])
             for q in valid_data
             ]
@@ -193,11 +851,34 @@ def parse_data(question_data: list[dict]) -> list[Question]:
 # Create Question Bank
 #-------------------------
 
-def create_question_bank(source_path: Path) -> list[Question]:
-    file_type = source_path.suffix
+def create_question_bank(source_path: Path, workers: int = 1, nb_options: int = 3,
+                         cache: BankCache | None = None,
+                         distractors: str = "random",
+                         compact: bool = False,
+                         unique_positions: bool = False,
+                         positions: str = "assets") -> Sequence[Question]:
+    if is_multi_file_source(source_path):
+        # a directory or glob of PGN files; not cached, as no single file stands for it
+        try:
+            data = pgn_files_loader(source_paths(source_path), nb_options=nb_options,
+                                    workers=workers, distractors=distractors,
+                                    unique_positions=unique_positions, positions=positions,
+                                    progress=lambda file: print(f"--progress: {file}", file=stderr))
+        except read_errors() as e:
+            raise SystemExit(f"--error: unable to load PGN files from {source_path}: {e}")
+        # the PGN loaders already left out ambiguous positions
+        return _compact(*_parse_bank(data, False, workers, index_headers=True), compact)
+
+    file_type = source_type(source_path)
     loader_dict = {
         ".json": json_loader,
-        ".pgn": pgn_loader
+        ".ndjson": json_loader,
+        ".jsonl": json_loader,
+        ".pgn": partial(pgn_loader, nb_options=nb_options, workers=workers,
+                        distractors=distractors, unique_positions=unique_positions,
+                        positions=positions),
+        ".pqb": pqb_loader,
+        ".sqlite": sqlite_loader,
     }
     loader = loader_dict.get(file_type)
 
@@ -206,12 +887,55 @@ def create_question_bank(source_path: Path) -> list[Question]:
         raise SystemExit(
             f"--error: problem loading PGN or JSON from {source_path}"
         )
+
+    # options which change the questions produced from the source
+    cache_options = ({"nb_options": nb_options, "distractors": distractors,
+                      "positions": positions, "prompt": DEFAULT_QUESTION_TEXT}
+                     if file_type == ".pgn" else {})
+    if unique_positions:
+        cache_options["unique_positions"] = True
+    use_cache = cache is not None and file_type not in (".pqb", ".sqlite")
     
     try:
-            data = loader(source_path)
-    except (FileNotFoundError, ValueError) as e:
+        if use_cache and (cached := cache.get(source_path, cache_options)) is not None:
+            return cached
+        data = loader(source_path)
+    except read_errors() as e:
         raise SystemExit(
             f"--error: unable to find {file_type} at {source_path}: {e}"
         )
     else:
-        return parse_data(data)
\ No newline at end of file
+        if isinstance(data, (CompiledBank, SqliteBank)):
+            return data # validated when it was compiled
+        drop_ambiguous = unique_positions and file_type != ".pgn" # else done by pgn_loader
+        question_bank, header_index = _parse_bank(data, drop_ambiguous, workers,
+                                                  index_headers=file_type == ".pgn")
+        if use_cache:
+            cache.put(source_path, cache_options, question_bank, header_index)
+        return _compact(question_bank, header_index, compact)
+
+
+def _parse_bank(data: list[dict], drop_ambiguous: bool, workers: int,
+                index_headers: bool = False) -> tuple[list[Question], HeaderIndex | None]:
+    # with `index_headers`, the questions are indexed by the headers of their games
+    report = ValidationReport()
+    headers = [] if index_headers else None
+    question_bank = parse_data(data, drop_ambiguous=drop_ambiguous,
+                               workers=workers, report=report, headers=headers)
+    if report.nb_rejected:
+        print(f"--warning: {report.summary()}", file=stderr)
+    header_index = None
+    if headers:
+        # every question of a game shares its headers dict
+        header_index = HeaderIndex.build_by_game(map(id, headers),
+                                                 {id(tags): tags for tags in headers})
+    return question_bank, header_index
+
+
+def _compact(question_bank: list[Question], header_index: HeaderIndex | None,
+             compact: bool) -> Sequence[Question]:
+    if not compact:
+        return question_bank
+    bank = compact_bank(question_bank)
+    bank.header_index = header_index # for filtered quizzes; see `HeaderIndex`
+    return bank
\ No newline at end of file
@@ -0,0 +1,65 @@
+from collections.abc import Iterable, Sequence
+from random import Random
+
+_random = Random()
+
+
+class TitleTable:
+    """
+    Deduplicated table of game titles, each interned under an integer id.
+
+    Wrong answers are drawn as ids: `sample_excluding` picks k distinct ids
+    other than the right answer's in O(k), without the retry loop of
+    rejection sampling, and `sample_batch` serves a whole bank's worth of
+    questions in one call.
+
+    Attributes:
+        titles (list[str]): Distinct titles, indexed by id.
+        ids (dict[str, int]): Id of each title.
+    """
+
+    def __init__(self, titles: Iterable[str] = (), rng: Random | None = None):
+        self.titles: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.rng = rng or _random
+        for title in titles:
+            self.add(title)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.ids
+
+    def add(self, title: str) -> int:
+        title_id = self.ids.get(title)
+        if title_id is None:
+            title_id = self.ids[title] = len(self.titles)
+            self.titles.append(title)
+        return title_id
+
+    def max_distractors(self, exclude_id: int | None) -> int:
+        return len(self.titles) - (exclude_id is not None)
+
+    def sample_excluding(self, k: int, exclude_id: int | None) -> list[int]:
+        """
+        Samples `k` distinct ids, none of which is `exclude_id`.
+
+        Raises:
+            ValueError: If there are fewer than `k` ids to choose from.
+        """
+        available = self.max_distractors(exclude_id)
+        if k > available:
+            raise ValueError(f"Cannot pick {k} wrong answers from {available} other titles.")
+        # sample from the ids with exclude_id removed, then shift past the gap
+        picks = self.rng.sample(range(available), k)
+        if exclude_id is None:
+            return picks
+        return [i + (i >= exclude_id) for i in picks]
+
+    def sample_batch(self, exclude_ids: Sequence[int | None], k: int) -> list[list[str]]:
+        '''Samples `k` wrong-answer titles for each entry of `exclude_ids`.'''
+        titles = self.titles
+        sample_excluding = self.sample_excluding
+        return [[titles[i] for i in sample_excluding(k, exclude_id)]
+                for exclude_id in exclude_ids]
@@ -0,0 +1,214 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from fnmatch import fnmatchcase
+from json import dumps, loads
+from pathlib import Path
+import re
+import struct
+
+from pgn_quizzer.model import Question
+
+# Inverted index over the PGN headers behind each question, for filtered
+# quizzes (`--player`, `--years`, `--eco`).
+#
+# Every question is filed under the words of both players' names, the
+# game's year and its ECO code; each term's posting list is a sorted array
+# of question indices. It is built in one pass when the bank is loaded,
+# reading only the questions' right answers (their game titles), so a
+# filter is answered by merging and intersecting posting lists rather than
+# by scanning the bank. A game's headers come from the PGN when there is
+# one, otherwise from its title (see `format_title`).
+#
+# A bank loaded from PGN is indexed by game as it is loaded, and the index
+# is cached next to the compiled bank (see `BankCache`), so a warm start
+# doesn't read the PGN again for its headers. On disk it is MAGIC, the
+# length of a JSON blob listing each table's terms and posting lengths, the
+# blob, then every posting list in the same order.
+
+MAGIC = b"PQHDX1\0\0"
+BLOB_SIZE = struct.Struct("<Q")
+TABLES = ("players", "years", "ecos")
+
+WORD = re.compile(r"\w+")
+YEAR = re.compile(r"\b(\d{4})$")
+
+
+def name_words(name: str) -> list[str]:
+    return WORD.findall(name.casefold())
+
+
+def title_tags(title: str) -> dict[str, str]:
+    '''Players and year read back from a title like "Steinitz - Lipke, Vienna 1898".'''
+    white, _, rest = title.partition(" - ")
+    black, _, place = rest.partition(", ")
+    match = YEAR.search(place)
+    return {"White": white, "Black": black, "Date": match.group(1) if match else ""}
+
+
+def iter_right_answers(question_bank: Sequence[Question]) -> Iterable[str]:
+    '''The right answer of every question, without building the questions
+    when the bank can list them directly.'''
+    right_answers = getattr(question_bank, "right_answers", None)
+    if right_answers is not None:
+        return right_answers()
+    return (question.right_answer for question in question_bank)
+
+
+def _contains(posting: array, i: int) -> bool:
+    j = bisect_left(posting, i)
+    return j < len(posting) and posting[j] == i
+
+
+def _union(postings: list[array]) -> array:
+    if len(postings) == 1:
+        return postings[0]
+    return array("I", sorted(set().union(*postings)))
+
+
+class HeaderIndex:
+    """
+    Posting lists of question indices by player name word, year and ECO code.
+
+    Attributes:
+        players (dict[str, array]): Questions by (casefolded) word of either player's name.
+        years (dict[int, array]): Questions by year of the game.
+        ecos (dict[str, array]): Questions by ECO code of the game.
+    """
+
+    def __init__(self):
+        self.players: dict[str, array] = {}
+        self.years: dict[int, array] = {}
+        self.ecos: dict[str, array] = {}
+        self.nb_questions = 0
+
+    @classmethod
+    def build(cls, question_bank: Sequence[Question],
+              headers: Iterable[Mapping[str, str]] = ()) -> "HeaderIndex":
+        '''Indexes every question of `question_bank` under the headers of
+        its game: the entry of `headers` matching its title, if any.'''
+        from pgn_quizzer.data import format_title # data imports the banks this indexes
+
+        tags_by_title = {format_title(tags): tags for tags in headers}
+        return cls._build(iter_right_answers(question_bank),
+                          lambda title: tags_by_title.get(title) or title_tags(title))
+
+    @classmethod
+    def build_by_game(cls, question_games: Iterable[int],
+                      tags_by_game: Mapping[int, Mapping[str, str]]) -> "HeaderIndex":
+        '''Indexes every question under the headers of its own game, given
+        the game of each question in order (e.g. from an `SqliteBank`), so
+        that games sharing a title are told apart.'''
+        return cls._build(question_games, lambda game: tags_by_game.get(game, {}))
+
+    @classmethod
+    def _build(cls, question_games: Iterable[Hashable],
+               tags_of: Callable[[Hashable], Mapping[str, str]]) -> "HeaderIndex":
+        # the terms of each game are worked out once, however many questions it has
+        index = cls()
+        terms_by_game: dict[Hashable, tuple] = {}
+        for i, game in enumerate(question_games):
+            terms = terms_by_game.get(game)
+            if terms is None:
+                terms = terms_by_game[game] = index._terms(tags_of(game))
+            for postings, term in terms:
+                posting = postings.get(term)
+                if posting is None:
+                    posting = postings[term] = array("I")
+                posting.append(i)
+            index.nb_questions = i + 1
+        return index
+
+    def save(self, path: Path) -> None:
+        '''Writes the index to `path`, to be read back by `load`.'''
+        blob = dumps({"nb_questions": self.nb_questions,
+                      **{table: [[term, len(posting)] for term, posting in getattr(self, table).items()]
+                         for table in TABLES}}).encode()
+        with open(path, "wb") as index_file:
+            index_file.write(MAGIC)
+            index_file.write(BLOB_SIZE.pack(len(blob)))
+            index_file.write(blob)
+            for table in TABLES:
+                for posting in getattr(self, table).values():
+                    posting.tofile(index_file)
+
+    @classmethod
+    def load(cls, path: Path) -> "HeaderIndex":
+        '''Reads back an index saved by `save`.
+
+        Raises:
+            ValueError: If `path` is not a whole header index.
+        '''
+        index = cls()
+        with open(path, "rb") as index_file:
+            if index_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a header index")
+            try:
+                size, = BLOB_SIZE.unpack(index_file.read(BLOB_SIZE.size))
+                blob = loads(index_file.read(size))
+                index.nb_questions = blob["nb_questions"]
+                for table in TABLES:
+                    postings = getattr(index, table)
+                    for term, length in blob[table]:
+                        posting = postings[term] = array("I")
+                        posting.fromfile(index_file, length)
+            except (struct.error, EOFError, KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{path} is not a whole header index") from e
+        return index
+
+    def _terms(self, tags: Mapping[str, str]) -> tuple:
+        words = {word for side in ("White", "Black") for word in name_words(tags.get(side, ""))}
+        terms = [(self.players, word) for word in sorted(words)]
+        year = tags.get("Date", "")[:4]
+        if year.isdigit():
+            terms.append((self.years, int(year)))
+        eco = tags.get("ECO", "").strip().upper()
+        if eco and eco != "?":
+            terms.append((self.ecos, eco))
+        return tuple(terms)
+
+    def select(self, players: Iterable[str] = (), years: tuple[int, int] | None = None,
+               eco: Iterable[str] = ()) -> array:
+        """
+        Sorted indices of the questions from games matching every filter:
+        a player whose name has each word of each of `players`, a year
+        within `years` (inclusive), and an ECO code matching one of the
+        `eco` patterns (e.g. "B*", "C4?"). Filters left empty match anything.
+        """
+        # each filter is a union of posting lists; the filters are intersected
+        filters = [[self.players.get(word, array("I"))] for name in players
+                   for word in name_words(name)]
+        if years is not None:
+            first, last = years
+            filters.append([posting for year, posting in self.years.items()
+                            if first <= year <= last])
+        patterns = [pattern.upper() for pattern in eco]
+        if patterns:
+            filters.append([posting for code, posting in self.ecos.items()
+                            if any(fnmatchcase(code, pattern) for pattern in patterns)])
+        if not filters:
+            return array("I", range(self.nb_questions))
+
+        filters.sort(key=lambda postings: sum(map(len, postings)))
+        selected = _union(filters[0])
+        for postings in filters[1:]:
+            if not selected:
+                break
+            # look the few remaining candidates up in the bigger lists
+            selected = array("I", (i for i in selected
+                                   if any(_contains(posting, i) for posting in postings)))
+        return selected
+
+
+class FilteredBank(Sequence[Question]):
+    '''The questions of `question_bank` at `indices`, as a bank of their own.'''
+
+    def __init__(self, question_bank: Sequence[Question], indices: array):
+        self.question_bank = question_bank
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> Question:
+        return self.question_bank[self.indices[i]]
@@ -0,0 +1,378 @@
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from hashlib import blake2b
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from random import Random
+import re
+import sqlite3
+from time import sleep
+
+from pgn_quizzer.data import RESULTS, ChessGame, _iter_question_slots, construct_each_game
+from pgn_quizzer.pgn_index import build_index
+from pgn_quizzer.positions import parse_position_strategy
+from pgn_quizzer.profiling import stage
+from pgn_quizzer.sqlite_bank import (APPLICATION_ID, add_identity, fen_ply, game_row,
+                                     write_sqlite_bank)
+
+# Incremental ingestion of a PGN into an SQLite question bank (`--append`).
+#
+# Every game taken into the bank is recorded in an `ingested_games` table by
+# source, byte offset, length and a digest of its text. On the next run the
+# last recorded game is checked in place: if it is unchanged, the file has
+# only grown, and just the bytes after it are scanned. Otherwise the whole
+# file is scanned, and only games whose digest is new are taken. Either
+# way only the new games are replayed, and their questions are appended
+# after the existing ones, so positions keep dense ids and SQLite updates
+# the title, year, ECO and ply indexes as rows go in.
+#
+# The file may be read while a game is still being written to it. The last
+# game is only taken once it ends with a result or another game follows
+# it. And if the last recorded game has grown since (it was taken before
+# this rule, or compiled from a partial file), it is taken again in place:
+# its game row and questions are rewritten under the same ids.
+#
+# New titles are also worked into the existing questions' wrong answers:
+# the share of them that new titles would have had, had they been there
+# from the start, is picked at random and pointed at the new titles, so
+# that these come up as distractors as often as the older ones. Questions
+# drawn while the bank had too few titles to fill their options are listed
+# in `short_questions`, and topped up first as titles arrive.
+
+INGESTED = """
+    CREATE TABLE IF NOT EXISTS ingested_games (
+        digest BLOB PRIMARY KEY, source TEXT NOT NULL, offset INTEGER, length INTEGER,
+        game_id INTEGER REFERENCES games);
+    CREATE INDEX IF NOT EXISTS ingested_by_source ON ingested_games (source, offset);
+    CREATE TABLE IF NOT EXISTS short_questions (
+        position_id INTEGER PRIMARY KEY REFERENCES positions, nb_options INTEGER NOT NULL);
+"""
+# what may follow a complete game: another game's first header, or nothing
+NEXT_GAME = re.compile(rb'\s*(?:\[\w+\s+"|\Z)')
+WATCH_INTERVAL = 1.0 # seconds
+
+
+@dataclass
+class AppendReport:
+    nb_games: int = 0 # games scanned
+    nb_new_games: int = 0
+    nb_grown_games: int = 0 # recorded games which had grown, taken again in place
+    nb_held_back: int = 0 # a last game which may still be being written
+    nb_skipped_games: int = 0 # new games with an illegal or unreadable move
+    nb_questions: int = 0 # questions appended
+    nb_new_titles: int = 0
+    nb_redistributed: int = 0 # old wrong answers now pointing at a new title
+    nb_backfilled: int = 0 # wrong answers added to questions which had too few
+    from_offset: int = 0 # where the scan started
+
+    def summary(self) -> str:
+        notes = [f"{self.nb_grown_games} taken again, having grown" if self.nb_grown_games else "",
+                 f"{self.nb_held_back} held back, unfinished" if self.nb_held_back else "",
+                 f"{self.nb_skipped_games} skipped" if self.nb_skipped_games else ""]
+        notes = ", ".join(note for note in notes if note)
+        return (f"{self.nb_new_games} new of {self.nb_games} games scanned "
+                f"from byte {self.from_offset}{f' ({notes})' if notes else ''}: "
+                f"{self.nb_questions} questions, {self.nb_new_titles} new titles, "
+                f"{self.nb_redistributed} wrong answers redistributed"
+                f"{f', {self.nb_backfilled} backfilled' if self.nb_backfilled else ''}")
+
+
+@dataclass
+class _Ingested:
+    # a game of the source which goes into the bank
+    digest: bytes
+    offset: int
+    length: int
+    text: str
+    grown: tuple | None = None # the ingested_games row of the game it is a longer version of
+    game: ChessGame | None = None # None if skipped
+    game_id: int | None = None
+
+
+def game_digest(text: bytes) -> bytes:
+    return blake2b(text, digest_size=16).digest()
+
+
+def is_complete_game(text: bytes) -> bool:
+    '''Whether a game's text ends with its result, so nothing more of it can follow.'''
+    tokens = text.split()
+    return bool(tokens) and tokens[-1].decode(errors="replace") in RESULTS
+
+
+@contextmanager
+def _mapped(path: Path) -> Iterator[bytes]:
+    with open(path, mode="rb") as pgn_file:
+        if pgn_file.seek(0, 2) == 0:
+            yield b"" # an empty file can't be mapped
+            return
+        with mmap(pgn_file.fileno(), 0, access=ACCESS_READ) as pgn:
+            yield pgn
+
+
+def _connect(bank_path: Path) -> sqlite3.Connection:
+    if not bank_path.exists():
+        write_sqlite_bank([], bank_path)
+    db = sqlite3.connect(bank_path)
+    # nothing is written to a file which isn't a question bank
+    try:
+        application_id, = db.execute("PRAGMA application_id").fetchone()
+    except sqlite3.DatabaseError:
+        application_id = None
+    if application_id != APPLICATION_ID:
+        db.close()
+        raise ValueError(f"{bank_path} is not an SQLite question bank")
+    db.executescript(INGESTED)
+    columns = [column for _, column, *_ in db.execute("PRAGMA table_info(ingested_games)")]
+    if "game_id" not in columns: # recorded before games were linked
+        db.execute("ALTER TABLE ingested_games ADD COLUMN game_id INTEGER REFERENCES games")
+    with db:
+        add_identity(db) # kept from now on, whatever is appended
+    return db
+
+
+def _scan_start(db: sqlite3.Connection, source: str, pgn: bytes) -> tuple[int, tuple | None]:
+    # resumes after the last game taken from `source` if it is still in
+    # place, or at its start if it has grown since (returning its row)
+    row = db.execute("SELECT digest, offset, length, game_id FROM ingested_games "
+                     "WHERE source = ? ORDER BY offset DESC LIMIT 1", (source,)).fetchone()
+    if row is None:
+        return 0, None
+    digest, offset, length, _ = row
+    text = pgn[offset:offset + length]
+    if game_digest(text) != digest:
+        return 0, None
+    if is_complete_game(text) or NEXT_GAME.match(pgn, offset + length):
+        return offset + length, None
+    return offset, row
+
+
+def record_ingested(bank_path: Path, pgn_path: Path) -> int:
+    '''Marks every game of `pgn_path` as already in the bank at `bank_path`
+    (e.g. right after compiling one from the other), so that `append_pgn`
+    only takes later games. Returns the number of games recorded.'''
+    index = build_index(pgn_path)
+    db = _connect(bank_path)
+    try:
+        with _mapped(pgn_path) as pgn, db:
+            db.executemany("INSERT OR IGNORE INTO ingested_games VALUES (?, ?, ?, ?, NULL)",
+                           [(game_digest(pgn[offset:offset + length]), str(pgn_path.resolve()),
+                             offset, length)
+                            for offset, length in zip(index.offsets, index.lengths)])
+    finally:
+        db.close()
+    return len(index)
+
+
+def append_pgn(bank_path: Path, pgn_path: Path, nb_options: int = 3, workers: int = 1,
+               positions: str = "assets", rng: Random | None = None) -> AppendReport:
+    """
+    Appends the questions of the games of `pgn_path` which are not yet in
+    the SQLite bank at `bank_path` (created if missing).
+
+    Raises:
+        ValueError: If `nb_options` is more than 6, or `positions` is not a
+            valid position strategy.
+    """
+    if nb_options > 6:
+        raise ValueError("More than 6 options is too many! "
+                         "Choose a number of options less than 7.")
+    position_strategy = parse_position_strategy(positions)
+    rng = rng or Random()
+    source = str(pgn_path.resolve())
+    db = _connect(bank_path)
+    report = AppendReport()
+    try:
+        with stage("read"), _mapped(pgn_path) as pgn:
+            report.from_offset, grown = _scan_start(db, source, pgn)
+            index = build_index(pgn_path, report.from_offset)
+            report.nb_games = len(index)
+            ingested: list[_Ingested] = []
+            seen = set()
+            for i, (offset, length) in enumerate(zip(index.offsets, index.lengths)):
+                text = pgn[offset:offset + length]
+                if i == len(index) - 1 and not is_complete_game(text):
+                    report.nb_held_back = 1 # taken once finished
+                    break
+                digest = game_digest(text)
+                if grown is not None and offset == grown[1]:
+                    ingested.append(_Ingested(digest, offset, length, text.decode(), grown))
+                    report.nb_grown_games += 1
+                elif digest not in seen and not db.execute(
+                        "SELECT 1 FROM ingested_games WHERE digest = ?", (digest,)).fetchone():
+                    ingested.append(_Ingested(digest, offset, length, text.decode()))
+                    report.nb_new_games += 1
+                seen.add(digest)
+
+        games = construct_each_game([game.text for game in ingested], position_strategy, workers)
+        for game, constructed in zip(ingested, games):
+            game.game = constructed
+            report.nb_skipped_games += constructed is None
+
+        with stage("questions"), db:
+            _append_games(db, ingested, nb_options, rng, report)
+            for game in ingested:
+                if game.grown is not None:
+                    db.execute("DELETE FROM ingested_games WHERE digest = ?", (game.grown[0],))
+                db.execute("INSERT OR IGNORE INTO ingested_games VALUES (?, ?, ?, ?, ?)",
+                           (game.digest, source, game.offset, game.length, game.game_id))
+    finally:
+        db.close()
+    return report
+
+
+def _grown_game_id(db: sqlite3.Connection, grown: tuple, title: str) -> int | None:
+    # the game a grown one was taken as, recorded or (if it was compiled
+    # rather than appended) the latest game under the title it has now
+    _, _, _, game_id = grown
+    if game_id is not None:
+        return game_id
+    row = db.execute("SELECT games.id FROM games JOIN titles ON titles.id = games.title_id "
+                     "WHERE titles.title = ? ORDER BY games.id DESC LIMIT 1", (title,)).fetchone()
+    return row and row[0]
+
+
+def _draw_wrong_answers(db: sqlite3.Connection, position_id: int, right_id: int,
+                        nb_titles: int, nb_options: int, rng: Random) -> None:
+    # wrong answers are drawn by title id, from every title old and new
+    k = min(nb_options, nb_titles - 1)
+    wrong_ids = [i + 1 + (i + 1 >= right_id) for i in rng.sample(range(nb_titles - 1), k)]
+    db.execute("DELETE FROM wrong_answers WHERE position_id = ?", (position_id,))
+    db.executemany("INSERT INTO wrong_answers VALUES (?, ?, ?)",
+                   [(position_id, slot, i) for slot, i in enumerate(wrong_ids)])
+    if k < nb_options: # too few titles yet, topped up as they arrive
+        db.execute("INSERT OR REPLACE INTO short_questions VALUES (?, ?)", (position_id, nb_options))
+    else:
+        db.execute("DELETE FROM short_questions WHERE position_id = ?", (position_id,))
+
+
+def _backfill(db: sqlite3.Connection, nb_titles: int, rng: Random) -> int:
+    # adds wrong answers to the questions drawn with too few, from titles
+    # they don't offer yet; returns the number added
+    nb_added = 0
+    for position_id, nb_options in db.execute("SELECT * FROM short_questions").fetchall():
+        right_id, = db.execute("SELECT games.title_id FROM positions JOIN games "
+                               "ON games.id = positions.game_id WHERE positions.id = ?",
+                               (position_id,)).fetchone()
+        wrong_ids = [i for i, in db.execute("SELECT title_id FROM wrong_answers "
+                                            "WHERE position_id = ?", (position_id,))]
+        used = {right_id, *wrong_ids}
+        # enough distinct draws that `need` of them are unused, if there are
+        need = nb_options - len(wrong_ids)
+        drawn = rng.sample(range(1, nb_titles + 1), min(nb_titles, need + len(used)))
+        added = [i for i in drawn if i not in used][:need]
+        db.executemany("INSERT INTO wrong_answers VALUES (?, ?, ?)",
+                       [(position_id, slot, i) for slot, i in enumerate(added, len(wrong_ids))])
+        if len(added) == need:
+            db.execute("DELETE FROM short_questions WHERE position_id = ?", (position_id,))
+        nb_added += len(added)
+    return nb_added
+
+
+def _append_games(db: sqlite3.Connection, ingested: list[_Ingested], nb_options: int,
+                  rng: Random, report: AppendReport) -> None:
+    nb_old_titles = db.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+    nb_old_positions = db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+    nb_old_wrong_answers = db.execute("SELECT COUNT(*) FROM wrong_answers").fetchone()[0]
+
+    title_ids: dict[str, int] = {}
+    def title_id(title: str) -> int:
+        i = title_ids.get(title)
+        if i is None:
+            row = db.execute("SELECT id FROM titles WHERE title = ?", (title,)).fetchone()
+            if row is None:
+                row = db.execute("INSERT INTO titles (title) VALUES (?) RETURNING id",
+                                 (title,)).fetchone()
+            i = title_ids[title] = row[0]
+        return i
+
+    # one row per source game, with its own headers, even if its title is known
+    for entry in ingested:
+        game = entry.game
+        if game is None:
+            continue
+        row = game_row(title_id(game.title), game.title, game.tags)
+        if entry.grown is not None:
+            entry.game_id = _grown_game_id(db, entry.grown, game.title)
+        if entry.game_id is None:
+            entry.game_id = db.execute("INSERT INTO games VALUES (NULL, ?, ?, ?, ?, ?, ?, ?) "
+                                       "RETURNING id", row).fetchone()[0]
+        else:
+            db.execute("UPDATE games SET title_id = ?, white = ?, black = ?, event = ?, site = ?, "
+                       "year = ?, eco = ? WHERE id = ?", (*row, entry.game_id))
+    nb_titles = db.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+    report.nb_new_titles = nb_titles - nb_old_titles
+
+    position_id = nb_old_positions
+    for entry in ingested:
+        if entry.game is None:
+            continue
+        right_id = title_id(entry.game.title)
+        # a grown game's questions are rewritten in place, and any more appended
+        old_ids = [i for i, in db.execute("SELECT id FROM positions WHERE game_id = ? ORDER BY id",
+                                          (entry.game_id,))] if entry.grown is not None else []
+        slots = list(_iter_question_slots(entry.game))
+        for n, (text, fen) in enumerate(slots):
+            if n < len(old_ids):
+                db.execute("UPDATE positions SET text = ?, ply = ?, asset = ? WHERE id = ?",
+                           (text, fen_ply(fen), fen, old_ids[n]))
+                _draw_wrong_answers(db, old_ids[n], right_id, nb_titles, nb_options, rng)
+            else:
+                position_id += 1
+                db.execute("INSERT INTO positions VALUES (?, ?, ?, ?, ?)",
+                           (position_id, entry.game_id, text, fen_ply(fen), fen))
+                _draw_wrong_answers(db, position_id, right_id, nb_titles, nb_options, rng)
+        for i in old_ids[len(slots):]: # surplus questions stay, under its title now
+            _draw_wrong_answers(db, i, right_id, nb_titles, nb_options, rng)
+    report.nb_questions = position_id - nb_old_positions
+
+    if report.nb_new_titles:
+        report.nb_backfilled = _backfill(db, nb_titles, rng)
+    if nb_old_wrong_answers and report.nb_new_titles:
+        # the old questions' wrong answers stay spread evenly over every title
+        nb_to_replace = nb_old_wrong_answers * report.nb_new_titles // nb_titles
+        report.nb_redistributed = _redistribute(db, range(nb_old_titles + 1, nb_titles + 1),
+                                                nb_old_positions, nb_to_replace, rng)
+
+
+def _redistribute(db: sqlite3.Connection, new_title_ids: range, nb_old_positions: int,
+                  nb_to_replace: int, rng: Random) -> int:
+    # points `nb_to_replace` random wrong answers of old questions at the new
+    # titles in turn, skipping any question which already offers that title
+    # (or has it as its right answer)
+    replaced: set[tuple[int, int]] = set()
+    for attempt in range(2 * nb_to_replace):
+        if len(replaced) == nb_to_replace:
+            break
+        title_id = new_title_ids[attempt % len(new_title_ids)]
+        position_id = rng.randrange(nb_old_positions) + 1
+        slots = db.execute("SELECT slot, title_id FROM wrong_answers WHERE position_id = ?",
+                           (position_id,)).fetchall()
+        right_id, = db.execute("SELECT games.title_id FROM positions JOIN games "
+                               "ON games.id = positions.game_id WHERE positions.id = ?",
+                               (position_id,)).fetchone()
+        free = [slot for slot, _ in slots if (position_id, slot) not in replaced]
+        if not free or right_id == title_id or any(i == title_id for _, i in slots):
+            continue
+        slot = rng.choice(free)
+        db.execute("UPDATE wrong_answers SET title_id = ? WHERE position_id = ? AND slot = ?",
+                   (title_id, position_id, slot))
+        replaced.add((position_id, slot))
+    return len(replaced)
+
+
+def watch_pgn(bank_path: Path, pgn_path: Path, on_append: Callable[[AppendReport], None],
+              interval: float = WATCH_INTERVAL, **options) -> None:
+    '''Appends new games of `pgn_path` to the bank whenever the file changes,
+    until interrupted. `options` are passed on to `append_pgn`.'''
+    last_stamp = None
+    while True:
+        try:
+            stat = pgn_path.stat()
+            stamp = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        if stamp is not None and stamp != last_stamp:
+            on_append(append_pgn(bank_path, pgn_path, **options))
+            last_stamp = stamp
+        sleep(interval)
@@ -1,9 +1,19 @@
 from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from collections.abc import Iterator, Sequence
 from pathlib import Path
+import sqlite3
 
-from pgn_quizzer.data import create_question_bank
-from pgn_quizzer.model import QuizBrain
+from pgn_quizzer.cache import BankCache
+from pgn_quizzer.data import (DISTRACTOR_STRATEGIES, NDJSON_SUFFIXES, create_question_bank,
+                              is_multi_file_source, iter_pgn_headers, source_paths,
+                              source_type, stream_quiz_questions)
+from pgn_quizzer.header_index import FilteredBank, HeaderIndex
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.positions import parse_position_strategy
+from pgn_quizzer.pqb import write_pqb
 from pgn_quizzer.presenter import QuizPresenter
+from pgn_quizzer.profiling import PROFILE_FORMATS, disable_profiling, enable_profiling, stage
+from pgn_quizzer.sqlite_bank import SqliteBank, write_sqlite_bank
 from pgn_quizzer.view import run_quiz_console, run_quiz_gui # TODO
 
 
@@ -18,12 +28,57 @@ def is_int_in_range(value: str) -> int:
 
     return ivalue
 
+def is_positive_int(value: str) -> int:
+    try:
+        ivalue = int(value)
+    except ValueError:
+        raise ArgumentTypeError(f"{repr(value)} is not a valid integer")
+
+    if ivalue < 1:
+        raise ArgumentTypeError(f"{ivalue} is not a positive integer")
+
+    return ivalue
+
+def is_position_strategy(value: str) -> str:
+    try:
+        parse_position_strategy(value)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e))
+    return value
+
+def is_year_range(value: str) -> tuple[int, int]:
+    first, _, last = value.partition("-")
+    try:
+        years = (int(first), int(last or first))
+    except ValueError:
+        raise ArgumentTypeError(f"{repr(value)} is not a year or a range of years like 1900-1930")
+
+    if years[0] > years[1]:
+        raise ArgumentTypeError(f"{value} ends before it starts")
+
+    return years
+
 def parse_args() -> Namespace:
     """
     Set up and parse command-line flags, seeking:
-      --path:   path to the JSON or PGN file
-      --ui:     either 'console' or 'gui'
+      --path:   path to the JSON or PGN file (maybe compressed), or a directory or glob of PGN files
+      --ui:     'console', 'gui' or 'server'
       --num:    number of questions to ask (default = 5)
+      --workers: number of processes used to construct a PGN (default = 1)
+      --compile: path of a .pqb or .sqlite file to compile the question bank into
+      --cache-dir / --no-cache: where parsed question banks are cached
+      --stream: draw each quiz from a JSON bank without loading all of it
+      --distractors: how wrong answers are picked from a PGN (default = random)
+      --unique-positions: skip positions which occur in more than one game
+      --positions: which positions of a PGN become questions (default = assets)
+      --profile / --profile-format: where and how to write per-stage timings
+      --board-style: how boards are drawn in the console (default = unicode)
+      --prefetch: prepare the next question while the current one is answered
+      --host / --port: where `--ui server` listens (default = 127.0.0.1:8765)
+      --session-db: SQLite file keeping `--ui server` sessions across restarts
+      --review / --user / --history: schedule questions by spaced repetition
+      --player / --years / --eco: only ask about games matching these headers
+      --append / --watch: add the new games of a PGN to an SQLite bank
     """
     
     parser = ArgumentParser(description="Run PGN Quizzer.")
@@ -31,65 +86,347 @@ def parse_args() -> Namespace:
     parser.add_argument(
         "--path",
         type=str,
-        help="Path to JSON or PGN. "
+        help="Path to JSON or PGN, possibly compressed (.gz, .bz2 or .xz), or to "
+             "a directory or glob pattern (quoted, e.g. 'games/**/*.pgn') of PGN "
+             "files to load as one bank. "
              "If omitted: defaults to chess_sample_data.json for json; exits for pgn.",
     )
     parser.add_argument(
         "--ui",
-        choices=["console", "gui"],
+        choices=["console", "gui", "server"],
         default="console", # TODO: switch this to gui when gui_view implemented
-        help="Which UI to launch: console or GUI (default: console).",
+        help="Which UI to launch: console, GUI, or an HTTP/JSON quiz server "
+             "(default: console).",
     )
     parser.add_argument(
         "--length",
-        type=int,
+        type=is_int_in_range,
         default=5,
-        help="Number of questions to ask in each quiz session (default: 5).",
+        help="Number of questions to ask in each quiz session, from 1 to 101 (default: 5).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=is_positive_int,
+        default=1,
+        help="Number of processes used to construct questions from a PGN (default: 1).",
+    )
+    parser.add_argument(
+        "--compile",
+        type=str,
+        help="Compile the question bank into a .pqb file, or an indexed .sqlite "
+             "database, at this path and exit.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory for cached question banks (default: ~/.cache/pgn_quizzer).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always re-parse the source instead of using the cache.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Draw each quiz from a JSON or NDJSON bank in one pass, "
+             "without loading the whole bank into memory.",
+    )
+    parser.add_argument(
+        "--distractors",
+        choices=DISTRACTOR_STRATEGIES,
+        default="random",
+        help="How wrong answers are picked for questions built from a PGN: "
+             "at random, or similar games first (default: random).",
+    )
+    parser.add_argument(
+        "--unique-positions",
+        action="store_true",
+        help="Leave out positions which occur in more than one game, "
+             "since they have more than one right answer.",
+    )
+    parser.add_argument(
+        "--positions",
+        type=is_position_strategy,
+        default="assets",
+        help="Which positions of each PGN game become questions: assets "
+             "([%%asset] markers), captures, annotated, every:N or last:K "
+             "(default: assets).",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Record the time and allocations of each stage (reading, parsing, "
+             "validation, sampling, rendering...) and write them to this file on exit.",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=PROFILE_FORMATS,
+        default="chrome",
+        help="Format of the --profile file: a Chrome trace (for chrome://tracing "
+             "or Perfetto) or a JSON summary of per-stage totals and spans "
+             "(default: chrome).",
+    )
+
+    parser.add_argument(
+        "--board-style",
+        choices=["unicode", "ascii"],
+        default="unicode",
+        help="How boards are drawn in the console: unicode pieces, or letters "
+             "for terminals without them (default: unicode).",
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Prepare each next question (options and board) in the "
+             "background while the current one is being answered.",
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address the quiz server listens on with --ui server (default: 127.0.0.1).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port the quiz server listens on with --ui server (default: 8765).",
+    )
+    parser.add_argument(
+        "--session-db",
+        type=str,
+        help="SQLite file where the quiz server keeps idle sessions, so that "
+             "they survive a restart (default: a temporary file).",
+    )
+
+    parser.add_argument(
+        "--review",
+        action="store_true",
+        help="Pick questions by spaced repetition (SM-2) from your answer "
+             "history, instead of at random: due questions first, then new ones.",
+    )
+    parser.add_argument(
+        "--user",
+        type=str,
+        default="default",
+        help="Whose answer history --review reads and extends (default: default).",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        help="SQLite file holding the --review answer history "
+             "(default: ~/.local/share/pgn_quizzer/history.sqlite).",
+    )
+
+    parser.add_argument(
+        "--player",
+        action="append",
+        default=[],
+        help="Only ask about games with a player of this name, e.g. Capablanca "
+             "(repeat the flag for games between two given players).",
+    )
+    parser.add_argument(
+        "--years",
+        type=is_year_range,
+        help="Only ask about games played in this year or range of years, e.g. 1900-1930.",
+    )
+    parser.add_argument(
+        "--eco",
+        type=str,
+        help="Only ask about games whose ECO code matches one of these "
+             "comma-separated patterns, e.g. B* or C42,C6? (needs a PGN or .sqlite source).",
+    )
+
+    parser.add_argument(
+        "--append",
+        type=str,
+        help="Add the games of the --path PGN which are not yet in this .sqlite "
+             "bank (creating it if needed) and exit, instead of rebuilding it.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="With --append, keep running and add new games whenever the PGN changes.",
     )
 
     args = parser.parse_args()
     return args
 
 
+def pgn_headers(source_path: Path) -> Iterator[dict[str, str]]:
+    '''Headers of the games of every PGN file the source stands for.'''
+    if is_multi_file_source(source_path) or source_type(source_path) == ".pgn":
+        for path in source_paths(source_path):
+            yield from iter_pgn_headers(path)
+
+
+def filter_question_bank(question_bank: Sequence[Question], source_path: Path,
+                         args: Namespace) -> FilteredBank:
+    with stage("index"):
+        # built as a PGN was loaded (or cached with its bank), if it was one
+        index = getattr(question_bank, "header_index", None)
+        if index is None and isinstance(question_bank, SqliteBank):
+            index = HeaderIndex.build_by_game(question_bank.question_games(),
+                                              question_bank.game_headers())
+        elif index is None:
+            index = HeaderIndex.build(question_bank, pgn_headers(source_path))
+    eco = [pattern.strip() for pattern in (args.eco or "").split(",") if pattern.strip()]
+    indices = index.select(args.player, args.years, eco)
+    if not indices:
+        raise SystemExit("--error: no questions match --player, --years and --eco")
+    return FilteredBank(question_bank, indices)
+
+
+def append_to_bank(bank_path: Path, source_path: Path, args: Namespace) -> None:
+    if (source_path.suffix != ".pgn" or is_multi_file_source(source_path)
+            or bank_path.suffix != ".sqlite"):
+        raise SystemExit("--error: --append adds the games of an uncompressed --path PGN to a .sqlite bank")
+    from pgn_quizzer.ingest import append_pgn, watch_pgn
+
+    def report(appended) -> None:
+        print(f"Appended to {bank_path}: {appended.summary()}.", flush=True)
+
+    options = {"workers": args.workers, "positions": args.positions}
+    try:
+        if args.watch:
+            print(f"Watching {source_path} (Ctrl+C to stop).", flush=True)
+            watch_pgn(bank_path, source_path, report, **options)
+        else:
+            report(append_pgn(bank_path, source_path, **options))
+    except KeyboardInterrupt:
+        pass
+    except (FileNotFoundError, ValueError, sqlite3.DatabaseError) as e:
+        raise SystemExit(f"--error: unable to append {source_path} to {bank_path}: {e}")
+
+
 def main():
+    args = parse_args()
+    if not args.profile:
+        return run(args)
+
+    profiler = enable_profiling()
+    try:
+        return run(args)
+    finally:
+        disable_profiling()
+        profiler.write(Path(args.profile), args.profile_format)
+
+
+def run(args: Namespace):
     # -------------------------
     # Setup:
     # -------------------------
-    args = parse_args()
     given_path = args.path
     length = args.length
     ui = args.ui
+    workers = args.workers
 
     # -------------------------
     # Create question bank
     # -------------------------
     source_string = given_path or "./jsons/chess_sample_data.json"
     source_path = Path(source_string)
-    question_bank = create_question_bank(source_path)
+
+    if args.append:
+        return append_to_bank(Path(args.append), source_path, args)
+    if args.watch:
+        raise SystemExit("--error: --watch needs --append")
+
+    if args.stream:
+        if (source_type(source_path) not in {".json"} | NDJSON_SUFFIXES
+                or is_multi_file_source(source_path)):
+            raise SystemExit(f"--error: --stream needs a JSON or NDJSON source, not {source_path}")
+        if args.player or args.years or args.eco:
+            raise SystemExit("--error: --player, --years and --eco need a question bank; drop --stream")
+        # each quiz is drawn afresh, so there is no question bank to keep
+        question_bank = None
+    else:
+        cache = None if args.no_cache else BankCache(args.cache_dir and Path(args.cache_dir))
+        with stage("load"):
+            question_bank = create_question_bank(source_path, workers=workers, cache=cache,
+                                                 distractors=args.distractors, compact=True,
+                                                 unique_positions=args.unique_positions,
+                                                 positions=args.positions)
+
+    if (args.player or args.years or args.eco) and question_bank is not None:
+        question_bank = filter_question_bank(question_bank, source_path, args)
+
+    def new_quiz() -> QuizBrain:
+        if question_bank is None:
+            return QuizBrain(stream_quiz_questions(source_path, length), length)
+        return QuizBrain(question_bank, length, scheduler=scheduler)
+
+    if args.compile and question_bank is not None:
+        target = Path(args.compile)
+        if target.suffix == ".sqlite":
+            headers = pgn_headers(source_path)
+            try:
+                nb_questions = write_sqlite_bank(question_bank, target, headers)
+            except ValueError as e:
+                raise SystemExit(f"--error: {e}")
+            if source_path.suffix == ".pgn" and not is_multi_file_source(source_path):
+                # so that --append only adds later games
+                from pgn_quizzer.ingest import record_ingested
+
+                record_ingested(target, source_path)
+        else:
+            nb_questions = write_pqb(question_bank, target)
+        print(f"Compiled {nb_questions} questions into {args.compile}.")
+        return
+
+    if ui == "server":
+        if args.review:
+            raise SystemExit("--error: --review is not available with --ui server")
+        if question_bank is None:
+            raise SystemExit("--error: --ui server needs a question bank; drop --stream")
+        from pgn_quizzer.server import run_quiz_server # asyncio is only needed here
+
+        run_quiz_server(question_bank, length, host=args.host, port=args.port,
+                        session_db=args.session_db and Path(args.session_db))
+        return
 
     # -------------------------
     # Create quiz & presenter
     # -------------------------
-    quiz = QuizBrain(question_bank, length)
-    presenter = QuizPresenter(quiz)
+    scheduler = None
+    if args.review:
+        if question_bank is None:
+            raise SystemExit("--error: --review needs a question bank; drop --stream")
+        from pgn_quizzer.scheduler import ReviewScheduler, default_history_path
+
+        history = Path(args.history) if args.history else default_history_path()
+        scheduler = ReviewScheduler(question_bank, history, user=args.user)
+
+    def new_presenter(quiz: QuizBrain) -> QuizPresenter:
+        return QuizPresenter(quiz, prefetch=args.prefetch, board_style=args.board_style)
+
+    quiz = new_quiz()
+    presenter = new_presenter(quiz)
 
     # -------------------------
     # Dispatch to chosen UI
     # -------------------------
-    if ui == "console":
-        while run_quiz_console(presenter):
-            # new quiz instance means new randomization, same question bank
-            quiz = QuizBrain(question_bank, length)
-            presenter = QuizPresenter(quiz)
-        
-    else:  # ui == "gui" # currently this always throws an exception TODO
-        try:
-            run_quiz_gui(presenter)
-
-        except Exception:
-            raise SystemExit(
-                "--error: GUI not implemented yet."
-            )
+    try:
+        if ui == "console":
+            while run_quiz_console(presenter):
+                # new quiz instance means new randomization, same question bank
+                quiz = new_quiz()
+                presenter = new_presenter(quiz)
+
+        else:  # ui == "gui" # currently this always throws an exception TODO
+            try:
+                run_quiz_gui(presenter)
+
+            except Exception:
+                raise SystemExit(
+                    "--error: GUI not implemented yet."
+                )
+    finally:
+        if scheduler is not None:
+            scheduler.close()
     
     # -------------------------
     # End of main
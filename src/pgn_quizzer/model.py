@@ -1,16 +1,31 @@
+from array import array
+from collections.abc import Sequence
 from dataclasses import dataclass
-from random import sample
+from random import Random, getrandbits, sample
+from typing import TYPE_CHECKING
 
-@dataclass(frozen=True, order=False)
+from pgn_quizzer.profiling import stage
+
+if TYPE_CHECKING:
+    from pgn_quizzer.scheduler import ReviewScheduler
+
+@dataclass(frozen=True, order=False, slots=True)
 class Question:
     """
     Thin wrapper for question data.
+
+    Slotted, with `wrong_answers` stored as a tuple (lists are converted),
+    so that a question carries no per-instance dict or spare list capacity.
     """
     text: str
     right_answer: str
-    wrong_answers: list[str]
+    wrong_answers: tuple[str, ...]
     asset: str
 
+    def __post_init__(self):
+        if not isinstance(self.wrong_answers, tuple):
+            object.__setattr__(self, "wrong_answers", tuple(self.wrong_answers))
+
 class QuizBrain:
     """
     Tracks quiz progress and user performance.
@@ -29,6 +44,8 @@ class QuizBrain:
             Advances question counter by 1.
         increment_score():
             Increases user score by 1.
+        record_answer(correct: bool):
+            Scores the next question and moves on, telling the scheduler if any.
         nb_questions_remaining():
             Returns number of questions remaining.
         multiple_choice_options(question: Question):
@@ -37,10 +54,16 @@ class QuizBrain:
     Attributes:
         nb_questions_answered (int): Number of questions answered so far.
         user_score (int): Number of questions answered correctly.
-        questions (list of Question): Fixed set of questions sampled at instantiation.
+        questions (list of Question): Fixed set of questions sampled at instantiation;
+            each is only taken from the bank once it is needed.
+        seed (int): Seed the questions were sampled with.
+        indices (array): Positions of `questions` in the question bank.
+        scheduler (ReviewScheduler | None): Picks the questions instead of the
+            seed, and is told every answer.
     """
 
-    def __init__(self, question_bank: list[Question], length: int = 5):
+    def __init__(self, question_bank: Sequence[Question], length: int = 5,
+                 seed: int | None = None, scheduler: "ReviewScheduler | None" = None):
         """
         Initialize the quiz with a set of questions and desired length.
 
@@ -48,15 +71,21 @@ class QuizBrain:
         will use all available questions instead.
 
         Args:
-            question_bank (list[Question]): List of available questions.
+            question_bank (Sequence[Question]): List of available questions, or
+                any sequence of them (e.g. a `CompiledBank`, which only builds
+                the questions that get sampled).
             length (int): Desired number of questions in the quiz.
+            seed (int | None): Seed for sampling the questions; the same bank,
+                length and seed always give the same quiz.
+            scheduler (ReviewScheduler | None): Spaced-repetition scheduler
+                for `question_bank` picking the questions instead.
 
         Raises:
             ValueError: If `question_bank` is empty or if `length` is non-positive.
             TypeError: If `length` is not of type int.
         """
 
-        if question_bank == []:
+        if len(question_bank) == 0:
             raise ValueError("No questions provided. "
                              "Argument question_bank should be non-empty.")
         if length <= 0:
@@ -68,13 +97,32 @@ class QuizBrain:
         self.nb_questions_answered = 0
         self.user_score = 0
         self.length = min(length, len(question_bank))
-        self.questions = sample(question_bank, length) # randomization
+        self.seed = getrandbits(64) if seed is None else seed
+        self.scheduler = scheduler
+        with stage("sample"):
+            if scheduler is not None:
+                self.indices = array("I", scheduler.next_indices(self.length))
+            else:
+                self.indices = array("I", Random(self.seed).sample(range(len(question_bank)),
+                                                                   self.length)) # randomization
+        self.question_bank = question_bank
+        self._questions: list[Question | None] = [None] * self.length
+
+    def question_at(self, number: int) -> Question:
+        question = self._questions[number]
+        if question is None:
+            question = self._questions[number] = self.question_bank[self.indices[number]]
+        return question
+
+    @property
+    def questions(self) -> list[Question]:
+        return [self.question_at(number) for number in range(self.length)]
 
     def current_question_number(self) -> int:
         return 1 + self.nb_questions_answered
 
     def next_question(self) -> Question:
-        return self.questions[self.nb_questions_answered]
+        return self.question_at(self.nb_questions_answered)
     
     def increment_nb_questions_answered(self) -> None:
         self.nb_questions_answered += 1
@@ -82,6 +130,13 @@ class QuizBrain:
     def increment_score(self) -> None:
         self.user_score += 1
     
+    def record_answer(self, correct: bool) -> None:
+        if self.scheduler is not None:
+            self.scheduler.record(self.indices[self.nb_questions_answered], correct)
+        if correct:
+            self.increment_score()
+        self.increment_nb_questions_answered()
+
     def nb_questions_remaining(self) -> int:
         return self.length - self.nb_questions_answered
     
@@ -98,6 +153,16 @@ class QuizBrain:
                 List containing `question`'s `right_answer` mixed in with the entries 
                 of `wrong_answers`.
         '''
-        user_choices_list = [question.right_answer] + question.wrong_answers
+        user_choices_list = [question.right_answer, *question.wrong_answers]
         user_choices_list = sample(user_choices_list, len(user_choices_list)) # randomization
         return user_choices_list
+
+    def seeded_multiple_choice_options(self) -> list[str]:
+        '''
+        Options for the next question, shuffled reproducibly from `seed`, so
+        that a quiz rebuilt from its seed offers the same options again.
+        '''
+        question = self.next_question()
+        user_choices_list = [question.right_answer, *question.wrong_answers]
+        Random(self.seed + self.nb_questions_answered).shuffle(user_choices_list)
+        return user_choices_list
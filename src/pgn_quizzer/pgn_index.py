@@ -0,0 +1,237 @@
+from array import array
+from mmap import ACCESS_READ, mmap
+import os
+from pathlib import Path
+import re
+import struct
+
+# Byte-offset index of the games in a PGN file, saved as a sidecar next to
+# the source (games.pgn -> games.pgn.idx) so that large databases only have
+# to be scanned once.
+#
+# Sidecar layout:
+#   magic                   8 bytes
+#   size, mtime_ns          source file stamp, used to detect staleness
+#   nb_games, nb_tags       counts
+#   offsets                 nb_games x uint64 (native byte order)
+#   lengths                 nb_games x uint32 (native byte order)
+#   strings                 nb_games x nb_tags header values, NUL-separated
+
+MAGIC = b"PGNIDX1\0"
+STAMP = struct.Struct("<QqII")
+BLOB_SIZE = struct.Struct("<Q")
+
+# the header fields that make up a game's title
+TITLE_TAGS = ("White", "Black", "Site", "Date")
+
+HEADER = re.compile(rb'^\[(\w+)\s+"(.*)"\]\s*$')
+
+
+def in_comment_after(line: str | bytes, in_comment: bool) -> bool:
+    '''Whether a brace comment is still open at the end of a movetext line,
+    given whether one was open at its start. A ";" comment runs to the end
+    of the line, so braces after it do not count.'''
+    brace, close, semicolon = ("{", "}", ";") if isinstance(line, str) else (b"{", b"}", b";")
+    pos = 0
+    while True:
+        if in_comment:
+            end = line.find(close, pos)
+            if end < 0:
+                return True
+            in_comment, pos = False, end + 1
+        else:
+            start = line.find(brace, pos)
+            if start < 0:
+                return False
+            rest_of_line = line.find(semicolon, pos)
+            if 0 <= rest_of_line < start:
+                return False
+            in_comment, pos = True, start + 1
+
+
+class PgnIndex:
+    """
+    Offsets, lengths and title headers of every game in a PGN file.
+
+    Games are read back with one positioned read each, so jumping to any
+    game costs the same regardless of where it sits in the file, and only
+    the game being read is held in memory (a memory map of the source would
+    keep every page read so far resident).
+    """
+
+    def __init__(self, source: Path, offsets: array | memoryview, lengths: array | memoryview,
+                 strings: list[str] | None, sidecar_map: mmap | None = None):
+        self.source = source
+        self.offsets = offsets
+        self.lengths = lengths
+        self._strings = strings # None if left on disk (see `map_index`)
+        self._sidecar_map = sidecar_map
+        self._file = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def tags(self, i: int) -> dict[str, str]:
+        if self._strings is None: # read from the game's own headers instead
+            tags = {}
+            for line in self._slice(i).splitlines():
+                match = HEADER.match(line.strip())
+                if match:
+                    tags[match.group(1).decode()] = match.group(2).decode()
+                elif line.strip():
+                    break
+            return {tag: tags.get(tag, "") for tag in TITLE_TAGS}
+        start = i * len(TITLE_TAGS)
+        return dict(zip(TITLE_TAGS, self._strings[start:start + len(TITLE_TAGS)]))
+
+    def read(self, i: int) -> str:
+        return self._slice(i).decode()
+
+    def _slice(self, i: int) -> bytes:
+        if self._file is None:
+            self._file = open(self.source, mode="rb", buffering=0)
+        return os.pread(self._file.fileno(), self.lengths[i], self.offsets[i])
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._sidecar_map is not None:
+            self.offsets.release() # views into the sidecar's map, which can't close while they live
+            self.lengths.release()
+            self._sidecar_map.close()
+            self._sidecar_map = None
+
+    def __enter__(self) -> "PgnIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def sidecar_path(source: Path) -> Path:
+    return source.with_name(source.name + ".idx")
+
+
+def build_index(source: Path, start: int = 0) -> PgnIndex:
+    """
+    Scans `source` once, recording where each game starts and ends.
+
+    Game boundaries follow the same rule as `ChessGameConstructor`: a new
+    game starts at the first header line (`[Tag "value"]`, outside any
+    brace comment) after some movetext. With a `start` offset (which
+    should be the start of a game), only the games from there on are
+    indexed.
+    """
+    offsets, lengths, strings = array("Q"), array("I"), []
+    tags = {}
+    position = start
+    seen_movetext = in_comment = False
+
+    def close_game(end: int) -> None:
+        offsets.append(start)
+        lengths.append(end - start)
+        strings.extend(tags.get(tag, "") for tag in TITLE_TAGS)
+
+    with open(source, mode="rb") as pgn_file:
+        pgn_file.seek(start)
+        for line in pgn_file:
+            stripped = line.strip()
+            match = None if in_comment else HEADER.match(stripped)
+            if match and seen_movetext:
+                close_game(position)
+                tags = {}
+                start = position
+                seen_movetext = False
+            if match:
+                tags[match.group(1).decode()] = match.group(2).decode()
+            elif in_comment or not stripped.startswith(b"["):
+                seen_movetext = seen_movetext or bool(stripped)
+                in_comment = in_comment_after(line, in_comment)
+            position += len(line)
+    if seen_movetext or tags:
+        close_game(position)
+
+    return PgnIndex(source, offsets, lengths, strings)
+
+
+def save_index(index: PgnIndex) -> Path:
+    stat = index.source.stat()
+    blob = "\0".join(index._strings).encode()
+    sidecar = sidecar_path(index.source)
+    with open(sidecar, mode="wb") as idx_file:
+        idx_file.write(MAGIC)
+        idx_file.write(STAMP.pack(stat.st_size, stat.st_mtime_ns, len(index), len(TITLE_TAGS)))
+        index.offsets.tofile(idx_file)
+        index.lengths.tofile(idx_file)
+        idx_file.write(BLOB_SIZE.pack(len(blob)))
+        idx_file.write(blob)
+    return sidecar
+
+
+def _read_stamp(source: Path, idx_file) -> int | None:
+    # the number of games of a sidecar, or None if it is stale
+    if idx_file.read(len(MAGIC)) != MAGIC:
+        return None
+    stat = source.stat()
+    size, mtime_ns, nb_games, nb_tags = STAMP.unpack(idx_file.read(STAMP.size))
+    if (size, mtime_ns, nb_tags) != (stat.st_size, stat.st_mtime_ns, len(TITLE_TAGS)):
+        return None
+    return nb_games
+
+
+def load_index(source: Path) -> PgnIndex | None:
+    '''Returns the saved index of `source`, or None if missing or stale.'''
+    sidecar = sidecar_path(source)
+    if not sidecar.exists():
+        return None
+
+    with open(sidecar, mode="rb") as idx_file:
+        nb_games = _read_stamp(source, idx_file)
+        if nb_games is None:
+            return None
+        offsets, lengths = array("Q"), array("I")
+        offsets.fromfile(idx_file, nb_games)
+        lengths.fromfile(idx_file, nb_games)
+        blob_size, = BLOB_SIZE.unpack(idx_file.read(BLOB_SIZE.size))
+        blob = idx_file.read(blob_size).decode()
+
+    strings = blob.split("\0") if nb_games else []
+    return PgnIndex(source, offsets, lengths, strings)
+
+
+def map_index(source: Path) -> PgnIndex | None:
+    '''Like `load_index`, but the offsets and lengths are read through a
+    memory map of the sidecar and the header strings are left on disk (tags
+    are read from each game's headers instead). Holding it costs next to no
+    memory, whatever the number of games.'''
+    sidecar = sidecar_path(source)
+    if not sidecar.exists():
+        return None
+
+    with open(sidecar, mode="rb") as idx_file:
+        nb_games = _read_stamp(source, idx_file)
+        if nb_games is None:
+            return None
+        sidecar_map = mmap(idx_file.fileno(), 0, access=ACCESS_READ)
+    start = len(MAGIC) + STAMP.size
+    middle = start + 8 * nb_games
+    view = memoryview(sidecar_map)
+    offsets = view[start:middle].cast("Q")
+    lengths = view[middle:middle + 4 * nb_games].cast("I")
+    view.release()
+    return PgnIndex(source, offsets, lengths, None, sidecar_map)
+
+
+def open_index(source: Path) -> PgnIndex:
+    '''Loads the sidecar index of `source`, (re)building it if needed. If
+    the sidecar can't be written (e.g. a read-only directory), the index
+    is still returned, just not kept for next time.'''
+    index = load_index(source)
+    if index is None:
+        index = build_index(source)
+        try:
+            save_index(index)
+        except OSError:
+            pass
+    return index
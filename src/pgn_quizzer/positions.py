@@ -0,0 +1,131 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+# Strategies choosing which positions of a game become quiz assets.
+#
+# `ChessGameConstructor._get_fens` replays each mainline exactly once,
+# pushing one move at a time, and asks its strategy at every ply (ply 0 is
+# the starting position) which question descriptors, if any, the position
+# reached should be an asset for. FENs are only generated for the plies a
+# strategy selects.
+
+DEFAULT_DESC = "desc1"
+
+
+@dataclass(slots=True)
+class Ply:
+    """
+    A mainline move as read from the movetext.
+
+    Attributes:
+        san (str): The move in SAN, stripped of any !/? glyph ("" for ply 0).
+        annotated (bool): Whether the move carries a NAG or a !/? glyph.
+        asset_descs (list[str]): Descriptors from `[%asset ...]` commands
+            in the comments following the move.
+    """
+    san: str
+    annotated: bool = False
+    asset_descs: list[str] = field(default_factory=list)
+
+
+class PositionStrategy(ABC):
+    '''Base class of the position strategies.'''
+
+    @abstractmethod
+    def __call__(self, number: int, total: int, ply: Ply, capture: bool) -> Iterable[str]:
+        """
+        Args:
+            number: The ply just played (0 for the starting position).
+            total: Number of plies in the mainline.
+            ply: The move just played.
+            capture: Whether that move was a capture.
+
+        Returns:
+            The descriptors the current position is an asset for.
+        """
+
+    @abstractmethod
+    def spec(self) -> str:
+        '''The spec `parse_position_strategy` builds this strategy from.'''
+
+
+class AssetMarkers(PositionStrategy):
+    '''Positions marked with `[%asset desc]` commands (the default).'''
+
+    def __call__(self, number, total, ply, capture):
+        return ply.asset_descs
+
+    def spec(self) -> str:
+        return "assets"
+
+
+@dataclass(frozen=True)
+class EveryNthPly(PositionStrategy):
+    n: int
+
+    def __call__(self, number, total, ply, capture):
+        return (DEFAULT_DESC,) if number and number % self.n == 0 else ()
+
+    def spec(self) -> str:
+        return f"every:{self.n}"
+
+
+class AfterCaptures(PositionStrategy):
+    def __call__(self, number, total, ply, capture):
+        return (DEFAULT_DESC,) if capture else ()
+
+    def spec(self) -> str:
+        return "captures"
+
+
+class AnnotatedMoves(PositionStrategy):
+    '''Positions after moves carrying a NAG or a !/? glyph.'''
+
+    def __call__(self, number, total, ply, capture):
+        return (DEFAULT_DESC,) if ply.annotated else ()
+
+    def spec(self) -> str:
+        return "annotated"
+
+
+@dataclass(frozen=True)
+class LastPlies(PositionStrategy):
+    k: int
+
+    def __call__(self, number, total, ply, capture):
+        return (DEFAULT_DESC,) if number and number > total - self.k else ()
+
+    def spec(self) -> str:
+        return f"last:{self.k}"
+
+
+POSITION_STRATEGIES = {
+    "assets": AssetMarkers,
+    "every": EveryNthPly,
+    "captures": AfterCaptures,
+    "annotated": AnnotatedMoves,
+    "last": LastPlies,
+}
+
+
+def parse_position_strategy(spec: str) -> PositionStrategy:
+    """
+    Builds a strategy from a spec such as "assets", "captures", "annotated",
+    "every:10" or "last:6".
+
+    Raises:
+        ValueError: If the spec is not recognised.
+    """
+    name, _, arg = spec.partition(":")
+    strategy = POSITION_STRATEGIES.get(name)
+    if strategy is None:
+        raise ValueError(f"Unknown position strategy {spec!r}; "
+                         f"choose from {", ".join(POSITION_STRATEGIES)}.")
+    if strategy in (EveryNthPly, LastPlies):
+        if not arg.isdigit() or int(arg) < 1:
+            raise ValueError(f"Position strategy {name!r} needs a positive count, e.g. {name}:8.")
+        return strategy(int(arg))
+    if arg:
+        raise ValueError(f"Position strategy {name!r} takes no count.")
+    return strategy()
@@ -0,0 +1,211 @@
+from collections.abc import Iterable, Iterator, Sequence
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+import struct
+
+from pgn_quizzer.model import Question
+
+# Compiled question bank (.pqb): questions that have already been validated,
+# laid out so that a bank of any size opens with a single memory map and each
+# `Question` is only built when it is asked for.
+#
+# File layout (little-endian):
+#   header      magic, nb_strings, nb_questions, nb_wrong_slots
+#   string table
+#       offsets     (nb_strings + 1) x uint32, relative to the string data
+#       data        UTF-8 bytes of every distinct text/answer string
+#   records     nb_questions fixed-width records:
+#       text id, right answer id          uint32, uint32
+#       nb wrong answers                  uint8
+#       wrong answer ids                  nb_wrong_slots x uint32
+#       asset kind                        uint8: PACKED_FEN or STRING_ASSET
+#       asset                             packed FEN, or string id (uint32)
+
+MAGIC = b"PQB1\0\0\0\0"
+HEADER = struct.Struct("<8sIII")
+STRING_OFFSET = struct.Struct("<I")
+
+PACKED_FEN = 0
+STRING_ASSET = 1
+
+# 64 squares at 4 bits each, then side to move and castling rights, the en
+# passant square (or NO_EP_SQUARE) and the two move clocks
+PACKED_FEN_FORMAT = "32sBBHH"
+PIECES = " PNBRQKpnbrqk"
+CASTLING = "KQkq"
+NO_EP_SQUARE = 0xFF
+
+
+def pack_fen(fen: str) -> bytes | None:
+    '''Packs a standard FEN into 38 bytes, or returns None if it can't be.'''
+    try:
+        placement, turn, castling, ep, halfmove, fullmove = fen.split(" ")
+        squares = []
+        for row in placement.split("/"):
+            for char in row:
+                if char.isdigit():
+                    squares += [0] * int(char)
+                else:
+                    squares.append(PIECES.index(char, 1))
+        if len(squares) != 64 or turn not in ("w", "b"):
+            return None
+
+        flags = int(turn == "b")
+        if castling != "-":
+            for char in castling:
+                flags |= 2 << CASTLING.index(char)
+        ep_square = NO_EP_SQUARE if ep == "-" else 8 * (8 - int(ep[1])) + "abcdefgh".index(ep[0])
+        board = bytes(squares[i] << 4 | squares[i + 1] for i in range(0, 64, 2))
+        packed = struct.pack("<" + PACKED_FEN_FORMAT, board, flags, ep_square,
+                             int(halfmove), int(fullmove))
+    except (ValueError, IndexError, struct.error):
+        return None
+
+    # only keep the packed form if it round-trips exactly
+    return packed if unpack_fen(packed) == fen else None
+
+
+def unpack_fen(packed: bytes) -> str:
+    board, flags, ep_square, halfmove, fullmove = struct.unpack("<" + PACKED_FEN_FORMAT, packed)
+    rows = []
+    for row in range(8):
+        text, empty = "", 0
+        for col in range(8):
+            byte = board[(8 * row + col) // 2]
+            piece = byte >> 4 if col % 2 == 0 else byte & 0x0F
+            if piece:
+                text += (str(empty) if empty else "") + PIECES[piece]
+                empty = 0
+            else:
+                empty += 1
+        rows.append(text + (str(empty) if empty else ""))
+
+    turn = "b" if flags & 1 else "w"
+    castling = "".join(char for i, char in enumerate(CASTLING) if flags & (2 << i)) or "-"
+    ep = "-" if ep_square == NO_EP_SQUARE else "abcdefgh"[ep_square % 8] + str(8 - ep_square // 8)
+    return f"{"/".join(rows)} {turn} {castling} {ep} {halfmove} {fullmove}"
+
+
+def record_struct(nb_wrong_slots: int) -> struct.Struct:
+    fen_size = struct.calcsize("<" + PACKED_FEN_FORMAT)
+    return struct.Struct(f"<IIB{nb_wrong_slots}IB{fen_size}s")
+
+
+def write_pqb(questions: Iterable[Question], path: Path) -> int:
+    """
+    Compiles `questions` into a .pqb file at `path`.
+
+    The questions are assumed to be valid (e.g. the output of `parse_data`).
+    Returns the number of questions written.
+    """
+    questions = list(questions)
+    string_ids: dict[str, int] = {}
+    packed_fens: dict[str, bytes | None] = {}
+
+    def string_id(string: str) -> int:
+        return string_ids.setdefault(string, len(string_ids))
+
+    nb_wrong_slots = max((len(q.wrong_answers) for q in questions), default=0)
+    record = record_struct(nb_wrong_slots)
+    fen_size = struct.calcsize("<" + PACKED_FEN_FORMAT)
+
+    records = bytearray()
+    for q in questions:
+        wrong_ids = [string_id(a) for a in q.wrong_answers]
+        wrong_ids += [0] * (nb_wrong_slots - len(wrong_ids))
+        if q.asset not in packed_fens:
+            packed_fens[q.asset] = pack_fen(q.asset)
+        packed = packed_fens[q.asset]
+        if packed is None:
+            kind, asset = STRING_ASSET, STRING_OFFSET.pack(string_id(q.asset)).ljust(fen_size, b"\0")
+        else:
+            kind, asset = PACKED_FEN, packed
+        records += record.pack(string_id(q.text), string_id(q.right_answer),
+                               len(q.wrong_answers), *wrong_ids, kind, asset)
+
+    encoded = [string.encode() for string in string_ids]
+    offsets, position = [], 0
+    for data in encoded:
+        offsets.append(position)
+        position += len(data)
+    offsets.append(position)
+
+    with open(path, mode="wb") as pqb_file:
+        pqb_file.write(HEADER.pack(MAGIC, len(encoded), len(questions), nb_wrong_slots))
+        pqb_file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        pqb_file.write(b"".join(encoded))
+        pqb_file.write(records)
+    return len(questions)
+
+
+class CompiledBank(Sequence[Question]):
+    """
+    Read-only question bank backed by a memory-mapped .pqb file.
+
+    Behaves like a list of `Question` objects, but a question is only built
+    from its record when it is indexed, e.g. when `QuizBrain` samples it.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, mode="rb") as pqb_file:
+            self._map = mmap(pqb_file.fileno(), 0, access=ACCESS_READ)
+
+        try:
+            magic, self._nb_strings, self._nb_questions, nb_wrong_slots = HEADER.unpack_from(self._map)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a compiled question bank")
+
+        self._record = record_struct(nb_wrong_slots)
+        self._offsets_start = HEADER.size
+        self._strings_start = self._offsets_start + STRING_OFFSET.size * (self._nb_strings + 1)
+        end_of_strings, = STRING_OFFSET.unpack_from(
+            self._map, self._offsets_start + STRING_OFFSET.size * self._nb_strings)
+        self._records_start = self._strings_start + end_of_strings
+
+    def __len__(self) -> int:
+        return self._nb_questions
+
+    def _string(self, string_id: int) -> str:
+        start, end = struct.unpack_from("<II", self._map,
+                                        self._offsets_start + STRING_OFFSET.size * string_id)
+        return self._map[self._strings_start + start:self._strings_start + end].decode()
+
+    def __getitem__(self, i: int) -> Question:
+        if not -len(self) <= i < len(self):
+            raise IndexError("question index out of range")
+        i %= len(self)
+
+        text_id, right_id, nb_wrong, *rest = self._record.unpack_from(
+            self._map, self._records_start + i * self._record.size)
+        *wrong_ids, kind, asset = rest
+        if kind == PACKED_FEN:
+            fen = unpack_fen(asset)
+        else:
+            fen = self._string(STRING_OFFSET.unpack_from(asset)[0])
+
+        return Question(text          = self._string(text_id),
+                        right_answer  = self._string(right_id),
+                        wrong_answers = [self._string(j) for j in wrong_ids[:nb_wrong]],
+                        asset         = fen)
+
+    def right_answers(self) -> Iterator[str]:
+        '''The right answer of every question, read straight off the records.'''
+        strings: dict[int, str] = {}
+        records = memoryview(self._map)[self._records_start:
+                                        self._records_start + len(self) * self._record.size]
+        for _, right_id, *_ in self._record.iter_unpack(records):
+            string = strings.get(right_id)
+            if string is None:
+                string = strings[right_id] = self._string(right_id)
+            yield string
+        records.release()
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def pqb_loader(path: Path) -> CompiledBank:
+    return CompiledBank(path)
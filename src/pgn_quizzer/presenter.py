@@ -1,16 +1,55 @@
+from concurrent.futures import Future
+
 from pgn_quizzer.model import Question
 from pgn_quizzer.model import QuizBrain
+from pgn_quizzer.profiling import stage
+from pgn_quizzer.render import render_board
 
 class QuizPresenter:
-    def __init__(self, quiz: QuizBrain):
+    """
+    Tells the view what to display for each question of `quiz`.
+
+    With `prefetch`, question N+1 (its shuffled options and board diagram)
+    is prepared in a worker thread while the user is answering question N,
+    so that moving on to the next question costs next to nothing. Call
+    `close()` once the quiz is over to cancel any unfinished preparation.
+    """
+
+    def __init__(self, quiz: QuizBrain, prefetch: bool = False, board_style: str = "unicode"):
         self.quiz: QuizBrain = quiz
+        self.board_style = board_style
         self.current_question: Question = Question("", "", [], "")
         self.current_user_choices: dict[str, str] = {"": ""}
-    
+        self.current_diagram: str | None = None
+        self._executor = None
+        self._next: Future | None = None # preparation of the next question
+        if prefetch and quiz.nb_questions_remaining():
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+            self._prefetch(quiz.nb_questions_answered)
+
     def multiple_choice_dict(self) -> dict[str, str]:
-        user_choices_list = self.quiz.generate_multiple_choice_options(self.current_question)
+        return self._choices(self.current_question)
+
+    def _choices(self, question: Question) -> dict[str, str]:
+        user_choices_list = self.quiz.generate_multiple_choice_options(question)
         return dict(zip("ABCDEF", user_choices_list))
-    
+
+    def _render(self, question: Question) -> str:
+        with stage("render"):
+            return render_board(question.asset, style=self.board_style)
+
+    def _prepare(self, number: int) -> tuple[Question, dict[str, str], str]:
+        # the question itself is read here too, as a lazy bank (e.g. SQLite)
+        # only reads it from disk when it is first asked for
+        question = self.quiz.question_at(number)
+        return question, self._choices(question), self._render(question)
+
+    def _prefetch(self, number: int) -> None:
+        if self._executor is not None and number < self.quiz.length:
+            self._next = self._executor.submit(self._prepare, number)
+
     def is_correct(self, user_answer_key: str) -> bool | None:
         key = user_answer_key.upper()
         user_answer = self.current_user_choices.get(key)
@@ -34,15 +73,36 @@ class QuizPresenter:
     def question_asset(self) -> str:
         return self.current_question.asset
 
+    def question_diagram(self) -> str:
+        '''The board diagram of the current question's asset.'''
+        if self.current_diagram is None:
+            self.current_diagram = self._render(self.current_question)
+        return self.current_diagram
+
     def cue_next_question(self) -> None:
-        self.current_question = self.quiz.next_question()
+        prepared = None
+        if self._next is not None: # wait for it, so the question isn't read twice
+            prepared, self._next = self._next.result(), None
+        question = self.quiz.next_question()
+        if prepared is not None:
+            if prepared[0] is question:
+                self.current_question, self.current_user_choices, self.current_diagram = prepared
+                self._prefetch(self.quiz.nb_questions_answered + 1)
+                return
+        self.current_question = question
         self.current_user_choices = self.multiple_choice_dict()
+        self.current_diagram = None
+        self._prefetch(self.quiz.nb_questions_answered + 1)
     
     def nb_questions_remaining(self) -> int:
         return self.quiz.nb_questions_remaining()
     
     def post_question_update(self, result: bool) -> None:
-        if result:
-            self.quiz.increment_score()
-        self.quiz.increment_nb_questions_answered()
+        self.quiz.record_answer(result)
 
+    def close(self) -> None:
+        '''Cancels any prefetching and stops the worker thread.'''
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._next = None
@@ -0,0 +1,172 @@
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from json import dump
+from pathlib import Path
+from sys import getallocatedblocks
+from threading import get_ident
+from time import perf_counter, thread_time
+import os
+
+# Stage-level timing of the quiz pipeline.
+#
+# Library code marks its stages with `stage("name")` (or `profiled(...)` for
+# the time spent pulling items from an iterator). These are no-ops unless a
+# `Profiler` is active, in which case each stage records its wall time, the
+# CPU time of its thread, and the net change in allocated memory blocks.
+# Stages nest (e.g. "read" happens within "separate"), and stages run in
+# worker processes (--workers > 1) are not recorded.
+#
+# Stages: read, separate, strip, fens, questions, validate, sample, render
+# (and load, around building the whole question bank).
+
+MAX_SPANS = 100_000
+
+
+@dataclass(slots=True)
+class Span:
+    """
+    One timed run of a stage.
+
+    Attributes:
+        name (str): The stage.
+        start (float): Seconds since the profiler started.
+        wall (float): Wall time, in seconds.
+        cpu (float): CPU time of the running thread, in seconds.
+        blocks (int): Net change in the number of allocated memory blocks.
+        thread (int): Identifier of the running thread.
+    """
+    name: str
+    start: float
+    wall: float
+    cpu: float
+    blocks: int
+    thread: int
+
+
+@dataclass(slots=True)
+class StageTotals:
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    blocks: int = 0
+
+
+class Profiler:
+    """
+    Collects the spans of every stage run while it is active.
+
+    Per-stage totals are always kept; individual spans are kept up to
+    `max_spans` (per-game stages of a large PGN would otherwise produce
+    millions), after which they are only counted in `dropped`. `on_span`
+    is called with every span, e.g. to stream them elsewhere.
+
+    Use as a context manager, or with `enable_profiling` / `disable_profiling`.
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS,
+                 on_span: Callable[[Span], None] | None = None):
+        self.max_spans = max_spans
+        self.on_span = on_span
+        self.spans: list[Span] = []
+        self.totals: dict[str, StageTotals] = {}
+        self.dropped = 0
+        self.origin = perf_counter()
+
+    def __enter__(self) -> "Profiler":
+        enable_profiling(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        disable_profiling()
+
+    def record(self, span: Span) -> None:
+        totals = self.totals.get(span.name)
+        if totals is None:
+            totals = self.totals[span.name] = StageTotals()
+        totals.calls += 1
+        totals.wall += span.wall
+        totals.cpu += span.cpu
+        totals.blocks += span.blocks
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        if self.on_span is not None:
+            self.on_span(span)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        blocks, cpu, wall = getallocatedblocks(), thread_time(), perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            self.record(Span(name, wall - self.origin, end - wall, thread_time() - cpu,
+                             getallocatedblocks() - blocks, get_ident()))
+
+    def summary(self) -> dict:
+        return {"stages": {name: asdict(totals) for name, totals in self.totals.items()},
+                "spans": [asdict(span) for span in self.spans],
+                "dropped_spans": self.dropped}
+
+    def chrome_trace(self) -> dict:
+        '''The spans in Chrome's trace event format (chrome://tracing, Perfetto).'''
+        pid = os.getpid()
+        events = [{"name": span.name, "cat": "stage", "ph": "X", "pid": pid, "tid": span.thread,
+                   "ts": 1e6 * span.start, "dur": 1e6 * span.wall,
+                   "args": {"cpu_ms": 1e3 * span.cpu, "blocks": span.blocks}}
+                  for span in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_spans": self.dropped}}
+
+    def write(self, path: Path, format: str = "chrome") -> None:
+        '''Writes the spans as a Chrome trace ("chrome") or a JSON summary ("json").'''
+        data = self.chrome_trace() if format == "chrome" else self.summary()
+        with open(path, mode="w") as out:
+            dump(data, out)
+
+
+PROFILE_FORMATS = ("chrome", "json")
+
+_active: Profiler | None = None
+
+
+def enable_profiling(profiler: Profiler | None = None) -> Profiler:
+    '''Makes `profiler` (or a new one) record every stage from now on.'''
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+
+def disable_profiling() -> Profiler | None:
+    '''Stops profiling; returns the profiler that was active, if any.'''
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+def active_profiler() -> Profiler | None:
+    return _active
+
+
+def stage(name: str):
+    '''Context manager timing a stage; does nothing unless profiling is on.'''
+    return nullcontext() if _active is None else _active.stage(name)
+
+
+def profiled(items: Iterable, name: str) -> Iterable:
+    '''Times, as stage `name`, each step of iterating over `items`.'''
+    if _active is None:
+        return items
+    return _profiled(iter(items), name, _active)
+
+
+def _profiled(items: Iterator, name: str, profiler: Profiler) -> Iterator:
+    while True:
+        with profiler.stage(name):
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from threading import Lock
+
+# Board diagrams for question assets.
+#
+# Every question shows its position as a diagram, and the same positions
+# come up again whenever a bank is replayed. Diagrams are therefore cached,
+# keyed by (FEN, orientation, style), in a bounded least-recently-used
+# cache shared by every view, so that repeated sessions over a bank do
+# almost no rendering work. python-chess is only imported on a cache miss.
+
+RENDER_CACHE_SIZE = 4096
+WHITE, BLACK = True, False # same values as chess.WHITE / chess.BLACK
+
+
+def side_to_move(fen: str) -> bool:
+    fields = fen.split()
+    return BLACK if len(fields) > 1 and fields[1] == "b" else WHITE
+
+
+def _unicode(fen: str, orientation: bool) -> str:
+    from chess import Board
+
+    return Board(fen).unicode(invert_color=True, orientation=orientation)
+
+
+def _ascii(fen: str, orientation: bool) -> str:
+    from chess import Board
+
+    lines = str(Board(fen)).splitlines()
+    if orientation == BLACK:
+        lines = [line[::-1] for line in reversed(lines)]
+    return "\n".join(lines)
+
+
+def _svg(fen: str, orientation: bool) -> str:
+    from chess import Board
+    from chess.svg import board
+
+    return board(Board(fen), orientation=orientation)
+
+
+RENDER_STYLES: dict[str, Callable[[str, bool], str]] = {
+    "unicode": _unicode,
+    "ascii": _ascii,
+    "svg": _svg,
+}
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered board diagrams.
+
+    Safe to share between threads. `hits`, `misses` and `evictions` count
+    what the cache has done since it was created (or last cleared).
+    """
+
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._diagrams: OrderedDict[tuple[str, bool, str], str] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._diagrams)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._diagrams.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def render(self, fen: str, orientation: bool | None = None, style: str = "unicode") -> str:
+        """
+        The diagram of the position in `fen`.
+
+        Args:
+            fen: The position.
+            orientation: The side at the bottom of the board (WHITE or
+                BLACK); by default, the side to move.
+            style: One of RENDER_STYLES.
+
+        Raises:
+            ValueError: If `style` is unknown or `fen` is not a valid FEN.
+        """
+        backend = RENDER_STYLES.get(style)
+        if backend is None:
+            raise ValueError(f"Unknown board style {style!r}; "
+                             f"choose from {", ".join(RENDER_STYLES)}.")
+        if orientation is None:
+            orientation = side_to_move(fen)
+        key = (fen, orientation, style)
+
+        with self._lock:
+            diagram = self._diagrams.get(key)
+            if diagram is not None:
+                self._diagrams.move_to_end(key)
+                self.hits += 1
+                return diagram
+            self.misses += 1
+
+        diagram = backend(fen, orientation)
+        with self._lock:
+            self._diagrams[key] = diagram
+            while len(self._diagrams) > self.maxsize:
+                self._diagrams.popitem(last=False)
+                self.evictions += 1
+        return diagram
+
+
+default_render_cache = RenderCache()
+
+
+def render_board(fen: str, orientation: bool | None = None, style: str = "unicode") -> str:
+    '''Renders `fen` through the shared cache (see `RenderCache.render`).'''
+    return default_render_cache.render(fen, orientation, style)
@@ -0,0 +1,175 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+import heapq
+import os
+from pathlib import Path
+from random import Random
+import sqlite3
+from time import time
+
+from pgn_quizzer.model import Question
+from pgn_quizzer.session import bank_identity
+
+# Spaced repetition (`--review`): instead of sampling every quiz at random,
+# questions are scheduled per user with SM-2, so known positions come back
+# rarely and missed ones soon.
+#
+# Every answer is appended to an `answers` log in SQLite, and each
+# question's SM-2 state (a "card") is kept in a `cards` table keyed by user,
+# bank and question index, so recording an answer is one B-tree update.
+# In memory, the user's cards sit in a heap ordered by due time; an update
+# pushes a new entry (O(log n)) and the outdated one is skipped when popped.
+# A quiz takes the questions that are due first, then questions never seen
+# before, then those due soonest.
+
+SECONDS_PER_DAY = 86_400
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+RIGHT, WRONG = 4, 1 # SM-2 response qualities (0-5) of a right and a wrong answer
+NEW_QUESTION_TRIES = 32 # random draws per new question before scanning the bank
+
+
+def default_history_path() -> Path:
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "pgn_quizzer" / "history.sqlite"
+
+
+@dataclass(slots=True)
+class Card:
+    repetitions: int = 0 # right answers in a row
+    interval: float = 0.0 # days
+    ease: float = INITIAL_EASE
+    due: float = 0.0 # seconds since the epoch
+
+    def review(self, quality: int, now: float) -> None:
+        '''Updates the card with SM-2 after an answer of `quality` (0 to 5) at `now`.'''
+        if quality < 3:
+            self.repetitions = 0
+            self.interval = 1.0
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1.0
+            elif self.repetitions == 2:
+                self.interval = 6.0
+            else:
+                self.interval *= self.ease
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.due = now + self.interval * SECONDS_PER_DAY
+
+
+class ReviewScheduler:
+    """
+    Picks and records questions of `question_bank` for `user` by spaced
+    repetition, with the history kept in an SQLite database at `path`.
+
+    Questions are identified by their index in the bank, together with the
+    bank's identity, so a history recorded against another bank is left
+    alone. That is an SQLite bank's uuid, which games appended to it keep
+    (see `SqliteBank.identity`), otherwise a digest of the bank (see
+    `bank_identity`).
+    """
+
+    def __init__(self, question_bank: Sequence[Question], path: Path, user: str = "default",
+                 seed: int | None = None):
+        if len(question_bank) == 0:
+            raise ValueError("No questions provided. "
+                             "Argument question_bank should be non-empty.")
+        self.question_bank = question_bank
+        self.bank_id = getattr(question_bank, "identity", None) or bank_identity(question_bank)
+        self.user = user
+        self.random = Random(seed)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS cards (
+                user TEXT, bank BLOB, question INTEGER,
+                repetitions INTEGER, interval REAL, ease REAL, due REAL,
+                PRIMARY KEY (user, bank, question)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS answers (
+                user TEXT, bank BLOB, question INTEGER, time REAL, correct INTEGER);
+        """)
+        self.cards: dict[int, Card] = {
+            question: Card(repetitions, interval, ease, due)
+            for question, repetitions, interval, ease, due in self._db.execute(
+                "SELECT question, repetitions, interval, ease, due FROM cards "
+                "WHERE user = ? AND bank = ?", (user, self.bank_id))
+            if question < len(question_bank)}
+        self._heap = [(card.due, question) for question, card in self.cards.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        '''Number of questions the user has answered at least once.'''
+        return len(self.cards)
+
+    def _pop(self) -> tuple[float, int] | None:
+        while self._heap:
+            due, question = heapq.heappop(self._heap)
+            card = self.cards.get(question)
+            if card is not None and card.due == due: # else outdated by a later answer
+                return due, question
+        return None
+
+    def _new_questions(self, count: int, exclude: set[int]) -> list[int]:
+        nb_questions = len(self.question_bank)
+        chosen: list[int] = []
+        for _ in range(NEW_QUESTION_TRIES * count):
+            if len(chosen) == count:
+                return chosen
+            question = self.random.randrange(nb_questions)
+            if question not in self.cards and question not in exclude:
+                exclude.add(question)
+                chosen.append(question)
+        # nearly every question has been seen: look for the rest in order
+        for question in range(nb_questions):
+            if len(chosen) == count:
+                break
+            if question not in self.cards and question not in exclude:
+                exclude.add(question)
+                chosen.append(question)
+        return chosen
+
+    def next_indices(self, length: int, now: float | None = None) -> list[int]:
+        '''
+        Bank indices of the next `length` questions (fewer if the bank is
+        smaller): due questions, most overdue first, then new questions,
+        then the questions due soonest.
+        '''
+        now = time() if now is None else now
+        length = min(length, len(self.question_bank))
+        popped: list[tuple[float, int]] = []
+        while len(popped) < length and self._heap and self._heap[0][0] <= now:
+            if (entry := self._pop()) is not None:
+                popped.append(entry)
+                if entry[0] > now: # only outdated entries were due
+                    break
+        chosen = [question for due, question in popped if due <= now]
+        chosen += self._new_questions(length - len(chosen), set(chosen))
+        chosen += [question for due, question in popped if due > now][:length - len(chosen)]
+        while len(chosen) < length and (entry := self._pop()) is not None:
+            popped.append(entry)
+            chosen.append(entry[1])
+        for entry in popped: # they stay scheduled until answered
+            heapq.heappush(self._heap, entry)
+        return chosen
+
+    def record(self, question: int, correct: bool, now: float | None = None) -> Card:
+        '''Records an answer to the question at index `question` and reschedules it.'''
+        now = time() if now is None else now
+        card = self.cards.setdefault(question, Card())
+        card.review(RIGHT if correct else WRONG, now)
+        heapq.heappush(self._heap, (card.due, question))
+        if len(self._heap) > 2 * len(self.cards) + 64: # mostly outdated entries
+            self._heap = [(card.due, question) for question, card in self.cards.items()]
+            heapq.heapify(self._heap)
+
+        with self._db:
+            self._db.execute("INSERT INTO answers VALUES (?, ?, ?, ?, ?)",
+                             (self.user, self.bank_id, question, now, correct))
+            self._db.execute("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (self.user, self.bank_id, question, card.repetitions,
+                              card.interval, card.ease, card.due))
+        return card
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,258 @@
+import asyncio
+from collections import deque
+from collections.abc import Sequence
+from json import JSONDecodeError, dumps, loads
+from pathlib import Path
+from secrets import token_urlsafe
+from time import monotonic
+
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.session import Session, SessionStore
+
+# A small HTTP/JSON quiz server (`--ui server`), on asyncio streams only.
+#
+# The question bank is loaded once and shared read-only by every session;
+# a session only holds its `QuizBrain` (the sampled questions and the
+# score), and idle sessions are packed into a few bytes each by a
+# `SessionStore`. Options are shuffled from the quiz's seed, so a restored
+# session offers the same ones. Connections are kept alive, so a client
+# can play a whole quiz over one connection.
+#
+# A session is dropped FINISHED_GRACE seconds after its last question is
+# answered (time enough to fetch or DELETE it; the answer already carries
+# the final score), or once it has gone unused for `session_ttl` seconds,
+# so that finished and abandoned quizzes don't hold places until the
+# server fills up.
+#
+#   POST   /sessions                 {"length": 5}  -> {"session": id, "length": n} (n <= 101)
+#   GET    /sessions/<id>/question                  -> {"number", "text", "asset", "choices"}
+#   POST   /sessions/<id>/answer     {"choice": "A"} -> {"correct", "right_answer", "score", ...}
+#   DELETE /sessions/<id>                           -> {"score", "answered"}
+#   GET    /health                                  -> {"sessions": n, "questions": n, ...}
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_SESSIONS = 100_000
+MAX_LENGTH = 101 # as for `--length`
+SESSION_TTL = 24 * 60 * 60 # seconds
+FINISHED_GRACE = 60 # seconds
+SWEEP_INTERVAL = 60 # seconds between looking for expired sessions
+MAX_BODY_BYTES = 64 * 2**10
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class QuizServer:
+    """
+    Serves quiz sessions over HTTP, all drawing from one shared bank.
+
+    Attributes:
+        question_bank (Sequence[Question]): Shared by every session; never modified.
+        sessions (SessionStore): Open sessions by id.
+    """
+
+    def __init__(self, question_bank: Sequence[Question], length: int = 5,
+                 max_sessions: int = MAX_SESSIONS, sessions: SessionStore | None = None,
+                 session_ttl: float = SESSION_TTL):
+        if len(question_bank) == 0:
+            raise ValueError("No questions provided. "
+                             "Argument question_bank should be non-empty.")
+        self.question_bank = question_bank
+        self.length = length
+        self.max_sessions = max_sessions
+        self.sessions = SessionStore(question_bank) if sessions is None else sessions
+        self.session_ttl = session_ttl
+        self.nb_requests = 0
+        self._last_sweep = monotonic()
+        self._finished: deque[tuple[float, str]] = deque() # (when, session id), oldest first
+
+    # -------------------------
+    # Quiz operations
+    # -------------------------
+
+    def _sweep(self) -> None:
+        # at most once a SWEEP_INTERVAL, unless the server is full
+        now = monotonic()
+        if len(self.sessions) < self.max_sessions and now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        while self._finished and now - self._finished[0][0] >= FINISHED_GRACE:
+            self.sessions.remove(self._finished.popleft()[1])
+        self.sessions.expire(self.session_ttl)
+        self._last_sweep = now
+
+    def create_session(self, length: int | None = None) -> dict:
+        length = self.length if length is None else length
+        if (not isinstance(length, int) or isinstance(length, bool)
+                or not 1 <= length <= MAX_LENGTH):
+            raise HttpError(400, f"length must be an integer from 1 to {MAX_LENGTH}")
+        self._sweep()
+        if len(self.sessions) >= self.max_sessions:
+            raise HttpError(503, "too many open sessions")
+        session_id = token_urlsafe(12)
+        session = Session(QuizBrain(self.question_bank, length))
+        self.sessions.add(session_id, session)
+        return {"session": session_id, "length": session.quiz.length}
+
+    def _session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HttpError(404, f"no session {session_id!r}")
+        return session
+
+    def question(self, session_id: str) -> dict:
+        session = self._session(session_id)
+        quiz = session.quiz
+        if not quiz.nb_questions_remaining():
+            raise HttpError(409, "the quiz is over")
+        question = quiz.next_question()
+        session.offered = True
+        return {"number": quiz.current_question_number(),
+                "text": question.text,
+                "asset": question.asset,
+                "choices": self._choices(session)}
+
+    @staticmethod
+    def _choices(session: Session) -> dict[str, str]:
+        if session.choices is None:
+            session.choices = dict(zip("ABCDEF", session.quiz.seeded_multiple_choice_options()))
+        return session.choices
+
+    def answer(self, session_id: str, choice) -> dict:
+        session = self._session(session_id)
+        quiz = session.quiz
+        if not session.offered:
+            raise HttpError(409, "no question on offer; GET the question first")
+        choices = self._choices(session)
+        if not isinstance(choice, str) or choice.upper() not in choices:
+            raise HttpError(400, f"choice must be one of {", ".join(choices)}")
+
+        question = quiz.next_question()
+        correct = choices[choice.upper()] == question.right_answer
+        if correct:
+            quiz.increment_score()
+        quiz.increment_nb_questions_answered()
+        session.offered = False
+        session.choices = None
+        if not quiz.nb_questions_remaining():
+            self._finished.append((monotonic(), session_id))
+        return {"correct": correct,
+                "right_answer": question.right_answer,
+                "score": quiz.user_score,
+                "answered": quiz.nb_questions_answered,
+                "remaining": quiz.nb_questions_remaining()}
+
+    def close_session(self, session_id: str) -> dict:
+        quiz = self._session(session_id).quiz
+        self.sessions.remove(session_id)
+        return {"score": quiz.user_score, "answered": quiz.nb_questions_answered}
+
+    # -------------------------
+    # HTTP
+    # -------------------------
+
+    def route(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        parts = path.strip("/").split("/")
+        if parts == ["health"] and method == "GET":
+            return 200, {"sessions": len(self.sessions), "questions": len(self.question_bank),
+                         **self.sessions.counters()}
+        if parts == ["sessions"] and method == "POST":
+            return 201, self.create_session(body.get("length"))
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session_id, action = parts[1], parts[2:]
+            if action == [] and method == "DELETE":
+                return 200, self.close_session(session_id)
+            if action == ["question"] and method == "GET":
+                return 200, self.question(session_id)
+            if action == ["answer"] and method == "POST":
+                return 200, self.answer(session_id, body.get("choice"))
+            if action in ([], ["question"], ["answer"]):
+                raise HttpError(405, f"{method} not allowed on {path}")
+        raise HttpError(404, f"no route for {method} {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                keep_alive = await self._respond(head, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, head: bytes, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> bool:
+        self.nb_requests += 1
+        lines = head.decode("latin-1").split("\r\n")
+        request_line = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+
+        try:
+            if len(request_line) != 3:
+                raise HttpError(400, "malformed request line")
+            method, path, _ = request_line
+            length = int(headers.get("content-length", "0") or 0)
+            if length > MAX_BODY_BYTES:
+                keep_alive = False
+                raise HttpError(413, "request body too large")
+            body = loads(await reader.readexactly(length)) if length else {}
+            if not isinstance(body, dict):
+                raise HttpError(400, "request body must be a JSON object")
+            status, payload = self.route(method, path.split("?")[0], body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ValueError, JSONDecodeError):
+            status, payload = 400, {"error": "malformed request"}
+
+        data = dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n"
+                     f"Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n".encode()
+                     + data)
+        return keep_alive
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        '''Starts listening; the returned server is already serving.'''
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+
+def run_quiz_server(question_bank: Sequence[Question], length: int = 5,
+                    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    session_db: Path | None = None) -> None:
+    '''Serves quizzes from `question_bank` until interrupted. With a
+    `session_db`, sessions are saved there on exit and resumed on restart.'''
+    sessions = SessionStore(question_bank, path=session_db)
+
+    async def main() -> None:
+        server = await QuizServer(question_bank, length, sessions=sessions).serve(host, port)
+        print(f"Serving quizzes on http://{host}:{port} (Ctrl+C to stop).")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if session_db is not None:
+            sessions.flush()
+        sessions.close()
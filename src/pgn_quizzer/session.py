@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+import sqlite3
+import struct
+from tempfile import mkstemp
+from time import time
+import os
+
+from pgn_quizzer.model import Question, QuizBrain
+
+# Quiz sessions for long-running, many-user setups (e.g. the quiz server).
+#
+# A quiz is fully determined by its question bank, length and seed (see
+# `QuizBrain`), so a session's state packs into 27 bytes: the bank's
+# identity, the seed, the length, the number answered, the score, whether
+# a question is on offer, and when the session was last used. Live
+# sessions hold a `QuizBrain`; once there are more than `max_active` of
+# them, the least recently used are packed and kept idle in memory, and
+# once the idle states outgrow `max_idle_bytes` the oldest are spilled to
+# SQLite. Any of them is restored on its next use, unless it has expired
+# (see `SessionStore.expire`) in the meantime.
+
+STATE = struct.Struct("<8sQHHH?I") # lengths fit 16 bits; times are whole seconds
+BANK_ID_SAMPLE = 1024
+MAX_ACTIVE = 10_000
+MAX_IDLE_BYTES = 16 * 2**20
+
+
+def bank_identity(question_bank: Sequence[Question]) -> bytes:
+    '''An 8-byte identity of the bank: its size plus an evenly spaced sample of its questions.'''
+    digest = blake2b(str(len(question_bank)).encode(), digest_size=8)
+    step = max(len(question_bank) // BANK_ID_SAMPLE, 1)
+    for i in range(0, len(question_bank), step):
+        question = question_bank[i]
+        digest.update(f"{question.right_answer}\0{question.asset}\0".encode())
+    return digest.digest()
+
+
+@dataclass(slots=True)
+class Session:
+    quiz: QuizBrain
+    offered: bool = False # whether the next question's options have been shown
+    choices: dict[str, str] | None = None # those options, by key; rebuilt from the seed on restore
+    used: float = 0.0 # when last looked up, as by `time()`
+
+    def pack(self, bank_id: bytes) -> bytes:
+        quiz = self.quiz
+        return STATE.pack(bank_id, quiz.seed, quiz.length, quiz.nb_questions_answered,
+                          quiz.user_score, self.offered, int(self.used))
+
+    @classmethod
+    def unpack(cls, state: bytes, question_bank: Sequence[Question], bank_id: bytes) -> "Session":
+        '''
+        Raises:
+            ValueError: If the state was packed for a different bank.
+        '''
+        state_bank_id, seed, length, answered, score, offered, used = STATE.unpack(state)
+        if state_bank_id != bank_id:
+            raise ValueError("Session belongs to a different question bank.")
+        quiz = QuizBrain(question_bank, length, seed=seed)
+        quiz.nb_questions_answered = answered
+        quiz.user_score = score
+        return cls(quiz, offered, used=used)
+
+
+class SessionStore:
+    """
+    Sessions by id, with at most `max_active` live `QuizBrain`s and at most
+    `max_idle_bytes` of packed idle states in memory; the rest live in an
+    SQLite database at `path` (by default a temporary file, made on first use
+    and deleted by `close()`). Sessions packed for a different bank are not
+    restored. Active, idle and spilled sessions are each kept in order of
+    last use, so expiring the stale ones only visits those.
+
+    Counters:
+        hits: Lookups of a live session.
+        restores: Idle or spilled sessions brought back to life.
+        evictions: Live sessions packed away.
+        spills: Packed sessions written to SQLite.
+        expirations: Sessions dropped for going unused too long.
+    """
+
+    def __init__(self, question_bank: Sequence[Question], max_active: int = MAX_ACTIVE,
+                 max_idle_bytes: int = MAX_IDLE_BYTES, path: Path | None = None):
+        if max_active < 1:
+            raise ValueError("At least one session must be allowed to stay active.")
+        self.question_bank = question_bank
+        self.bank_id = bank_identity(question_bank)
+        self.max_active = max_active
+        self.max_idle_bytes = max_idle_bytes
+        self.path = path
+        self.hits = self.restores = self.evictions = self.spills = self.expirations = 0
+        self._active: OrderedDict[str, Session] = OrderedDict()
+        self._idle: OrderedDict[str, bytes] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._temporary = False # whether `path` is ours to delete
+        self._nb_spilled = 0
+        if path is not None and path.exists():
+            self._nb_spilled = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def __len__(self) -> int:
+        return len(self._active) + len(self._idle) + self._nb_spilled
+
+    def __contains__(self, session_id: str) -> bool:
+        return (session_id in self._active or session_id in self._idle
+                or (self._nb_spilled > 0 and self._load(session_id) is not None))
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self._active)
+        yield from list(self._idle)
+        if self._nb_spilled:
+            yield from [row[0] for row in self._connect().execute("SELECT id FROM sessions")]
+
+    def nb_active(self) -> int:
+        return len(self._active)
+
+    def idle_bytes(self) -> int:
+        return STATE.size * len(self._idle)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path is None:
+                fd, name = mkstemp(prefix="pgn_quizzer_sessions_", suffix=".sqlite")
+                os.close(fd)
+                self.path = Path(name)
+                self._temporary = True
+            self._db = sqlite3.connect(self.path)
+            columns = [column for _, column, *_ in self._db.execute("PRAGMA table_info(sessions)")]
+            if columns and "used" not in columns: # states packed without a time can't be read
+                self._db.execute("DROP TABLE sessions")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state BLOB, used INTEGER);
+                CREATE INDEX IF NOT EXISTS sessions_by_use ON sessions (used);
+            """)
+        return self._db
+
+    def _load(self, session_id: str) -> bytes | None:
+        row = self._connect().execute("SELECT state FROM sessions WHERE id = ?",
+                                      (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, session_id: str, session: Session) -> None:
+        session.used = time()
+        self._active[session_id] = session
+        self._active.move_to_end(session_id)
+        self._evict()
+
+    def get(self, session_id: str) -> Session | None:
+        session = self._active.get(session_id)
+        if session is not None:
+            session.used = time()
+            self._active.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+        state = self._idle.pop(session_id, None)
+        if state is None and self._nb_spilled:
+            state = self._load(session_id)
+            if state is not None:
+                self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._db.commit()
+                self._nb_spilled -= 1
+        if state is None:
+            return None
+        try:
+            session = Session.unpack(state, self.question_bank, self.bank_id)
+        except ValueError: # left over from another bank
+            return None
+        self.restores += 1
+        self.add(session_id, session)
+        return session
+
+    def remove(self, session_id: str) -> Session | None:
+        session = self.get(session_id)
+        if session is not None:
+            del self._active[session_id]
+        return session
+
+    def _evict(self) -> None:
+        while len(self._active) > self.max_active:
+            session_id, session = self._active.popitem(last=False)
+            self._idle[session_id] = session.pack(self.bank_id)
+            self.evictions += 1
+        if self.idle_bytes() > self.max_idle_bytes:
+            spilled = []
+            while self.idle_bytes() > self.max_idle_bytes // 2: # spill in batches
+                spilled.append(self._idle.popitem(last=False))
+            db = self._connect()
+            db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                           [(session_id, state, STATE.unpack(state)[-1])
+                            for session_id, state in spilled])
+            db.commit()
+            self.spills += len(spilled)
+            self._nb_spilled += len(spilled)
+
+    def flush(self) -> None:
+        '''Writes every session to SQLite (e.g. before shutting down).'''
+        rows = [(session_id, session.pack(self.bank_id))
+                for session_id, session in self._active.items()]
+        rows += list(self._idle.items())
+        if rows:
+            db = self._connect()
+            db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                           [(session_id, state, STATE.unpack(state)[-1])
+                            for session_id, state in rows])
+            db.commit()
+            self._nb_spilled += len(rows)
+            self._active.clear()
+            self._idle.clear()
+
+    def expire(self, ttl: float, now: float | None = None) -> int:
+        '''Drops the sessions not used in the last `ttl` seconds (before
+        `now`, by default the current time). Returns the number dropped.'''
+        cutoff = (time() if now is None else now) - ttl
+        nb_expired = 0
+        while self._active:
+            session_id, session = next(iter(self._active.items()))
+            if session.used >= cutoff:
+                break
+            del self._active[session_id]
+            nb_expired += 1
+        while self._idle:
+            session_id, state = next(iter(self._idle.items()))
+            if STATE.unpack(state)[-1] >= cutoff:
+                break
+            del self._idle[session_id]
+            nb_expired += 1
+        if self._nb_spilled:
+            db = self._connect()
+            nb_spilled = db.execute("DELETE FROM sessions WHERE used < ?", (cutoff,)).rowcount
+            db.commit()
+            self._nb_spilled -= nb_spilled
+            nb_expired += nb_spilled
+        self.expirations += nb_expired
+        return nb_expired
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._temporary:
+            self.path.unlink(missing_ok=True)
+            self.path, self._temporary, self._nb_spilled = None, False, 0
+
+    def counters(self) -> dict[str, int]:
+        return {"active": len(self._active), "idle": len(self._idle), "spilled": self._nb_spilled,
+                "hits": self.hits, "restores": self.restores,
+                "evictions": self.evictions, "spills": self.spills,
+                "expirations": self.expirations}
@@ -0,0 +1,157 @@
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from heapq import nlargest
+from random import Random
+
+from pgn_quizzer.distractors import TitleTable
+
+# Plausible wrong answers: games that share a player, an event, an opening
+# family or an era with the right answer, and whose asset positions carry
+# similar material, make for harder questions than uniformly random titles.
+#
+# Features are stored column-wise per title id. Candidates come from small
+# posting lists ("buckets") keyed on each feature, each capped at
+# BUCKET_SAMPLE entries per query, so a lookup costs the same for a bank of
+# 1k or 100k+ games instead of scanning every title.
+
+BUCKET_SAMPLE = 32
+NO_YEAR = -1
+
+# material signature: number of each piece type on the board
+MATERIAL_PIECES = "PNBRQpnbrq"
+PIECE_VALUES = (1, 3, 3, 5, 9)
+
+WEIGHTS = {
+    "player": 3.0,
+    "event": 2.0,
+    "eco": 2.0,
+    "eco_family": 1.0,
+    "decade": 1.0,
+    "year": 0.1, # per year apart
+    "material": 0.1, # per pawn's worth of difference, per side
+    }
+
+
+def material_signature(fen: str) -> tuple[int, ...]:
+    placement = fen.split(" ")[0]
+    return tuple(placement.count(piece) for piece in MATERIAL_PIECES)
+
+
+def material_points(fen: str) -> tuple[int, int]:
+    '''Material of white and black in pawns (P=1, N=B=3, R=5, Q=9).'''
+    counts = material_signature(fen)
+    white = sum(n * v for n, v in zip(counts[:5], PIECE_VALUES))
+    black = sum(n * v for n, v in zip(counts[5:], PIECE_VALUES))
+    return white, black
+
+
+def _year(date: str) -> int:
+    year = date[:4]
+    return int(year) if year.isdigit() else NO_YEAR
+
+
+def _surname(player: str) -> str:
+    return player.split(",")[0].strip()
+
+
+class SimilarityIndex:
+    """
+    Ranks titles by how plausible they are as wrong answers for each other.
+
+    Built once at ingest time from the games' PGN headers (players, event,
+    year, ECO code) and the material of their first asset position. Offers
+    the same `sample_batch` / `max_distractors` interface as `TitleTable`,
+    so it can stand in for it when generating question data; if too few
+    plausible titles are found, the rest are drawn at random.
+    """
+
+    def __init__(self, games: Iterable, table: TitleTable, rng: Random | None = None):
+        self.table = table
+        self.rng = rng or table.rng
+        size = len(table)
+        self.years = array("h", [NO_YEAR] * size)
+        self.white_material = array("B", [0] * size)
+        self.black_material = array("B", [0] * size)
+        self.keys: list[frozenset] = [frozenset()] * size
+        self.buckets: dict[tuple, list[int]] = defaultdict(list)
+
+        seen = set()
+        for game in games:
+            title_id = table.ids.get(game.title)
+            if title_id is None or title_id in seen:
+                continue
+            seen.add(title_id)
+            self._add(title_id, game)
+
+    def _add(self, title_id: int, game) -> None:
+        tags = game.tags
+        year = _year(tags.get("Date", ""))
+        eco = tags.get("ECO", "").strip()
+        keys = [("player", _surname(tags.get(colour, ""))) for colour in ("White", "Black")]
+        keys += [("event", tags.get("Event", "").strip()),
+                 ("eco", eco),
+                 ("eco_family", eco[:1]),
+                 ("decade", year // 10 if year != NO_YEAR else None)]
+        keys = [key for key in keys if key[1] not in ("", "?", None)]
+
+        self.years[title_id] = year
+        self.keys[title_id] = frozenset(keys)
+        for key in keys:
+            self.buckets[key].append(title_id)
+
+        fens = [fen for fens in game.fen_assets.values() for fen in fens]
+        if fens:
+            white, black = material_points(fens[0])
+            self.white_material[title_id] = min(white, 255)
+            self.black_material[title_id] = min(black, 255)
+
+    def score(self, a: int, b: int) -> float:
+        shared = self.keys[a] & self.keys[b]
+        score = sum(WEIGHTS[kind] for kind, _ in shared)
+        if self.years[a] != NO_YEAR and self.years[b] != NO_YEAR:
+            score -= WEIGHTS["year"] * abs(self.years[a] - self.years[b])
+        score -= WEIGHTS["material"] * (abs(self.white_material[a] - self.white_material[b])
+                                        + abs(self.black_material[a] - self.black_material[b]))
+        return score
+
+    def candidates(self, title_id: int) -> set[int]:
+        found = set()
+        for key in self.keys[title_id]:
+            bucket = self.buckets[key]
+            if len(bucket) > BUCKET_SAMPLE:
+                bucket = self.rng.sample(bucket, BUCKET_SAMPLE)
+            found.update(bucket)
+        found.discard(title_id)
+        return found
+
+    def nearest(self, title_id: int | None, k: int) -> list[int]:
+        '''The `k` most plausible distractor ids for `title_id` (ties broken at random).'''
+        if title_id is None:
+            return []
+        score, random = self.score, self.rng.random
+        scored = ((score(title_id, other) + random() * 1e-3, other)
+                  for other in self.candidates(title_id))
+        return [other for _, other in nlargest(k, scored)]
+
+    def max_distractors(self, exclude_id: int | None) -> int:
+        return self.table.max_distractors(exclude_id)
+
+    def sample_excluding(self, k: int, exclude_id: int | None) -> list[int]:
+        picks = self.nearest(exclude_id, k)
+        if len(picks) < k:
+            # top up with random titles that aren't already picked
+            chosen = set(picks)
+            for i in self.table.sample_excluding(min(k + len(chosen), self.max_distractors(exclude_id)),
+                                                 exclude_id):
+                if len(picks) == k:
+                    break
+                if i not in chosen:
+                    picks.append(i)
+        self.rng.shuffle(picks)
+        return picks
+
+    def sample_batch(self, exclude_ids: Sequence[int | None], k: int) -> list[list[str]]:
+        titles = self.table.titles
+        return [[titles[i] for i in self.sample_excluding(k, exclude_id)]
+                for exclude_id in exclude_ids]
@@ -0,0 +1,233 @@
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+import re
+import sqlite3
+from uuid import uuid4
+
+from pgn_quizzer.header_index import title_tags
+from pgn_quizzer.model import Question
+
+# Question bank stored in SQLite (.sqlite), for banks too large to load or
+# map whole. Opening one reads nothing but the row count, and each question
+# is fetched by primary key when it is indexed, so a quiz costs `length`
+# lookups whatever the size of the bank.
+#
+# Tables (normalized; every title is stored once):
+#   titles          id, title                               unique index on title
+#   games           id, title_id, white, black, event,      indexes on title_id,
+#                   site, year, eco                         year and eco
+#
+# A game row stands for one game of the source, not for one title: two
+# games between the same players, at the same site, in the same year share
+# a title but keep their own headers.
+#   positions       id, game_id, text, ply, asset           indexes on game_id and ply
+#   wrong_answers   position_id, slot, title_id
+#   metadata        key, value                              "uuid": the bank's identity
+#
+# The uuid is drawn when the bank is written and kept as games are appended
+# to it (see `ingest`), so a review history recorded against the bank
+# still applies once it has grown.
+#
+# Position ids run from 1 to the number of questions with no gaps, so
+# question i is row i + 1 and a random sample is a sample of ids (the bank
+# never needs `ORDER BY RANDOM()`, which would scan the whole table).
+
+APPLICATION_ID = 0x50514231 # "PQB1"
+SCHEMA = """
+    CREATE TABLE titles (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE);
+    CREATE TABLE games (id INTEGER PRIMARY KEY, title_id INTEGER NOT NULL REFERENCES titles,
+                        white TEXT, black TEXT, event TEXT, site TEXT, year INTEGER, eco TEXT);
+    CREATE TABLE positions (id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL REFERENCES games,
+                            text TEXT NOT NULL, ply INTEGER, asset TEXT NOT NULL);
+    CREATE TABLE wrong_answers (position_id INTEGER NOT NULL REFERENCES positions,
+                                slot INTEGER NOT NULL, title_id INTEGER NOT NULL REFERENCES titles,
+                                PRIMARY KEY (position_id, slot)) WITHOUT ROWID;
+    CREATE TABLE metadata (key TEXT PRIMARY KEY, value BLOB);
+"""
+INDEXES = """
+    CREATE INDEX games_by_title ON games (title_id);
+    CREATE INDEX games_by_year ON games (year);
+    CREATE INDEX games_by_eco ON games (eco);
+    CREATE INDEX positions_by_game ON positions (game_id);
+    CREATE INDEX positions_by_ply ON positions (ply);
+"""
+YEAR = re.compile(r"\b(\d{4})$")
+
+
+def fen_ply(fen: str) -> int | None:
+    '''Number of plies played before a FEN's position, from its move number and side to move.'''
+    fields = fen.split(" ")
+    if len(fields) != 6 or fields[1] not in ("w", "b") or not fields[5].isdigit():
+        return None
+    return 2 * (int(fields[5]) - 1) + (fields[1] == "b")
+
+
+def game_row(title_id: int, title: str, tags: Mapping[str, str]) -> tuple:
+    def known(tag: str) -> str | None:
+        value = tags.get(tag, "").strip()
+        return None if value in ("", "?") else value
+
+    year = (known("Date") or "")[:4]
+    if not year.isdigit():
+        match = YEAR.search(title) # e.g. "Steinitz - Lipke, Vienna 1898"
+        year = match.group(1) if match else None
+    return (title_id, known("White"), known("Black"), known("Event"), known("Site"),
+            year and int(year), known("ECO"))
+
+
+def write_sqlite_bank(questions: Iterable[Question], path: Path,
+                      headers: Iterable[Mapping[str, str]] = ()) -> int:
+    """
+    Writes `questions` into a new SQLite question bank at `path`.
+
+    Questions are grouped into games in order: each run of consecutive
+    questions with the same right answer is one game. `headers` are the
+    PGN headers of the source's games in order, if any; each game takes
+    the next unused entry whose title (see `format_title`) matches its
+    right answer, and gets its players, event, year and ECO code from it,
+    otherwise just the year at the end of its title. So games sharing a
+    title keep their own headers, unless they are adjacent in the source,
+    which a list of questions can't tell apart. The questions are assumed
+    to be valid (e.g. the output of `parse_data`). Returns the number of
+    questions written.
+
+    Raises:
+        ValueError: If `path` already exists.
+    """
+    if path.exists():
+        raise ValueError(f"{path} already exists")
+    from pgn_quizzer.data import format_title # data imports this module for its loader
+
+    tags_by_title: dict[str, deque] = {} # in source order
+    for tags in headers:
+        tags_by_title.setdefault(format_title(tags), deque()).append(tags)
+    title_ids: dict[str, int] = {}
+    nb_games = 0
+    db = sqlite3.connect(path)
+    try:
+        with db:
+            db.execute(f"PRAGMA application_id = {APPLICATION_ID}")
+            db.executescript(SCHEMA)
+            add_identity(db)
+
+            def title_id(title: str) -> int:
+                i = title_ids.get(title)
+                if i is None:
+                    i = title_ids[title] = len(title_ids) + 1
+                    db.execute("INSERT INTO titles VALUES (?, ?)", (i, title))
+                return i
+
+            def new_game(title: str) -> int:
+                nonlocal nb_games
+                nb_games += 1
+                same_title = tags_by_title.get(title)
+                tags = same_title.popleft() if same_title else {}
+                db.execute("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (nb_games, *game_row(title_id(title), title, tags)))
+                return nb_games
+
+            nb_questions, game_id, game_title = 0, 0, None
+            for nb_questions, q in enumerate(questions, start=1):
+                if q.right_answer != game_title:
+                    game_id, game_title = new_game(q.right_answer), q.right_answer
+                db.execute("INSERT INTO positions VALUES (?, ?, ?, ?, ?)",
+                           (nb_questions, game_id, q.text, fen_ply(q.asset), q.asset))
+                db.executemany("INSERT INTO wrong_answers VALUES (?, ?, ?)",
+                               [(nb_questions, slot, title_id(answer))
+                                for slot, answer in enumerate(q.wrong_answers)])
+            db.executescript(INDEXES) # cheaper to build once the rows are in
+    finally:
+        db.close()
+    return nb_questions
+
+
+def add_identity(db: sqlite3.Connection) -> None:
+    '''Gives the bank open in `db` a uuid, unless it has one.'''
+    db.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value BLOB)")
+    db.execute("INSERT OR IGNORE INTO metadata VALUES ('uuid', ?)", (uuid4().bytes,))
+
+
+class SqliteBank(Sequence[Question]):
+    """
+    Read-only question bank backed by an SQLite database (see
+    `write_sqlite_bank`).
+
+    Behaves like a list of `Question` objects, but a question is only read
+    from the database when it is indexed, e.g. when `QuizBrain` samples it.
+    """
+
+    def __init__(self, path: Path):
+        if not path.is_file():
+            raise FileNotFoundError(path)
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            application_id, = self._db.execute("PRAGMA application_id").fetchone()
+        except sqlite3.DatabaseError:
+            application_id = None
+        if application_id != APPLICATION_ID:
+            self._db.close()
+            raise ValueError(f"{path} is not an SQLite question bank")
+        self._nb_questions = self._db.execute("SELECT MAX(id) FROM positions").fetchone()[0] or 0
+
+    def __len__(self) -> int:
+        return self._nb_questions
+
+    def __getitem__(self, i: int) -> Question:
+        if not -len(self) <= i < len(self):
+            raise IndexError("question index out of range")
+        position_id = i % len(self) + 1
+
+        text, right_answer, asset = self._db.execute(
+            "SELECT positions.text, titles.title, positions.asset FROM positions "
+            "JOIN games ON games.id = positions.game_id "
+            "JOIN titles ON titles.id = games.title_id "
+            "WHERE positions.id = ?", (position_id,)).fetchone()
+        wrong_answers = self._db.execute(
+            "SELECT titles.title FROM wrong_answers JOIN titles ON titles.id = wrong_answers.title_id "
+            "WHERE wrong_answers.position_id = ? ORDER BY wrong_answers.slot", (position_id,))
+        return Question(text          = text,
+                        right_answer  = right_answer,
+                        wrong_answers = tuple(title for title, in wrong_answers),
+                        asset         = asset)
+
+    def right_answers(self) -> Iterator[str]:
+        return (title for title, in self._db.execute(
+            "SELECT titles.title FROM positions JOIN games ON games.id = positions.game_id "
+            "JOIN titles ON titles.id = games.title_id ORDER BY positions.id"))
+
+    def question_games(self) -> Iterator[int]:
+        '''The game id of every question, in order.'''
+        return (game_id for game_id, in self._db.execute(
+            "SELECT game_id FROM positions ORDER BY id"))
+
+    def game_headers(self) -> dict[int, dict[str, str]]:
+        '''The headers of every game by id, as far as the games table keeps
+        them; the players of a game stored without headers are read from
+        its title.'''
+        headers = {}
+        for game_id, title, white, black, event, site, year, eco in self._db.execute(
+                "SELECT games.id, titles.title, white, black, event, site, year, eco "
+                "FROM games JOIN titles ON titles.id = games.title_id"):
+            tags = {"White": white, "Black": black, "Event": event, "Site": site,
+                    "Date": year and str(year), "ECO": eco}
+            if white is None and black is None:
+                tags = title_tags(title) | {tag: value for tag, value in tags.items() if value}
+            headers[game_id] = {tag: value for tag, value in tags.items() if value is not None}
+        return headers
+
+    @property
+    def identity(self) -> bytes | None:
+        '''The bank's uuid, which appending games keeps; None for a bank written without one.'''
+        try:
+            row = self._db.execute("SELECT value FROM metadata WHERE key = 'uuid'").fetchone()
+        except sqlite3.OperationalError: # no metadata table
+            return None
+        return row and row[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def sqlite_loader(path: Path) -> SqliteBank:
+    return SqliteBank(path)
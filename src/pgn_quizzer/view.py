@@ -1,5 +1,3 @@
-from chess import Board
-
 from pgn_quizzer.presenter import QuizPresenter
 
 def run_quiz_gui(presenter: QuizPresenter) -> None:
@@ -60,9 +58,7 @@ def run_quiz_console(presenter: QuizPresenter,
         output_func("")
         
         # print assets
-        fen = presenter.question_asset()
-        position = Board(fen)
-        output_func(position.unicode(invert_color=True, orientation=position.turn), sep="\n\n")
+        output_func(presenter.question_diagram(), sep="\n\n")
         output_func("")
         
         # generate user answer choices
@@ -98,6 +94,7 @@ def run_quiz_console(presenter: QuizPresenter,
             output_func(f"Your current score is: {presenter.user_score()}/{presenter.nb_questions_answered()}.")
             output_func("")
 
+    presenter.close() # nothing left to prefetch
     output_func("")
     output_func("Quiz over!")
     output_func(f"Overall, you scored {presenter.user_score()}/{presenter.nb_questions_answered()}.")
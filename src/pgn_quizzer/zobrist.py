@@ -0,0 +1,81 @@
+from array import array
+
+# "Which game is this position from?" only has one right answer if the
+# position occurs in one game. Positions are identified by their 64-bit
+# (Polyglot) Zobrist key, which ignores the move clocks, so transpositions
+# from different move orders collide as they should.
+#
+# The index is an open-addressing hash table over two flat arrays (8-byte
+# keys, 4-byte values), giving O(1) lookups at ~17 bytes per position.
+
+EMPTY = 0 # key 0 marks a free slot; a real key of 0 is stored as 1
+AMBIGUOUS = -1
+MAX_LOAD = 0.7
+
+
+def position_key(fen: str) -> int | None:
+    '''Zobrist key of the position in `fen`, or None if it isn't a valid FEN.'''
+    from chess import Board
+    from chess.polyglot import zobrist_hash
+
+    try:
+        return zobrist_hash(Board(fen)) or 1
+    except ValueError:
+        return None
+
+
+class PositionIndex:
+    """
+    Maps Zobrist keys to the id of the single game (e.g. title id) that the
+    position occurs in, or to AMBIGUOUS once it has been seen in two.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = 1 << max(capacity - 1, 1).bit_length() # power of two
+        self._keys = array("Q", bytes(8 * capacity))
+        self._values = array("i", bytes(4 * capacity))
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, key: int) -> int:
+        keys = self._keys
+        mask = len(keys) - 1
+        i = (key ^ key >> 32) & mask
+        while keys[i] != EMPTY and keys[i] != key:
+            i = (i + 1) & mask # linear probing
+        return i
+
+    def _grow(self) -> None:
+        keys, values = self._keys, self._values
+        self._keys = array("Q", bytes(16 * len(keys)))
+        self._values = array("i", bytes(8 * len(values)))
+        for key, value in zip(keys, values):
+            if key != EMPTY:
+                i = self._slot(key)
+                self._keys[i] = key
+                self._values[i] = value
+
+    def add(self, key: int, game_id: int) -> None:
+        '''Records that the position `key` occurs in game `game_id`.'''
+        if (self._size + 1) > MAX_LOAD * len(self._keys):
+            self._grow()
+        i = self._slot(key)
+        if self._keys[i] == EMPTY:
+            self._keys[i] = key
+            self._values[i] = game_id
+            self._size += 1
+        elif self._values[i] != game_id:
+            self._values[i] = AMBIGUOUS
+
+    def get(self, key: int) -> int | None:
+        '''The game `key` occurs in, AMBIGUOUS, or None if never seen.'''
+        i = self._slot(key)
+        return self._values[i] if self._keys[i] != EMPTY else None
+
+    def is_ambiguous(self, key: int) -> bool:
+        return self.get(key) == AMBIGUOUS
+
+    def nbytes(self) -> int:
+        return self._keys.itemsize * len(self._keys) + self._values.itemsize * len(self._values)
@@ -11,6 +11,22 @@ from pgn_quizzer.presenter import QuizPresenter
 
 # print("CONFTEST") # useful for debugging
 
+SAMPLE_GAME_TEMPLATE = """[Event "Casual game NN"]
+[Site "Vienna"]
+[Date "18NN.??.??"]
+[White "WhiteNN, A."]
+[Black "BlackNN"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a natural developing move} Nc6 3. Bc4 (3. Bb5 a6 (3... Nf6)
+4. Ba4) 3... Bc5 4. O-O {[%asset desc1] White has castled} Nf6 5. d3 $1 d6
+6. Bg5 {[%asset desc2]} h6 1-0
+
+"""
+
+def sample_pgn(nb_games: int) -> str:
+    return "".join(SAMPLE_GAME_TEMPLATE.replace("NN", f"{i:02d}") for i in range(nb_games))
+
 def sample_presenter_empty_bank_zero_questions():
     # Create a no-question quiz
     quiz = QuizBrain([], length=0)
@@ -41,14 +57,14 @@ def sample_presenter_two_questions():
 
 def sample_presenter_sample_json_zero_questions():
     # Create a sample quiz but with no requests for questions
-    json_path = Path(".\\jsons\\chess_sample_data.json")
+    json_path = Path("jsons") / "chess_sample_data.json"
     question_bank = create_question_bank(json_path)
     quiz = QuizBrain(question_bank, length=0)
     return QuizPresenter(quiz)
 
 def sample_presenter_sample_json_five_questions():
     # Create a sample five-question quiz
-    json_path = Path(".\\jsons\\chess_sample_data.json")
+    json_path = Path("jsons") / "chess_sample_data.json"
     question_bank = create_question_bank(json_path)
     quiz = QuizBrain(question_bank, length=5)
     sample_console_presenter = QuizPresenter(quiz)
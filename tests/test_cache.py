@@ -0,0 +1,79 @@
+from io import StringIO
+import os
+from pathlib import Path
+
+import pytest
+
+from pgn_quizzer import cache as cache_module
+from pgn_quizzer.cache import BankCache
+from pgn_quizzer.data import create_question_bank
+from pgn_quizzer.pqb import CompiledBank
+
+from tests.conftest import sample_pgn
+
+SAMPLE_JSON = Path("jsons") / "chess_sample_data.json"
+
+def test_second_load_is_a_cache_hit(tmp_path):
+    cache = BankCache(tmp_path / "cache")
+    first = create_question_bank(SAMPLE_JSON, cache=cache)
+    second = create_question_bank(SAMPLE_JSON, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(second, CompiledBank)
+    assert list(second) == first
+
+def test_changed_source_is_a_cache_miss(tmp_path):
+    cache = BankCache(tmp_path / "cache")
+    source = tmp_path / "bank.json"
+    source.write_text(SAMPLE_JSON.read_text())
+    create_question_bank(source, cache=cache)
+
+    source.write_text("[]")
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert list(create_question_bank(source, cache=cache)) == []
+    assert cache.hits == 0
+
+def test_loader_options_are_part_of_the_key(tmp_path):
+    cache = BankCache(tmp_path / "cache")
+    source = tmp_path / "games.pgn"
+    source.write_text(sample_pgn(6))
+    assert cache.entry_path(source, {"nb_options": 3}) != cache.entry_path(source, {"nb_options": 2})
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = BankCache(tmp_path / "cache")
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"bank{i}.json"
+        source.write_text(SAMPLE_JSON.read_text().replace("Steinitz", f"Steinitz{i}"))
+        create_question_bank(source, cache=cache)
+        sources.append(source)
+    entry_size = cache.entry_path(sources[0], {}).stat().st_size
+
+    cache.get(sources[0], {}) # bank0 is now more recent than bank1
+    cache.max_bytes = 2 * entry_size + entry_size // 2
+    cache._evict()
+
+    assert cache.evictions == 1
+    assert cache.entry_path(sources[0], {}).exists()
+    assert not cache.entry_path(sources[1], {}).exists()
+    assert cache.entry_path(sources[2], {}).exists()
+
+def test_unusable_cache_directory_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "stderr", StringIO())
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_text("")
+    cache = BankCache(not_a_directory / "cache")
+
+    first = create_question_bank(SAMPLE_JSON, cache=cache)
+    second = create_question_bank(SAMPLE_JSON, cache=cache)
+
+    assert list(second) == list(first) != []
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert cache.failures > 0
+    assert cache_module.stderr.getvalue().count("--warning: not using the cache") == 1
+
+def test_missing_source_is_not_a_cache_failure(tmp_path):
+    cache = BankCache(tmp_path / "cache")
+    with pytest.raises(SystemExit, match="missing.json"):
+        create_question_bank(tmp_path / "missing.json", cache=cache)
+    assert cache.failures == 0
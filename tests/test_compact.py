@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from pgn_quizzer.compact import CompactBank
+from pgn_quizzer.data import create_question_bank
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.pqb import pack_fen
+
+SAMPLE_JSON = Path("jsons") / "chess_sample_data.json"
+
+def test_question_stores_wrong_answers_as_tuple():
+    q = Question("Q", "A", ["B", "C"], "")
+    assert q.wrong_answers == ("B", "C")
+    assert not hasattr(q, "__dict__")
+
+def test_compact_bank_round_trips_questions():
+    questions = create_question_bank(SAMPLE_JSON)
+    questions.append(Question("Q", "A", ["B"], "not a fen"))
+    bank = CompactBank(questions)
+    assert len(bank) == len(questions)
+    assert list(bank) == questions
+    assert bank[-1] == questions[-1]
+
+def test_compact_bank_interns_repeated_strings():
+    questions = create_question_bank(SAMPLE_JSON)
+    bank = CompactBank(questions)
+    distinct = {q.text for q in questions} | {q.right_answer for q in questions}
+    distinct |= {a for q in questions for a in q.wrong_answers}
+    distinct |= {q.asset for q in questions if pack_fen(q.asset) is None} # e.g. Shredder-FEN
+    assert len(bank.strings) == len(distinct)
+
+def test_quiz_runs_on_compact_bank():
+    bank = create_question_bank(SAMPLE_JSON, compact=True)
+    assert isinstance(bank, CompactBank)
+    quiz = QuizBrain(bank, length=5)
+    question = quiz.next_question()
+    assert sorted(quiz.generate_multiple_choice_options(question)) == \
+        sorted([question.right_answer, *question.wrong_answers])
@@ -1,6 +1,15 @@
+import bz2
+import gzip
+import lzma
 import pytest
+import tracemalloc
+from io import StringIO
+from json import dumps
+
 import pgn_quizzer.data as loader
 
+from tests.conftest import sample_pgn
+
 from pgn_quizzer.model import Question
 
 @pytest.fixture
@@ -207,3 +216,285 @@ def test_skip_invalid_data_when_asset_not_a_string(sample_question):
 #                     }]
 #     result = loader.parse_data(dummy_data)
 #     assert result == [sample_question]
+
+
+#-------------------------
+# PGN construction
+#-------------------------
+
+def test_separate_games_within_pgn_finds_every_game():
+    constructor = loader.ChessGameConstructor(sample_pgn(5))
+    subpgns = constructor._separate_games_within_pgn()
+    assert len(subpgns) == 5
+    assert all(subpgn.startswith("[Event") for subpgn in subpgns)
+
+def test_construct_extracts_title_and_asset_fens():
+    constructor = loader.ChessGameConstructor(sample_pgn(1))
+    constructor.construct()
+    game, = constructor.chessgames
+    assert game.title == "White00 - Black00, Vienna 1800"
+    assert game.fen_assets == {
+        "desc1": ["r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQ1RK1 b kq - 5 4"],
+        "desc2": ["r1bqk2r/ppp2ppp/2np1n2/2b1p1B1/2B1P3/3P1N2/PPP2PPP/RN1Q1RK1 b kq - 1 6"],
+        }
+
+def test_semicolons_inside_brace_comments_do_not_hide_moves():
+    pgn = ('[White "A"]\n[Black "B"]\n\n'
+           '1. e4 {Good move; threatens nothing} e5 ; a rest-of-line comment {\n'
+           '2. Nf3 {[%asset desc1]} Nc6 1-0\n')
+    constructor = loader.ChessGameConstructor(pgn)
+    constructor.construct()
+    game, = constructor.chessgames
+    assert game.fen_assets == {
+        "desc1": ["rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"]}
+
+def test_iter_construct_matches_construct_on_open_file(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(6))
+
+    eager = loader.ChessGameConstructor(pgn_path.read_text())
+    eager.construct()
+    with open(pgn_path) as pgn_file:
+        lazy = loader.ChessGameConstructor(pgn_file)
+        streamed = list(lazy.iter_construct())
+
+    assert streamed == eager.chessgames
+    assert lazy.chessgames == [] and lazy.titles == []
+
+def test_generate_question_data_makes_one_dict_per_fen():
+    constructor = loader.ChessGameConstructor(sample_pgn(6))
+    constructor.construct()
+    game = constructor.chessgames[0]
+    question_data = loader.generate_question_data(game, constructor, nb_options=3)
+    assert [q["asset"] for q in question_data] == game.fen_assets["desc1"] + game.fen_assets["desc2"]
+    assert all(game.title not in q["wrong_answers"] for q in question_data)
+
+def test_unknown_asset_descriptors_ask_the_default_question(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(3).replace("[%asset desc2]", "[%asset opening]"))
+    bank = loader.create_question_bank(pgn_path)
+    assert len(bank) == 6
+    assert {question.text for question in bank} == {loader.DEFAULT_QUESTION_TEXT}
+    assert loader.DEFAULT_QUESTION_TEXT == "Which game is the following position from?"
+
+def test_iter_pgn_games_streams_games_with_their_questions(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(8))
+    streamed = list(loader.iter_pgn_games(pgn_path, nb_options=3, title_pool_size=5))
+    assert len(streamed) == 8
+    for game, question_data in streamed:
+        assert len(question_data) == 2
+        assert all(q["right_answer"] == game.title for q in question_data)
+        assert all(len(q["wrong_answers"]) == 3 for q in question_data)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_games_with_illegal_moves_are_skipped_and_reported(tmp_path, monkeypatch, workers):
+    pgn_path = tmp_path / "games.pgn"
+    games = sample_pgn(4).split("\n\n[")
+    games[0] = games[0].replace("5. d3", "5. Qh8") # illegal
+    games[1] = games[1].replace("6. Bg5", "6. Good") # not a move
+    pgn_path.write_text("\n\n[".join(games))
+    monkeypatch.setattr(loader, "stderr", StringIO())
+    bank = loader.create_question_bank(pgn_path, workers=workers)
+    assert {q.right_answer for q in bank} == {f"White0{i} - Black0{i}, Vienna 180{i}"
+                                              for i in (2, 3)}
+    assert "--warning: skipped 2 games" in loader.stderr.getvalue()
+
+def test_parallel_construct_matches_serial_construct():
+    serial = loader.ChessGameConstructor(sample_pgn(10))
+    serial.construct()
+    parallel = loader.ChessGameConstructor(sample_pgn(10))
+    parallel.construct(workers=2, chunk_size=3)
+    assert parallel.chessgames == serial.chessgames
+    assert parallel.titles == serial.titles
+
+def test_parallel_construct_reads_ahead_a_bounded_number_of_chunks():
+    lines_read = []
+    def lines():
+        for line in sample_pgn(40).splitlines(keepends=True):
+            lines_read.append(line)
+            yield line
+
+    games = loader.ChessGameConstructor(lines())._construct_in_parallel(workers=2, chunk_size=1)
+    next(games)
+    games.close()
+    # 2 x workers chunks in flight, one more submitted, and the next game's first line
+    assert sum(line.startswith("[Event") for line in lines_read) <= 2 * 2 + 2
+
+
+#-------------------------
+# Streaming JSON
+#-------------------------
+
+def write_json_bank(path, nb_records: int, invalid_every: int = 0) -> list[dict]:
+    records = []
+    for i in range(nb_records):
+        record = {"text": "Which game is the following position from?",
+                  "right_answer": f"Game {i}",
+                  "wrong_answers": [f"Game {i + 1}", f"Game {i + 2}"],
+                  "asset": "8/8/8/8/8/8/8/8 w - - 0 1"}
+        if invalid_every and i % invalid_every == 0:
+            record["right_answer"] = ""
+        records.append(record)
+    if path.suffix == ".json":
+        path.write_text(dumps(records, indent=2))
+    else:
+        path.write_text("".join(dumps(record) + "\n" for record in records))
+    return records
+
+@pytest.mark.parametrize("suffix", [".json", ".ndjson"])
+def test_iter_json_records_matches_json_load(tmp_path, suffix):
+    path = tmp_path / f"bank{suffix}"
+    records = write_json_bank(path, 200)
+    assert list(loader.iter_json_records(path, chunk_size=97)) == records
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1 2]", "[{\"a\": 1},]"])
+def test_iter_json_records_rejects_malformed_arrays(tmp_path, text):
+    path = tmp_path / "bank.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(loader.iter_json_records(path, chunk_size=4))
+
+def test_reservoir_sample_returns_k_distinct_items():
+    picked = loader.reservoir_sample(range(1000), 5)
+    assert len(set(picked)) == 5 and set(picked) <= set(range(1000))
+    assert loader.reservoir_sample(range(3), 5) == [0, 1, 2]
+
+def test_stream_quiz_questions_skips_invalid_records(tmp_path):
+    path = tmp_path / "bank.jsonl"
+    write_json_bank(path, 50, invalid_every=2)
+    questions = loader.stream_quiz_questions(path, 5)
+    assert len(questions) == 5
+    assert all(int(q.right_answer.split()[-1]) % 2 == 1 for q in questions)
+
+def test_stream_quiz_questions_uses_bounded_memory(tmp_path):
+    path = tmp_path / "bank.json"
+    write_json_bank(path, 20000)
+    tracemalloc.start()
+    loader.stream_quiz_questions(path, 5)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < path.stat().st_size // 10
+
+def write_pgn_tree(root):
+    # 3 files of 4 games each (numbered 00-11), one of them two levels down
+    games = [sample_pgn(12)[len(sample_pgn(i)):len(sample_pgn(i + 4))] for i in (0, 4, 8)]
+    (root / "b" / "deep").mkdir(parents=True)
+    paths = [root / "a.pgn", root / "b" / "c.pgn", root / "b" / "deep" / "d.pgn"]
+    for path, text in zip(paths, games):
+        path.write_text(text)
+    (root / "notes.txt").write_text("not a PGN")
+    return paths
+
+def test_source_paths_expand_directories_and_globs(tmp_path):
+    paths = write_pgn_tree(tmp_path)
+    assert loader.source_paths(tmp_path) == paths
+    assert loader.source_paths(tmp_path / "b" / "**" / "*.pgn") == paths[1:]
+    assert loader.source_paths(tmp_path / "?.pgn") == paths[:1]
+    assert loader.source_paths(paths[0]) == paths[:1]
+    assert not loader.is_multi_file_source(paths[0])
+
+def test_a_file_named_like_a_glob_is_just_a_file(tmp_path):
+    path = tmp_path / "Linares [2024].pgn"
+    path.write_text(sample_pgn(2))
+    assert loader.source_paths(path) == [path]
+    assert not loader.is_multi_file_source(path)
+    assert len(loader.create_question_bank(path)) == 4
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pgn_files_share_one_title_table(tmp_path, workers):
+    paths = write_pgn_tree(tmp_path)
+    progress = []
+    data = loader.pgn_files_loader(paths, nb_options=3, workers=workers, progress=progress.append)
+    assert sorted(file.path for file in progress) == paths
+    assert sorted(file.number for file in progress) == [1, 2, 3]
+    assert all(file.nb_games == 4 and file.nb_bytes == file.path.stat().st_size
+               for file in progress)
+
+    single = tmp_path / "all.pgn"
+    single.write_text("".join(path.read_text() for path in paths))
+    expected = loader.pgn_loader(single)
+    assert [q["right_answer"] for q in data] == [q["right_answer"] for q in expected]
+    assert [q["asset"] for q in data] == [q["asset"] for q in expected]
+    # wrong answers are drawn from the games of every file
+    titles_by_file = [{q["right_answer"] for q in data[8 * i:8 * i + 8]} for i in range(3)]
+    assert any(set(q["wrong_answers"]) - titles_by_file[0] for q in data[:8])
+
+def test_create_question_bank_from_a_directory(tmp_path, monkeypatch):
+    write_pgn_tree(tmp_path)
+    monkeypatch.setattr(loader, "stderr", StringIO())
+    bank = loader.create_question_bank(tmp_path)
+    assert len(bank) == 24
+    assert loader.stderr.getvalue().count("--progress: [") == 3
+    with pytest.raises(SystemExit):
+        loader.create_question_bank(tmp_path / "*.json")
+
+def test_globs_only_match_pgn_files(tmp_path, monkeypatch):
+    paths = write_pgn_tree(tmp_path)
+    (tmp_path / "a.pgn.idx").write_bytes(b"PGNIDX1\0")
+    (tmp_path / "bank.json").write_text("[]")
+    assert loader.source_paths(tmp_path / "*") == paths[:1]
+    monkeypatch.setattr(loader, "stderr", StringIO())
+    assert len(loader.create_question_bank(tmp_path / "a.pgn*")) == 8
+    with pytest.raises(SystemExit, match="no PGN files found"):
+        loader.create_question_bank(tmp_path / "*.json")
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("name, content", [
+    ("broken.pgn.xz", b"\xfd7zXZ\x00 not really xz"), ("latin1.pgn", "[Event \"Zürich\"]".encode("latin-1")),
+], ids=["corrupt-xz", "not-utf8"])
+def test_unreadable_member_file_is_named(tmp_path, monkeypatch, workers, name, content):
+    write_pgn_tree(tmp_path)
+    (tmp_path / "b" / name).write_bytes(content)
+    monkeypatch.setattr(loader, "stderr", StringIO())
+    with pytest.raises(SystemExit, match=f"--error: .*{name}"):
+        loader.create_question_bank(tmp_path, workers=workers)
+
+COMPRESSORS = {".gz": gzip.compress, ".bz2": bz2.compress, ".xz": lzma.compress}
+
+@pytest.mark.parametrize("name, file_type", [
+    ("games.pgn", ".pgn"), ("games.pgn.gz", ".pgn"), ("games.v2.pgn.xz", ".pgn"),
+    ("bank.jsonl.bz2", ".jsonl"), ("bank.json", ".json"), ("archive.gz", ""),
+])
+def test_source_type_looks_past_compression(tmp_path, name, file_type):
+    assert loader.source_type(tmp_path / name) == file_type
+
+@pytest.mark.parametrize("compression", COMPRESSORS)
+def test_compressed_pgn_loads_like_plain_pgn(tmp_path, compression):
+    plain = tmp_path / "games.pgn"
+    plain.write_text(sample_pgn(6))
+    packed = tmp_path / f"games.pgn{compression}"
+    packed.write_bytes(COMPRESSORS[compression](plain.read_bytes()))
+
+    expected = loader.create_question_bank(plain)
+    bank = loader.create_question_bank(packed)
+    assert [(q.right_answer, q.asset) for q in bank] == [(q.right_answer, q.asset) for q in expected]
+    assert list(loader.iter_pgn_headers(packed)) == list(loader.iter_pgn_headers(plain))
+    assert loader.source_paths(tmp_path) == sorted([plain, packed])
+
+@pytest.mark.parametrize("name", ["bank.json.gz", "bank.ndjson.xz"])
+def test_compressed_json_loads_like_plain_json(tmp_path, name):
+    records = [{"text": f"Q{i}", "right_answer": f"A{i}", "wrong_answers": ["B", "C"],
+                "asset": ""} for i in range(50)]
+    text = ("\n".join(map(dumps, records)) if ".ndjson" in name else dumps(records))
+    path = tmp_path / name
+    path.write_bytes(COMPRESSORS[path.suffix](text.encode()))
+    assert loader.json_loader(path) == records
+    assert list(loader.iter_json_records(path, chunk_size=64)) == records
+    assert len(loader.create_question_bank(path)) == 50
+
+@pytest.mark.parametrize("compression", COMPRESSORS)
+def test_corrupt_compressed_source_is_an_error(tmp_path, compression):
+    packed = bytearray(COMPRESSORS[compression](sample_pgn(3).encode()))
+    middle = len(packed) // 2
+    packed[middle:middle + 8] = bytes(b ^ 0xff for b in packed[middle:middle + 8])
+    path = tmp_path / f"games.pgn{compression}"
+    path.write_bytes(packed)
+    with pytest.raises(SystemExit, match="--error: "):
+        loader.create_question_bank(path)
+
+def test_truncated_compressed_source_is_an_error(tmp_path):
+    path = tmp_path / "games.pgn.gz"
+    path.write_bytes(gzip.compress(sample_pgn(3).encode())[:-20])
+    with pytest.raises(SystemExit):
+        loader.create_question_bank(path)
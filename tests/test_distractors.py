@@ -0,0 +1,49 @@
+import pytest
+from random import Random
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.distractors import TitleTable
+
+from tests.conftest import sample_pgn
+
+def test_title_table_deduplicates_titles():
+    table = TitleTable(["A", "B", "A", "C", "B"])
+    assert table.titles == ["A", "B", "C"]
+    assert table.ids == {"A": 0, "B": 1, "C": 2}
+    assert table.add("B") == 1 and len(table) == 3
+
+@pytest.mark.parametrize("exclude_id", [0, 3, 9, None])
+def test_sample_excluding_returns_distinct_ids_without_the_excluded_one(exclude_id):
+    table = TitleTable([f"Game {i}" for i in range(10)], rng=Random(0))
+    k = table.max_distractors(exclude_id)
+    for _ in range(50):
+        picks = table.sample_excluding(k, exclude_id)
+        assert len(set(picks)) == k
+        assert exclude_id not in picks
+        assert all(0 <= i < 10 for i in picks)
+
+def test_sample_excluding_fails_fast_when_too_few_titles():
+    table = TitleTable(["A", "B", "A"])
+    with pytest.raises(ValueError):
+        table.sample_excluding(2, table.ids["A"])
+
+def test_sample_batch_serves_every_question():
+    table = TitleTable(["A", "B", "C", "D"])
+    options = table.sample_batch([0, 1, 2, 3, None], 3)
+    assert [set(o) for o in options[:4]] == [{"B", "C", "D"}, {"A", "C", "D"},
+                                             {"A", "B", "D"}, {"A", "B", "C"}]
+    assert len(set(options[4])) == 3
+
+def test_sample_with_avoidance_terminates_with_duplicate_titles():
+    options = loader.sample_with_avoidance(["A", "A", "B", "C", "C"], 2, "A")
+    assert sorted(options) == ["B", "C"]
+
+def test_question_data_uses_every_title_when_bank_is_small():
+    constructor = loader.ChessGameConstructor(sample_pgn(2) + sample_pgn(2))
+    constructor.construct()
+    question_data = loader.generate_bank_question_data(
+        constructor.chessgames, constructor.title_table, nb_options=3)
+    assert len(question_data) == 8
+    for q in question_data:
+        assert len(q["wrong_answers"]) == 1
+        assert q["right_answer"] not in q["wrong_answers"]
@@ -0,0 +1,103 @@
+import pytest
+
+from pgn_quizzer.cache import BankCache
+from pgn_quizzer.compact import CompactBank
+from pgn_quizzer.data import create_question_bank, iter_pgn_headers
+from pgn_quizzer.header_index import FilteredBank, HeaderIndex, iter_right_answers, title_tags
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.pqb import CompiledBank, write_pqb
+from pgn_quizzer.sqlite_bank import SqliteBank, write_sqlite_bank
+
+from tests.conftest import sample_pgn
+
+def sample_bank(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    # games 00-09, played in 1800-1809, half of them with an ECO code
+    pgn_path.write_text(sample_pgn(10).replace('[Result "1-0"]', '[ECO "C50"]', 5))
+    return pgn_path, create_question_bank(pgn_path)
+
+def titles(bank, indices) -> set[str]:
+    return {bank[i].right_answer for i in indices}
+
+def test_filters_are_intersected(tmp_path):
+    pgn_path, bank = sample_bank(tmp_path)
+    index = HeaderIndex.build(bank, iter_pgn_headers(pgn_path))
+    assert len(index.select()) == len(bank) == 20
+
+    assert titles(bank, index.select(players=["white03"])) == {"White03 - Black03, Vienna 1803"}
+    assert len(index.select(years=(1802, 1806))) == 10
+    assert len(index.select(eco=["C*"])) == 10
+    assert len(index.select(eco=["B*"])) == 0
+    selected = index.select(players=["A."], years=(1803, 1809), eco=["C5?"])
+    assert list(selected) == sorted(selected)
+    assert titles(bank, selected) == {f"White0{i} - Black0{i}, Vienna 180{i}" for i in (3, 4)}
+    assert not index.select(players=["White01", "Black02"])
+
+def test_titles_stand_in_for_missing_headers():
+    assert title_tags("Steinitz - Lipke, Vienna 1898") == {
+        "White": "Steinitz", "Black": "Lipke", "Date": "1898"}
+    bank = [Question("Q", "Steinitz - Lipke, Vienna 1898", ["B"], ""),
+            Question("Q", "Janowski - Capablanca, New York 1916", ["B"], ""),
+            Question("Q", "Capablanca - Lasker, Havana 1921", ["B"], "")]
+    index = HeaderIndex.build(bank)
+    assert list(index.select(players=["capablanca"], years=(1900, 1930))) == [1, 2]
+    assert list(index.select(players=["Capablanca"], years=(1921, 1921))) == [2]
+
+def test_quiz_draws_from_the_filtered_questions(tmp_path):
+    pgn_path, bank = sample_bank(tmp_path)
+    indices = HeaderIndex.build(bank, iter_pgn_headers(pgn_path)).select(years=(1800, 1801))
+    filtered = FilteredBank(bank, indices)
+    quiz = QuizBrain(filtered, length=10)
+    assert len(quiz.questions) == 4
+    assert titles(bank, indices) == {q.right_answer for q in quiz.questions}
+
+def test_banks_list_their_right_answers(tmp_path):
+    _, bank = sample_bank(tmp_path)
+    expected = [q.right_answer for q in bank]
+    write_pqb(bank, tmp_path / "bank.pqb")
+    write_sqlite_bank(bank, tmp_path / "bank.sqlite")
+    for other in (CompactBank(bank), CompiledBank(tmp_path / "bank.pqb"),
+                  SqliteBank(tmp_path / "bank.sqlite")):
+        assert list(iter_right_answers(other)) == expected
+
+def sqlite_index(bank: SqliteBank) -> HeaderIndex:
+    return HeaderIndex.build_by_game(bank.question_games(), bank.game_headers())
+
+def test_sqlite_bank_keeps_the_headers_to_filter_on(tmp_path):
+    pgn_path, bank = sample_bank(tmp_path)
+    write_sqlite_bank(bank, tmp_path / "bank.sqlite", iter_pgn_headers(pgn_path))
+    index = sqlite_index(SqliteBank(tmp_path / "bank.sqlite"))
+    assert list(index.select(eco=["C50"])) == list(range(10))
+    assert titles(bank, index.select(players=["white07"])) == {"White07 - Black07, Vienna 1807"}
+
+def test_games_sharing_a_title_keep_their_own_headers(tmp_path):
+    # the same pairing twice on one day, with another game in between
+    rematch = sample_pgn(1).replace('[Result "1-0"]', '[ECO "C50"]')
+    pgn = sample_pgn(1) + sample_pgn(2)[len(sample_pgn(1)):] + rematch
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(pgn)
+    bank = create_question_bank(pgn_path)
+    write_sqlite_bank(bank, tmp_path / "bank.sqlite", iter_pgn_headers(pgn_path))
+
+    sqlite_bank = SqliteBank(tmp_path / "bank.sqlite")
+    assert len(sqlite_bank.game_headers()) == 3
+    assert list(sqlite_index(sqlite_bank).select(eco=["C50"])) == [4, 5]
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_pgn_banks_are_indexed_by_game_as_they_load(tmp_path, cached):
+    # the same pairing twice in a row, with different openings
+    game = sample_pgn(1)
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(game.replace('[Result "1-0"]', '[ECO "C62"]')
+                        + game.replace('[Result "1-0"]', '[ECO "D31"]')
+                        + sample_pgn(2)[len(game):])
+    cache = BankCache(tmp_path / "cache")
+    bank = create_question_bank(pgn_path, cache=cache, compact=True)
+    if cached:
+        bank = create_question_bank(pgn_path, cache=cache, compact=True)
+        assert isinstance(bank, CompiledBank) and cache.hits == 1
+
+    index = bank.header_index
+    assert list(index.select(eco=["C*"])) == [0, 1]
+    assert list(index.select(eco=["D31"])) == [2, 3]
+    assert list(index.select(players=["white00"], years=(1800, 1800))) == [0, 1, 2, 3]
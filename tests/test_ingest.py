@@ -0,0 +1,188 @@
+from argparse import Namespace
+from random import Random
+import sqlite3
+
+import pytest
+
+import pgn_quizzer.ingest as ingest
+from pgn_quizzer.data import create_question_bank
+from pgn_quizzer.ingest import append_pgn, record_ingested, watch_pgn
+from pgn_quizzer.main import append_to_bank
+from pgn_quizzer.scheduler import ReviewScheduler
+from pgn_quizzer.sqlite_bank import SqliteBank, write_sqlite_bank
+
+from tests.conftest import sample_pgn
+
+def later_games(first: int, last: int) -> str:
+    # games first..last-1, numbered as in sample_pgn
+    return sample_pgn(last)[len(sample_pgn(first)):]
+
+def check_questions(bank: SqliteBank) -> None:
+    for question in bank:
+        answers = [question.right_answer, *question.wrong_answers]
+        assert len(set(answers)) == len(answers) == 4
+
+def test_append_only_takes_new_games(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(10))
+    first = append_pgn(bank_path, pgn_path, rng=Random(0))
+    assert (first.nb_new_games, first.nb_questions, first.nb_new_titles) == (10, 20, 10)
+    old_questions = list(SqliteBank(bank_path))
+
+    again = append_pgn(bank_path, pgn_path)
+    assert (again.nb_games, again.nb_new_games, again.from_offset) == (0, 0, len(sample_pgn(10)))
+
+    with open(pgn_path, mode="a") as pgn_file:
+        pgn_file.write(later_games(10, 40))
+    grown = append_pgn(bank_path, pgn_path, rng=Random(0))
+    assert (grown.nb_games, grown.nb_new_games, grown.nb_questions) == (30, 30, 60)
+    assert grown.from_offset == len(sample_pgn(10))
+
+    bank = SqliteBank(bank_path)
+    assert len(bank) == 80
+    assert [q.right_answer for q in bank] == [q.right_answer for q in create_question_bank(pgn_path)]
+    assert [q.asset for q in list(bank)[:20]] == [q.asset for q in old_questions]
+    check_questions(bank)
+
+def test_new_titles_become_distractors_of_old_questions(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(10))
+    append_pgn(bank_path, pgn_path, rng=Random(1))
+    pgn_path.write_text(sample_pgn(40))
+    report = append_pgn(bank_path, pgn_path, rng=Random(1))
+    assert report.nb_redistributed > 0
+
+    new_titles = {q.right_answer for q in list(SqliteBank(bank_path))[20:]}
+    old_wrong_answers = [a for q in list(SqliteBank(bank_path))[:20] for a in q.wrong_answers]
+    assert sum(a in new_titles for a in old_wrong_answers) == report.nb_redistributed
+    check_questions(SqliteBank(bank_path))
+
+def test_questions_short_of_titles_are_topped_up(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(2))
+    append_pgn(bank_path, pgn_path)
+    assert {len(q.wrong_answers) for q in SqliteBank(bank_path)} == {1}
+
+    pgn_path.write_text(sample_pgn(10))
+    report = append_pgn(bank_path, pgn_path, rng=Random(3))
+    assert report.nb_backfilled == 4 * 2
+    check_questions(SqliteBank(bank_path))
+
+def test_rewritten_file_is_matched_by_content(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(later_games(5, 10))
+    append_pgn(bank_path, pgn_path)
+    pgn_path.write_text(sample_pgn(10)) # games 0-4 go in front
+    report = append_pgn(bank_path, pgn_path)
+    assert (report.from_offset, report.nb_games, report.nb_new_games) == (0, 10, 5)
+    assert len(SqliteBank(bank_path)) == 20
+
+def test_compiled_bank_can_be_appended_to(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(10))
+    write_sqlite_bank(create_question_bank(pgn_path), bank_path)
+    assert record_ingested(bank_path, pgn_path) == 10
+    with open(pgn_path, mode="a") as pgn_file:
+        pgn_file.write(later_games(10, 12))
+    assert append_pgn(bank_path, pgn_path).nb_new_games == 2
+    assert len(SqliteBank(bank_path)) == 24
+
+def test_appended_games_sharing_a_title_get_their_own_rows(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(3))
+    append_pgn(bank_path, pgn_path)
+    with open(pgn_path, mode="a") as pgn_file: # game 0 again, another ECO
+        pgn_file.write(sample_pgn(1).replace('[Result "1-0"]', '[ECO "C50"]')
+                                    .replace("6. Bg5", "6. Be3"))
+    assert append_pgn(bank_path, pgn_path).nb_new_games == 1
+
+    bank = SqliteBank(bank_path)
+    headers = bank.game_headers()
+    assert len(headers) == 4 and list(bank.question_games())[-2:] == [4, 4]
+    assert headers[4]["ECO"] == "C50" and "ECO" not in headers[1]
+
+def test_unfinished_last_game_is_held_back(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    game = later_games(2, 3)
+    pgn_path.write_text(sample_pgn(2) + game[:game.index("6. Bg5")])
+    report = append_pgn(bank_path, pgn_path)
+    assert (report.nb_games, report.nb_new_games, report.nb_held_back) == (3, 2, 1)
+    assert len(SqliteBank(bank_path)) == 4
+
+    pgn_path.write_text(sample_pgn(3))
+    report = append_pgn(bank_path, pgn_path)
+    assert (report.from_offset, report.nb_new_games, report.nb_held_back) == (len(sample_pgn(2)), 1, 0)
+    assert len(SqliteBank(bank_path)) == 6
+
+def test_grown_game_is_taken_again_in_place(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    game = later_games(4, 5)
+    pgn_path.write_text(sample_pgn(4) + game[:game.index("6. Bg5")])
+    write_sqlite_bank(create_question_bank(pgn_path), bank_path) # compiled mid-game
+    record_ingested(bank_path, pgn_path)
+    assert len(SqliteBank(bank_path)) == 9
+
+    pgn_path.write_text(sample_pgn(6))
+    report = append_pgn(bank_path, pgn_path, rng=Random(2))
+    assert (report.from_offset, report.nb_grown_games, report.nb_new_games) == (len(sample_pgn(4)), 1, 1)
+    assert report.nb_questions == 3
+
+    bank = SqliteBank(bank_path)
+    assert [q.right_answer for q in bank] == [q.right_answer for q in create_question_bank(pgn_path)]
+    assert list(bank.question_games())[-4:] == [5, 5, 6, 6]
+    check_questions(bank)
+
+def test_append_keeps_the_review_history(tmp_path):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(10))
+    write_sqlite_bank(create_question_bank(pgn_path), bank_path)
+    record_ingested(bank_path, pgn_path)
+    scheduler = ReviewScheduler(SqliteBank(bank_path), tmp_path / "history.sqlite")
+    for question in (0, 5, 19):
+        scheduler.record(question, correct=True, now=0)
+
+    pgn_path.write_text(sample_pgn(12))
+    append_pgn(bank_path, pgn_path)
+    scheduler = ReviewScheduler(SqliteBank(bank_path), tmp_path / "history.sqlite")
+    assert sorted(scheduler.cards) == [0, 5, 19]
+
+def test_append_leaves_other_files_alone(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(2))
+    other = tmp_path / "other.sqlite"
+    db = sqlite3.connect(other)
+    db.execute("CREATE TABLE notes (text TEXT)")
+    db.close()
+    with pytest.raises(ValueError, match="not an SQLite question bank"):
+        append_pgn(other, pgn_path)
+    db = sqlite3.connect(other)
+    assert [name for name, in db.execute("SELECT name FROM sqlite_master")] == ["notes"]
+    db.close()
+
+    garbage = tmp_path / "garbage.sqlite"
+    garbage.write_bytes(b"not a database at all" * 100)
+    with pytest.raises(ValueError, match="not an SQLite question bank"):
+        append_pgn(garbage, pgn_path)
+    assert garbage.read_bytes() == b"not a database at all" * 100
+    args = Namespace(watch=False, workers=1, positions="assets")
+    with pytest.raises(SystemExit, match="--error: unable to append"):
+        append_to_bank(garbage, pgn_path, args)
+
+def test_append_rejects_too_many_options(tmp_path):
+    with pytest.raises(ValueError):
+        append_pgn(tmp_path / "bank.sqlite", tmp_path / "games.pgn", nb_options=7)
+
+def test_watch_appends_when_the_file_changes(tmp_path, monkeypatch):
+    pgn_path, bank_path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(sample_pgn(2))
+    ticks = iter([lambda: None,
+                  lambda: pgn_path.write_text(sample_pgn(5)),
+                  lambda: None])
+    def sleep(_):
+        next(ticks, lambda: (_ for _ in ()).throw(KeyboardInterrupt))()
+    monkeypatch.setattr(ingest, "sleep", sleep)
+
+    reports = []
+    with pytest.raises(KeyboardInterrupt):
+        watch_pgn(bank_path, pgn_path, reports.append, interval=0)
+    assert [report.nb_new_games for report in reports] == [2, 3]
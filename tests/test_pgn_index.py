@@ -0,0 +1,104 @@
+import os
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.pgn_index import build_index, load_index, map_index, open_index, sidecar_path
+
+from tests.conftest import sample_pgn
+
+def test_index_reads_back_every_game(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(5))
+    subpgns = loader.ChessGameConstructor(sample_pgn(5))._separate_games_within_pgn()
+
+    with build_index(pgn_path) as index:
+        assert len(index) == 5
+        assert [index.read(i) for i in range(5)] == subpgns
+
+def test_commands_opening_a_comment_line_do_not_start_a_game(tmp_path):
+    # a wrapped comment whose next line starts with a PGN command
+    pgn = sample_pgn(2).replace("{a natural developing move}",
+                                "{a natural\n[%clk 0:05:00] developing move}")
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(pgn)
+    subpgns = loader.ChessGameConstructor(pgn)._separate_games_within_pgn()
+    assert len(subpgns) == 2
+
+    with build_index(pgn_path) as index:
+        assert [index.read(i) for i in range(len(index))] == subpgns
+        assert index.tags(1)["White"] == "White01, A."
+
+def test_index_stores_title_headers(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(3))
+    constructor = loader.ChessGameConstructor(sample_pgn(3))
+    constructor.construct()
+
+    index = build_index(pgn_path)
+    assert index.tags(1) == {"White": "White01, A.", "Black": "Black01",
+                             "Site": "Vienna", "Date": "1801.??.??"}
+    assert loader.indexed_titles(index) == constructor.titles
+    assert loader.construct_indexed_game(index, 2) == constructor.chessgames[2]
+
+def test_sidecar_round_trip(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(4))
+    built = open_index(pgn_path)
+    assert sidecar_path(pgn_path).exists()
+
+    loaded = load_index(pgn_path)
+    assert loaded is not None
+    assert list(loaded.offsets) == list(built.offsets)
+    assert list(loaded.lengths) == list(built.lengths)
+    assert [loaded.tags(i) for i in range(4)] == [built.tags(i) for i in range(4)]
+
+def test_sidecar_is_stale_after_source_changes(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(4))
+    open_index(pgn_path)
+
+    pgn_path.write_text(sample_pgn(6))
+    stat = pgn_path.stat()
+    os.utime(pgn_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_index(pgn_path) is None
+    assert len(open_index(pgn_path)) == 6
+
+def test_iter_pgn_games_samples_titles_from_index(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(6))
+    index = open_index(pgn_path)
+    streamed = list(loader.iter_pgn_games(pgn_path, nb_options=3, index=index))
+    titles = set(loader.indexed_titles(index))
+    assert len(streamed) == 6
+    assert all(set(q["wrong_answers"]) <= titles for _, question_data in streamed
+               for q in question_data)
+
+def test_pgn_loader_reads_games_through_the_sidecar(tmp_path, monkeypatch):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(6))
+    expected = loader.pgn_loader(pgn_path)
+    assert sidecar_path(pgn_path).exists()
+
+    # once saved, reopening the file doesn't scan it for game boundaries
+    monkeypatch.setattr("pgn_quizzer.pgn_index.build_index", None)
+    data = loader.pgn_loader(pgn_path)
+    assert [(q["right_answer"], q["asset"]) for q in data] == [
+        (q["right_answer"], q["asset"]) for q in expected]
+    assert len(list(loader.iter_pgn_games(pgn_path))) == 6
+
+def test_mapped_index_leaves_header_strings_on_disk(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(6))
+    loaded = open_index(pgn_path)
+    with map_index(pgn_path) as mapped:
+        assert mapped._strings is None
+        assert list(mapped.offsets) == list(loaded.offsets)
+        assert list(mapped.lengths) == list(loaded.lengths)
+        assert [mapped.tags(i) for i in range(6)] == [loaded.tags(i) for i in range(6)]
+        assert mapped.read(5) == loaded.read(5)
+    assert mapped._sidecar_map is None
+
+def test_streaming_without_a_sidecar_does_not_build_one(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(6))
+    assert len(list(loader.iter_pgn_games(pgn_path))) == 6
+    assert not sidecar_path(pgn_path).exists()
@@ -0,0 +1,74 @@
+import pytest
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.positions import (AfterCaptures, AnnotatedMoves, AssetMarkers, EveryNthPly,
+                                   LastPlies, PositionStrategy, parse_position_strategy)
+
+from tests.conftest import sample_pgn
+
+# 1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 5. d3 $1 d6 6. Bg5 h6
+AFTER_PLY = {
+    7: "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQ1RK1 b kq - 5 4",
+    9: "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/3P1N2/PPP2PPP/RNBQ1RK1 b kq - 0 5",
+    11: "r1bqk2r/ppp2ppp/2np1n2/2b1p1B1/2B1P3/3P1N2/PPP2PPP/RN1Q1RK1 b kq - 1 6",
+    12: "r1bqk2r/ppp2pp1/2np1n1p/2b1p1B1/2B1P3/3P1N2/PPP2PPP/RN1Q1RK1 w kq - 0 7",
+}
+
+def fens(strategy) -> dict[str, list[str]]:
+    constructor = loader.ChessGameConstructor(sample_pgn(1), strategy)
+    constructor.construct()
+    return constructor.chessgames[0].fen_assets
+
+def test_asset_markers_is_the_default():
+    assert fens(None) == fens(AssetMarkers()) == {"desc1": [AFTER_PLY[7]], "desc2": [AFTER_PLY[11]]}
+
+def test_every_nth_ply():
+    every_fourth = fens(EveryNthPly(4))["desc1"]
+    assert len(every_fourth) == 3 and every_fourth[-1] == AFTER_PLY[12]
+    assert fens(EveryNthPly(6))["desc1"][1:] == [AFTER_PLY[12]]
+
+def test_last_plies():
+    assert fens(LastPlies(1)) == {"desc1": [AFTER_PLY[12]]}
+    assert len(fens(LastPlies(100))["desc1"]) == 12
+
+def test_after_captures_selects_nothing_without_captures():
+    assert fens(AfterCaptures()) == {}
+
+def test_annotated_moves():
+    assert fens(AnnotatedMoves()) == {"desc1": [AFTER_PLY[9]]}
+
+def test_after_captures_and_glyphs():
+    pgn = '[White "A"]\n[Black "B"]\n\n1. e4 d5 2. exd5!? Qxd5 3. Nc3 *\n'
+    constructor = loader.ChessGameConstructor(pgn, AfterCaptures())
+    constructor.construct()
+    assert len(constructor.chessgames[0].fen_assets["desc1"]) == 2
+    constructor = loader.ChessGameConstructor(pgn, AnnotatedMoves())
+    constructor.construct()
+    assert constructor.chessgames[0].fen_assets["desc1"] == [
+        "rnbqkbnr/ppp1pppp/8/3P4/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2"]
+
+@pytest.mark.parametrize("spec", ["assets", "captures", "annotated", "every:3", "last:8"])
+def test_parse_position_strategy_round_trips(spec):
+    assert parse_position_strategy(spec).spec() == spec
+
+@pytest.mark.parametrize("spec", ["", "every", "every:0", "last:x", "captures:2", "middlegame"])
+def test_parse_position_strategy_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_position_strategy(spec)
+
+def test_parallel_construction_keeps_the_strategy():
+    serial = loader.ChessGameConstructor(sample_pgn(6), LastPlies(2))
+    serial.construct()
+    parallel = loader.ChessGameConstructor(sample_pgn(6), LastPlies(2))
+    parallel.construct(workers=2, chunk_size=2)
+    assert parallel.chessgames == serial.chessgames
+
+def test_strategies_must_choose_positions_and_name_their_spec():
+    class Incomplete(PositionStrategy):
+        def __call__(self, number, total, ply, capture):
+            return ()
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    for spec in ("assets", "captures", "annotated", "every:3", "last:2"):
+        assert parse_position_strategy(spec).spec() == spec
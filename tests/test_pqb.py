@@ -0,0 +1,53 @@
+import pytest
+from pathlib import Path
+
+from pgn_quizzer.data import create_question_bank
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.pqb import CompiledBank, pack_fen, unpack_fen, write_pqb
+
+SAMPLE_JSON = Path("jsons") / "chess_sample_data.json"
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppp1ppp/8/8/3pP3/8/PPP2PPP/RNBQKBNR b Kq e3 0 3",
+    "8/1b2kp1p/1p4p1/pB1pr3/3Rn3/2N1P3/PP3PPP/6K1 w - - 9 32",
+])
+def test_pack_fen_round_trips(fen):
+    packed = pack_fen(fen)
+    assert packed is not None and len(packed) == 38
+    assert unpack_fen(packed) == fen
+
+@pytest.mark.parametrize("asset", ["", "not a fen", "8/8/8 w - - 0 1",
+                                   "8/8/8/8/8/8/8/8 w - - 00 1"])
+def test_pack_fen_rejects_non_standard_assets(asset):
+    assert pack_fen(asset) is None
+
+def test_compiled_bank_matches_source_bank(tmp_path):
+    source_bank = create_question_bank(SAMPLE_JSON)
+    pqb_path = tmp_path / "bank.pqb"
+    assert write_pqb(source_bank, pqb_path) == len(source_bank)
+
+    compiled_bank = create_question_bank(pqb_path)
+    assert isinstance(compiled_bank, CompiledBank)
+    assert list(compiled_bank) == source_bank
+    assert compiled_bank[-1] == source_bank[-1]
+
+def test_compiled_bank_keeps_non_fen_assets(tmp_path):
+    questions = [Question("", "True", ["False"], ""),
+                 Question("Q", "A", ["B", "C"], "a diagram")]
+    pqb_path = tmp_path / "bank.pqb"
+    write_pqb(questions, pqb_path)
+    assert list(CompiledBank(pqb_path)) == questions
+
+def test_quiz_samples_from_compiled_bank(tmp_path):
+    pqb_path = tmp_path / "bank.pqb"
+    write_pqb(create_question_bank(SAMPLE_JSON), pqb_path)
+    quiz = QuizBrain(CompiledBank(pqb_path), length=5)
+    assert len(quiz.questions) == 5
+    assert all(isinstance(q, Question) for q in quiz.questions)
+
+def test_compiled_bank_rejects_other_files(tmp_path):
+    pqb_path = tmp_path / "bank.pqb"
+    pqb_path.write_bytes(b"definitely not a bank")
+    with pytest.raises(SystemExit):
+        create_question_bank(pqb_path)
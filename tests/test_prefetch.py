@@ -0,0 +1,90 @@
+from threading import Event, current_thread
+
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.presenter import QuizPresenter
+from pgn_quizzer.render import render_board
+from pgn_quizzer.view import run_quiz_console
+
+FENS = ["rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1",
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"]
+
+def sample_quiz() -> QuizBrain:
+    questions = [Question(f"Q{i}", f"right{i}", [f"wrong{i}a", f"wrong{i}b"], fen)
+                 for i, fen in enumerate(FENS)]
+    return QuizBrain(questions, length=len(questions))
+
+def test_prefetched_questions_match_the_quiz():
+    quiz = sample_quiz()
+    presenter = QuizPresenter(quiz, prefetch=True)
+    for question in quiz.questions:
+        presenter.cue_next_question()
+        assert presenter.current_question is question
+        assert sorted(presenter.current_user_choices.values()) == sorted(
+            [question.right_answer, *question.wrong_answers])
+        assert presenter.question_diagram() == render_board(question.asset)
+        presenter.post_question_update(True)
+    presenter.close()
+    assert presenter.user_score() == 3
+
+def test_next_question_is_prepared_off_the_ui_thread():
+    quiz = sample_quiz()
+    threads = []
+    generate = quiz.generate_multiple_choice_options
+    def recording_generate(question):
+        threads.append(current_thread().name)
+        return generate(question)
+    quiz.generate_multiple_choice_options = recording_generate
+
+    presenter = QuizPresenter(quiz, prefetch=True)
+    presenter.cue_next_question()
+    presenter.post_question_update(False)
+    presenter.cue_next_question()
+    presenter.close()
+    assert threads and all(name.startswith("prefetch") for name in threads)
+
+def test_next_question_is_read_from_the_bank_off_the_ui_thread():
+    class RecordingBank(list):
+        threads = []
+        def __getitem__(self, i):
+            self.threads.append(current_thread().name)
+            return super().__getitem__(i)
+
+    bank = RecordingBank(sample_quiz().question_bank)
+    quiz = QuizBrain(bank, length=len(bank))
+    presenter = QuizPresenter(quiz, prefetch=True)
+    for _ in range(len(bank)):
+        presenter.cue_next_question()
+        presenter.post_question_update(True)
+    presenter.close()
+    assert len(bank.threads) == 3 and all(name.startswith("prefetch") for name in bank.threads)
+
+def test_close_cancels_pending_preparation():
+    quiz = sample_quiz()
+    started, release = Event(), Event()
+    generate = quiz.generate_multiple_choice_options
+    def slow_generate(question):
+        started.set()
+        release.wait(5)
+        return generate(question)
+    quiz.generate_multiple_choice_options = slow_generate
+
+    presenter = QuizPresenter(quiz, prefetch=True)
+    started.wait(5)
+    executor = presenter._executor
+    presenter.close() # returns without waiting for the preparation
+    assert not release.is_set()
+    release.set()
+    executor.shutdown(wait=True)
+    assert presenter._next is None and presenter._executor is None
+
+def test_console_quiz_with_prefetch():
+    quiz = sample_quiz()
+    presenter = QuizPresenter(quiz, prefetch=True, board_style="ascii")
+    inputs = iter(["", "a", "", "a", "n", "n"])
+    output = []
+    play_again = run_quiz_console(presenter, lambda prompt: next(inputs),
+                                  lambda *args, **kwargs: output.extend(args))
+    assert not play_again
+    assert render_board(quiz.questions[0].asset, style="ascii") in output
+    assert presenter.nb_questions_answered() == 2
@@ -0,0 +1,49 @@
+from json import load
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.model import QuizBrain
+from pgn_quizzer.profiling import Profiler, active_profiler, profiled, stage
+
+from tests.conftest import sample_pgn
+
+def test_stages_are_not_recorded_unless_profiling():
+    with stage("strip"):
+        pass
+    assert active_profiler() is None
+    assert list(profiled(range(3), "read")) == [0, 1, 2]
+
+def test_profiler_records_each_pipeline_stage(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text(sample_pgn(3))
+    with Profiler() as profiler:
+        bank = loader.parse_data(loader.pgn_loader(path))
+        QuizBrain(bank, length=2)
+    assert active_profiler() is None
+
+    assert {"read", "separate", "strip", "fens", "questions", "validate", "sample"} <= set(profiler.totals)
+    assert profiler.totals["strip"].calls == profiler.totals["fens"].calls == 3
+    assert all(totals.wall >= 0 and totals.cpu >= 0 for totals in profiler.totals.values())
+
+def test_profiler_keeps_totals_beyond_max_spans_and_calls_hook():
+    seen = []
+    with Profiler(max_spans=2, on_span=seen.append) as profiler:
+        for _ in range(5):
+            with stage("render"):
+                pass
+    assert len(profiler.spans) == 2 and profiler.dropped == 3
+    assert profiler.totals["render"].calls == len(seen) == 5
+
+def test_profiler_writes_chrome_trace_and_summary(tmp_path):
+    with Profiler() as profiler:
+        with stage("load"):
+            with stage("validate"):
+                pass
+    profiler.write(tmp_path / "trace.json")
+    profiler.write(tmp_path / "summary.json", format="json")
+
+    with open(tmp_path / "trace.json") as trace_file:
+        events = load(trace_file)["traceEvents"]
+    assert [event["name"] for event in events] == ["validate", "load"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    with open(tmp_path / "summary.json") as summary_file:
+        assert set(load(summary_file)["stages"]) == {"load", "validate"}
@@ -0,0 +1,39 @@
+import pytest
+from chess import Board
+
+from pgn_quizzer.render import BLACK, WHITE, RenderCache, render_board
+
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 3 3"
+
+def test_unicode_matches_previous_console_diagram():
+    board = Board(FEN)
+    assert render_board(FEN) == board.unicode(invert_color=True, orientation=board.turn)
+
+def test_ascii_is_flipped_for_black():
+    white = RenderCache().render(FEN, WHITE, "ascii")
+    black = RenderCache().render(FEN, BLACK, "ascii")
+    assert white == str(Board(FEN))
+    assert black.splitlines()[0] == "R . B K Q B N R"
+    assert black == "\n".join(line[::-1] for line in reversed(white.splitlines()))
+
+def test_svg_backend():
+    assert RenderCache().render(FEN, style="svg").startswith("<svg")
+
+def test_cache_reuses_diagrams_and_evicts_least_recently_used():
+    cache = RenderCache(maxsize=2)
+    other = FEN.replace(" b ", " w ")
+    first = cache.render(FEN)
+    assert cache.render(FEN) is first
+    cache.render(other)
+    cache.render(FEN) # FEN is now the most recently used
+    cache.render(FEN, style="ascii")
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 3, 1)
+    assert len(cache) == 2
+    cache.render(FEN)
+    assert cache.hits == 3
+
+def test_render_rejects_unknown_style_and_bad_fen():
+    with pytest.raises(ValueError):
+        RenderCache().render(FEN, style="braille")
+    with pytest.raises(ValueError):
+        RenderCache().render("not a fen")
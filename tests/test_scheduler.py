@@ -0,0 +1,64 @@
+import pytest
+
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.scheduler import SECONDS_PER_DAY, Card, ReviewScheduler
+
+BANK = [Question(f"Q{i}", f"right{i}", [f"wrong{i}a", f"wrong{i}b"],
+                 "8/8/8/8/8/8/8/8 w - - 0 1") for i in range(20)]
+DAY = SECONDS_PER_DAY
+
+def test_sm2_intervals_grow_with_right_answers_and_reset_on_a_miss():
+    card = Card()
+    intervals = []
+    for _ in range(4):
+        card.review(4, now=0)
+        intervals.append(card.interval)
+    assert intervals[:3] == [1, 6, 6 * 2.5]
+    assert intervals[3] == pytest.approx(intervals[2] * 2.5)
+    card.review(1, now=10 * DAY)
+    assert (card.repetitions, card.interval, card.due) == (0, 1, 11 * DAY)
+    assert card.ease == pytest.approx(2.5 - 0.54)
+
+def test_due_questions_come_first_then_new_ones(tmp_path):
+    scheduler = ReviewScheduler(BANK, tmp_path / "history.sqlite", seed=0)
+    first = scheduler.next_indices(5, now=0)
+    assert len(set(first)) == 5 and len(scheduler) == 0
+    for i, question in enumerate(first):
+        scheduler.record(question, correct=i < 3, now=0)
+        if i < 3:
+            scheduler.record(question, correct=True, now=0)
+
+    # the 2 misses are due again after a day, the 3 right answers after 6
+    later = scheduler.next_indices(5, now=DAY)
+    assert later[:2] == sorted(first[3:])
+    assert not set(later[2:]) & set(first)
+    assert scheduler.next_indices(5, now=7 * DAY) == sorted(first[3:]) + sorted(first[:3])
+
+def test_seen_questions_fill_in_when_nothing_is_new(tmp_path):
+    bank = BANK[:3]
+    scheduler = ReviewScheduler(bank, tmp_path / "history.sqlite")
+    for question, due_in in zip(range(3), (3, 1, 2)):
+        scheduler.record(question, correct=True, now=(due_in - 1) * DAY)
+    assert scheduler.next_indices(5, now=0) == [1, 2, 0]
+
+def test_history_persists_per_user_and_bank(tmp_path):
+    path = tmp_path / "history.sqlite"
+    scheduler = ReviewScheduler(BANK, path, user="alice")
+    scheduler.record(7, correct=False, now=0)
+    scheduler.record(7, correct=True, now=DAY)
+    scheduler.close()
+
+    again = ReviewScheduler(BANK, path, user="alice")
+    assert again.cards == {7: scheduler.cards[7]}
+    assert len(ReviewScheduler(BANK, path, user="bob")) == 0
+    assert len(ReviewScheduler(BANK[:10], path, user="alice")) == 0
+    assert again._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 2
+
+def test_quiz_draws_from_and_reports_to_the_scheduler(tmp_path):
+    scheduler = ReviewScheduler(BANK, tmp_path / "history.sqlite")
+    quiz = QuizBrain(BANK, length=4, scheduler=scheduler)
+    for i in range(4):
+        quiz.record_answer(i % 2 == 0)
+    assert quiz.user_score == 2 and quiz.nb_questions_remaining() == 0
+    assert set(scheduler.cards) == set(quiz.indices)
+    assert [scheduler.cards[q].repetitions for q in quiz.indices] == [1, 0, 1, 0]
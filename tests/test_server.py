@@ -0,0 +1,123 @@
+import asyncio
+from json import dumps, loads
+
+import pytest
+
+import pgn_quizzer.server as server_module
+import pgn_quizzer.session as session_module
+from pgn_quizzer.model import Question
+from pgn_quizzer.server import FINISHED_GRACE, MAX_LENGTH, HttpError, QuizServer
+
+BANK = [Question(f"Q{i}", f"right{i}", [f"wrong{i}a", f"wrong{i}b"],
+                 "8/8/8/8/8/8/8/8 w - - 0 1") for i in range(10)]
+
+def play(server: QuizServer, session_id: str) -> list[bool]:
+    results = []
+    while True:
+        try:
+            question = server.question(session_id)
+        except HttpError as e:
+            assert e.status == 409
+            return results
+        right = BANK[int(question["text"][1:])].right_answer
+        key = next(k for k, v in question["choices"].items() if v == right)
+        results.append(server.answer(session_id, key.lower())["correct"])
+
+def test_sessions_share_the_bank_and_keep_their_own_score():
+    server = QuizServer(BANK, length=3)
+    first = server.create_session()["session"]
+    second = server.create_session(length=5)["session"]
+    assert play(server, first) == [True] * 3
+    assert server.sessions.get(second).quiz.nb_questions_answered == 0
+    assert play(server, second) == [True] * 5
+    assert server.close_session(first) == {"score": 3, "answered": 3}
+    assert list(server.sessions) == [second]
+    assert all(question in BANK for question in server.sessions.get(second).quiz.questions)
+
+def test_question_is_stable_until_answered():
+    server = QuizServer(BANK)
+    session_id = server.create_session()["session"]
+    assert server.question(session_id) == server.question(session_id)
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("GET", "/nowhere", {}, 404),
+    ("GET", "/sessions/unknown/question", {}, 404),
+    ("PUT", "/sessions/unknown/answer", {}, 405),
+    ("POST", "/sessions", {"length": 0}, 400),
+    ("POST", "/sessions", {"length": MAX_LENGTH + 1}, 400),
+])
+def test_route_errors(method, path, body, status):
+    with pytest.raises(HttpError) as e:
+        QuizServer(BANK).route(method, path, body)
+    assert e.value.status == status
+
+def test_answer_needs_a_question_on_offer_and_a_valid_choice():
+    server = QuizServer(BANK)
+    session_id = server.create_session()["session"]
+    with pytest.raises(HttpError) as e:
+        server.answer(session_id, "A")
+    assert e.value.status == 409
+    server.question(session_id)
+    with pytest.raises(HttpError) as e:
+        server.answer(session_id, "Z")
+    assert e.value.status == 400
+
+def test_finished_and_abandoned_sessions_make_room(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(server_module, "monotonic", lambda: clock[0])
+    server = QuizServer(BANK, length=1, max_sessions=2, session_ttl=3600)
+    finished = server.create_session()["session"]
+    play(server, finished)
+    abandoned = server.create_session()["session"]
+    with pytest.raises(HttpError) as e:
+        server.create_session()
+    assert e.value.status == 503
+
+    clock[0] += FINISHED_GRACE
+    server.create_session()
+    assert finished not in server.sessions and abandoned in server.sessions
+
+    later = session_module.time() + 3600
+    monkeypatch.setattr(session_module, "time", lambda: later)
+    server.create_session()
+    assert abandoned not in server.sessions and len(server.sessions) == 1
+
+async def request(reader, writer, method: str, path: str, body: dict | None = None):
+    data = dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+    status = int(head.split()[1])
+    length = int(head.lower().split("content-length:")[1].split("\r\n")[0])
+    return status, loads(await reader.readexactly(length))
+
+def test_server_plays_a_quiz_over_one_keep_alive_connection():
+    async def scenario():
+        server = QuizServer(BANK, length=2)
+        listener = await server.serve("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            status, created = await request(reader, writer, "POST", "/sessions", {})
+            assert status == 201
+            path = f"/sessions/{created["session"]}"
+            for _ in range(2):
+                status, question = await request(reader, writer, "GET", path + "/question")
+                assert status == 200 and len(question["choices"]) == 3
+                status, result = await request(reader, writer, "POST", path + "/answer",
+                                               {"choice": "A"})
+                assert status == 200
+            assert result["remaining"] == 0
+            status, _ = await request(reader, writer, "GET", path + "/question")
+            assert status == 409
+            status, error = await request(reader, writer, "POST", "/sessions", {"length": "x"})
+            assert status == 400 and "error" in error
+            status, health = await request(reader, writer, "GET", "/health")
+            assert health["sessions"] == 1 and health["questions"] == 10
+        finally:
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+        assert server.nb_requests == 8
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+from time import time
+
+import pytest
+
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.session import STATE, Session, SessionStore, bank_identity
+
+BANK = [Question(f"Q{i}", f"right{i}", [f"wrong{i}a", f"wrong{i}b", f"wrong{i}c"],
+                 "8/8/8/8/8/8/8/8 w - - 0 1") for i in range(50)]
+
+def test_quiz_is_determined_by_its_seed():
+    quiz = QuizBrain(BANK, length=10, seed=42)
+    again = QuizBrain(BANK, length=10, seed=42)
+    assert again.questions == quiz.questions
+    assert list(quiz.indices) == [BANK.index(q) for q in quiz.questions]
+    assert again.seeded_multiple_choice_options() == quiz.seeded_multiple_choice_options()
+
+def test_session_packs_into_a_few_dozen_bytes():
+    bank_id = bank_identity(BANK)
+    session = Session(QuizBrain(BANK, length=10), offered=True)
+    session.quiz.nb_questions_answered, session.quiz.user_score = 4, 3
+    state = session.pack(bank_id)
+    assert len(state) == STATE.size <= 32
+
+    restored = Session.unpack(state, BANK, bank_id)
+    assert restored.offered
+    assert restored.quiz.questions == session.quiz.questions
+    assert (restored.quiz.nb_questions_answered, restored.quiz.user_score) == (4, 3)
+    assert restored.quiz.seeded_multiple_choice_options() == session.quiz.seeded_multiple_choice_options()
+    with pytest.raises(ValueError):
+        Session.unpack(state, BANK[:-1], bank_identity(BANK[:-1]))
+
+def test_store_evicts_least_recently_used_and_restores(tmp_path):
+    store = SessionStore(BANK, max_active=2, max_idle_bytes=2 * STATE.size, path=tmp_path / "s.sqlite")
+    quizzes = {f"s{i}": QuizBrain(BANK, length=5) for i in range(6)}
+    for session_id, quiz in quizzes.items():
+        store.add(session_id, Session(quiz))
+        quiz.increment_score()
+
+    assert len(store) == 6 and store.nb_active() == 2
+    assert store.evictions == 4 and store.spills > 0
+    for session_id, quiz in quizzes.items():
+        session = store.get(session_id)
+        assert session.quiz.questions == quiz.questions and session.quiz.user_score == 1
+    assert store.restores == 6 # each restore evicts a session restored later on
+    assert store.get("s5") is not None and store.hits == 1
+    assert store.remove("s0") is not None and "s0" not in store and len(store) == 5
+    store.close()
+
+def test_store_expires_sessions_left_unused(tmp_path):
+    store = SessionStore(BANK, max_active=1, max_idle_bytes=STATE.size, path=tmp_path / "s.sqlite")
+    for session_id in "abcd":
+        store.add(session_id, Session(QuizBrain(BANK, length=5)))
+    assert store.nb_active() == 1 and store.counters()["spilled"] > 0
+    assert store.expire(ttl=60) == 0 and len(store) == 4
+
+    store.get("a") # used again later on
+    assert store.expire(ttl=60, now=store.get("a").used + 30) == 0
+    assert store.expire(ttl=60, now=time() + 120) == 4
+    assert len(store) == 0 and store.expirations == 4
+    store.close()
+
+def test_store_keeps_sessions_across_restarts_of_the_same_bank(tmp_path):
+    path = tmp_path / "sessions.sqlite"
+    store = SessionStore(BANK, path=path)
+    quiz = QuizBrain(BANK, length=5)
+    store.add("kept", Session(quiz))
+    store.flush()
+    store.close()
+
+    assert SessionStore(BANK, path=path).get("kept").quiz.questions == quiz.questions
+    assert SessionStore(BANK[:10], path=path).get("kept") is None
+
+def test_temporary_spill_file_is_removed_on_close():
+    store = SessionStore(BANK, max_active=1, max_idle_bytes=0)
+    store.add("a", Session(QuizBrain(BANK)))
+    store.add("b", Session(QuizBrain(BANK)))
+    path = store.path
+    assert path.exists() and "a" in store
+    store.close()
+    assert not path.exists()
@@ -0,0 +1,52 @@
+from random import Random
+
+from pgn_quizzer.data import ChessGame, generate_bank_question_data
+from pgn_quizzer.distractors import TitleTable
+from pgn_quizzer.similarity import SimilarityIndex, material_points, material_signature
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+ENDGAME = "8/5k2/8/8/8/8/3R4/6K1 w - - 0 60"
+
+def make_game(white, black, year, eco="", event="", fen=START) -> ChessGame:
+    return ChessGame(title      = f"{white} - {black}, {year}",
+                     fen_assets = {"desc1": [fen]},
+                     tags       = {"White": white, "Black": black, "Date": f"{year}.01.01",
+                                   "ECO": eco, "Event": event})
+
+def sample_games() -> list[ChessGame]:
+    games = [make_game("Capablanca", "Lasker", 1921, "D63", "World Championship"),
+             make_game("Lasker", "Capablanca", 1921, "D61", "World Championship"),
+             make_game("Capablanca", "Marshall", 1918, "C89", "New York")]
+    # plenty of unrelated games from another century
+    games += [make_game(f"Player{i}", f"Rival{i}", 2000 + i % 20, "A00", f"Open {i}", ENDGAME)
+              for i in range(200)]
+    return games
+
+def test_material_signature_counts_pieces():
+    assert material_signature(START) == (8, 2, 2, 2, 1, 8, 2, 2, 2, 1)
+    assert material_signature(ENDGAME) == (0, 0, 0, 1, 0, 0, 0, 0, 0, 0)
+    assert material_points(START) == (39, 39)
+    assert material_points(ENDGAME) == (5, 0)
+
+def test_nearest_prefers_shared_players_event_and_era():
+    games = sample_games()
+    table = TitleTable(game.title for game in games)
+    index = SimilarityIndex(games, table, rng=Random(0))
+    nearest = index.nearest(table.ids[games[0].title], 2)
+    assert set(nearest) == {table.ids[games[1].title], table.ids[games[2].title]}
+
+def test_sample_excluding_tops_up_with_random_titles():
+    games = sample_games()
+    table = TitleTable(game.title for game in games)
+    index = SimilarityIndex(games[:3], table, rng=Random(0))
+    picks = index.sample_excluding(5, table.ids[games[0].title])
+    assert len(set(picks)) == 5
+    assert table.ids[games[0].title] not in picks
+    assert {table.ids[games[1].title], table.ids[games[2].title]} <= set(picks)
+
+def test_similarity_index_plugs_into_question_generation():
+    games = sample_games()
+    table = TitleTable(game.title for game in games)
+    index = SimilarityIndex(games, table, rng=Random(0))
+    question_data = generate_bank_question_data(games[:1], table, 2, index)
+    assert set(question_data[0]["wrong_answers"]) == {games[1].title, games[2].title}
@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+from pathlib import Path
+
+from pgn_quizzer.data import create_question_bank, iter_pgn_headers
+from pgn_quizzer.model import Question, QuizBrain
+from pgn_quizzer.sqlite_bank import SqliteBank, fen_ply, write_sqlite_bank
+
+SAMPLE_JSON = Path("jsons") / "chess_sample_data.json"
+PGN = """[Event "Casual"]
+[Site "Vienna"]
+[Date "1898.??.??"]
+[White "Steinitz, W."]
+[Black "Lipke, P."]
+[ECO "C50"]
+
+1. e4 {[%asset desc1]} e5 2. Nf3 Nc6 3. Bc4 {[%asset desc2]} 1-0
+
+[Site "Baden-Baden"]
+[Date "1870.??.??"]
+[White "Anderssen"]
+[Black "Minkowitz"]
+
+1. d4 d5 {[%asset desc1]} 2. c4 1-0
+
+[Site "New York"]
+[Date "1916.??.??"]
+[White "Janowski"]
+[Black "Capablanca"]
+[ECO "D02"]
+
+1. Nf3 d5 2. d4 {[%asset desc1]} 1/2-1/2
+"""
+
+def test_sqlite_bank_matches_source_bank(tmp_path):
+    source_bank = create_question_bank(SAMPLE_JSON)
+    path = tmp_path / "bank.sqlite"
+    assert write_sqlite_bank(source_bank, path) == len(source_bank)
+
+    sqlite_bank = create_question_bank(path)
+    assert isinstance(sqlite_bank, SqliteBank)
+    assert list(sqlite_bank) == source_bank
+    assert sqlite_bank[-1] == source_bank[-1]
+    with pytest.raises(IndexError):
+        sqlite_bank[len(source_bank)]
+    quiz = QuizBrain(sqlite_bank, length=5)
+    assert all(question in source_bank for question in quiz.questions)
+
+def test_games_are_normalized_and_indexed(tmp_path):
+    pgn_path, path = tmp_path / "games.pgn", tmp_path / "bank.sqlite"
+    pgn_path.write_text(PGN)
+    questions = create_question_bank(pgn_path, nb_options=2)
+    write_sqlite_bank(questions, path, iter_pgn_headers(pgn_path))
+
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT COUNT(*) FROM titles").fetchone() == (3,)
+    assert sorted(db.execute("SELECT white, year, eco FROM games")) == [
+        ("Anderssen", 1870, None), ("Janowski", 1916, "D02"), ("Steinitz, W.", 1898, "C50")]
+    assert sorted(db.execute("SELECT ply FROM positions")) == [(1,), (2,), (3,), (5,)]
+    plan = " ".join(row[-1] for row in db.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM games WHERE eco = 'C50' AND year < 1900"))
+    assert "USING INDEX" in plan
+    assert list(SqliteBank(path)) == questions
+
+def test_sqlite_bank_keeps_non_fen_assets(tmp_path):
+    questions = [Question("", "True", ["False"], ""),
+                 Question("Q", "A", ["B", "C"], "a diagram")]
+    path = tmp_path / "bank.sqlite"
+    write_sqlite_bank(questions, path)
+    assert list(SqliteBank(path)) == questions
+    with pytest.raises(ValueError):
+        write_sqlite_bank(questions, path)
+
+def test_other_databases_are_rejected(tmp_path):
+    path = tmp_path / "other.sqlite"
+    sqlite3.connect(path).execute("CREATE TABLE t (x)").connection.close()
+    with pytest.raises(ValueError):
+        SqliteBank(path)
+
+@pytest.mark.parametrize("fen, ply", [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 0),
+    ("rnbqkbnr/pppp1ppp/8/8/3pP3/8/PPP2PPP/RNBQKBNR b Kq e3 0 3", 5),
+    ("a diagram", None),
+])
+def test_fen_ply(fen, ply):
+    assert fen_ply(fen) == ply
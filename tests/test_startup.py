@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Generous budgets (a cold start here takes ~0.1s to --help and ~0.2s to the
+# first question); they catch a heavy import creeping back into startup,
+# not small slowdowns.
+HELP_BUDGET = 1.0
+FIRST_QUESTION_BUDGET = 2.0
+IMPORT_BUDGET_US = 500_000
+
+SRC = str(Path(__file__).parents[1] / "src")
+SAMPLE_JSON = str(Path("jsons") / "chess_sample_data.json")
+
+def run_python(*args: str, stdin: str = "") -> tuple[subprocess.CompletedProcess, float]:
+    start = perf_counter()
+    result = subprocess.run([sys.executable, *args], input=stdin, capture_output=True,
+                            text=True, env={**os.environ, "PYTHONPATH": SRC}, check=True)
+    return result, perf_counter() - start
+
+def imported_modules(importtime_log: str) -> dict[str, int]:
+    # module -> cumulative import time in microseconds
+    modules = {}
+    for line in importtime_log.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+def test_importing_main_skips_chess_and_multiprocessing():
+    result, _ = run_python("-X", "importtime", "-c", "import pgn_quizzer.main")
+    modules = imported_modules(result.stderr)
+    assert "chess" not in modules
+    assert "multiprocessing" not in modules
+    assert modules["pgn_quizzer.main"] < IMPORT_BUDGET_US
+
+def test_loading_a_json_bank_does_not_import_chess():
+    code = ("import sys; from pathlib import Path; "
+            "from pgn_quizzer.data import create_question_bank; "
+            f"bank = create_question_bank(Path({SAMPLE_JSON!r}), compact=True); "
+            "print(len(bank), 'chess' in sys.modules)")
+    result, _ = run_python("-c", code)
+    nb_questions, chess_imported = result.stdout.split()
+    assert int(nb_questions) > 0 and chess_imported == "False"
+
+def test_help_is_within_budget():
+    result, elapsed = run_python("-m", "pgn_quizzer", "--help")
+    assert "--path" in result.stdout
+    assert elapsed < HELP_BUDGET
+
+def test_first_question_is_within_budget():
+    # continue, answer A, decline to play again
+    result, elapsed = run_python("-m", "pgn_quizzer", "--path", SAMPLE_JSON, "--length", "1",
+                                 "--no-cache", stdin="\nA\nn\n")
+    assert "Q1:" in result.stdout
+    assert elapsed < FIRST_QUESTION_BUDGET
@@ -0,0 +1,59 @@
+import pytest
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.validation import REASONS, ValidationReport, reason_codes, validate_data
+
+from tests.conftest import sample_pgn
+
+VALID_RECORD = {"text": "Which game?", "right_answer": "A - B", "wrong_answers": ["C - D"],
+                "asset": "8/8/8/8/8/8/8/8 w - - 0 1"}
+
+def broken(**changes) -> dict:
+    record = dict(VALID_RECORD, **changes)
+    return {key: value for key, value in record.items() if value is not None}
+
+INVALID_RECORDS = [
+    ("not a record", ["a list"]),
+    ("text is not a string", broken(text=1)),
+    ("right_answer is not a string", broken(right_answer=None)),
+    ("wrong_answers is not a list", broken(wrong_answers="C - D")),
+    ("asset is missing or not a string", broken(asset=None)),
+    ("a wrong answer is not a string", broken(wrong_answers=["C - D", 2])),
+    ("no wrong answers", broken(wrong_answers=[])),
+    ("an answer is an empty string", broken(right_answer="")),
+    ("an answer is an empty string", broken(wrong_answers=["C - D", ""])),
+    ]
+
+@pytest.mark.parametrize("reason, record", INVALID_RECORDS)
+def test_validate_data_reports_why_a_record_was_rejected(reason, record):
+    valid, report = validate_data([VALID_RECORD, record, VALID_RECORD])
+    assert valid == [VALID_RECORD, VALID_RECORD]
+    assert report.rejections() == [(1, reason)]
+    assert report.summary() == f"skipped 1 of 3 questions (1 {reason})"
+
+def test_reason_codes_agree_with_is_valid_data():
+    records = [VALID_RECORD] + [record for _, record in INVALID_RECORDS[1:]]
+    codes = reason_codes(records)
+    assert [code == 0 for code in codes] == [loader.is_valid_data(q) for q in records]
+
+def test_validate_data_in_worker_chunks_matches_in_process():
+    records = [record for _, record in INVALID_RECORDS] * 5 + [VALID_RECORD] * 7
+    serial = validate_data(records)
+    parallel = validate_data(records, workers=2, chunk_size=4)
+    assert parallel == serial
+    assert serial[1].nb_valid == 7
+    assert set(serial[1].counts()) == set(REASONS[1:])
+
+def test_parse_data_fills_in_report():
+    report = ValidationReport()
+    questions = loader.parse_data([VALID_RECORD, broken(text=None)], report=report)
+    assert len(questions) == 1
+    assert report.rejections() == [(1, "text is not a string")]
+
+def test_pgn_question_data_passes_validation(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text(sample_pgn(4))
+    data = loader.pgn_loader(path)
+    report = ValidationReport()
+    assert len(loader.parse_data(data, report=report)) == len(data) == 8
+    assert report.nb_rejected == 0
@@ -0,0 +1,62 @@
+from random import Random
+
+import pgn_quizzer.data as loader
+from pgn_quizzer.zobrist import AMBIGUOUS, PositionIndex, position_key
+
+from tests.conftest import SAMPLE_GAME_TEMPLATE, sample_pgn
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+def test_position_key_ignores_move_clocks():
+    assert position_key(START) == position_key(START.replace(" 0 1", " 4 9"))
+    assert position_key(START) != position_key(START.replace(" w ", " b "))
+    assert position_key("not a fen") is None
+
+def test_position_index_flags_positions_seen_in_two_games():
+    index = PositionIndex(capacity=4)
+    rng = Random(0)
+    keys = [rng.getrandbits(64) for _ in range(5000)]
+    for i, key in enumerate(keys):
+        index.add(key, i)
+    index.add(keys[0], 0) # same game again
+    index.add(keys[1], 7) # another game
+
+    assert len(index) == 5000
+    assert index.get(keys[0]) == 0
+    assert index.get(keys[1]) == AMBIGUOUS and index.is_ambiguous(keys[1])
+    assert all(index.get(key) == i for i, key in enumerate(keys[2:], start=2))
+    assert index.get(12345) is None
+
+def test_pgn_loader_drops_positions_shared_between_games(tmp_path):
+    # every sample game reaches the same positions, plus one game of its own
+    other_game = SAMPLE_GAME_TEMPLATE.replace("NN", "99").replace("4. O-O", "4. c3")
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(4) + other_game)
+
+    every_question = loader.pgn_loader(pgn_path)
+    unique_questions = loader.pgn_loader(pgn_path, unique_positions=True)
+    assert len(every_question) == 10
+    assert [q["right_answer"] for q in unique_questions] == ["White99 - Black99, Vienna 1899"] * 2
+
+def test_parse_data_can_drop_ambiguous_questions():
+    question_data = [
+        {"text": "Q", "right_answer": "Game A", "wrong_answers": ["Game B"], "asset": START},
+        {"text": "Q", "right_answer": "Game B", "wrong_answers": ["Game A"],
+         "asset": START.replace(" 0 1", " 2 3")},
+        {"text": "Q", "right_answer": "Game A", "wrong_answers": ["Game B"], "asset": ""},
+        ]
+    assert len(loader.parse_data(question_data)) == 3
+    assert [q.asset for q in loader.parse_data(question_data, drop_ambiguous=True)] == [""]
+
+def test_pgn_positions_are_checked_for_ambiguity_once(tmp_path, monkeypatch):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(sample_pgn(3))
+    calls = []
+    monkeypatch.setattr(loader, "drop_ambiguous_questions",
+                        lambda data: calls.append(data) or data)
+    loader.create_question_bank(pgn_path, unique_positions=True)
+    assert not calls # pgn_loader has already done it
+    json_path = tmp_path / "bank.json"
+    json_path.write_text(loader.pgn_to_json(str(pgn_path)))
+    loader.create_question_bank(json_path, unique_positions=True)
+    assert len(calls) == 1